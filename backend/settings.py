@@ -62,6 +62,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Added for static files
+    'blog.compression.CompressionMiddleware',  # br/gzip for API responses
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
     'django.middleware.common.CommonMiddleware',
@@ -69,6 +70,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'blog.nplusone.NPlusOneMiddleware',  # repeated query detector, off unless NPLUSONE_DETECTOR
 ]
 
 # CORS settings
@@ -88,7 +90,7 @@ CORS_ALLOW_ALL_ORIGINS = True  # Enable all CORS for debugging
 CORS_ALLOW_CREDENTIALS = True
 
 # More CORS settings
-CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken']
+CORS_EXPOSE_HEADERS = ['Content-Type', 'X-CSRFToken', 'ETag', 'Last-Modified', 'X-Diagnostics']
 
 CORS_ALLOW_METHODS = [
     'DELETE',
@@ -110,6 +112,9 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
+    'if-modified-since',
+    'x-diagnostics',
 ]
 
 # Try to get frontend URL from environment
@@ -234,6 +239,75 @@ def test_database_connection():
 # We'll call this function from a management command or view instead
 
 
+# Cache configuration
+# 'default' is shared by every process: web workers, the image worker and
+# management commands. Invalidation tags, the slug map and autocomplete
+# versions, comment stats and the N+1 report live there, so a local-memory
+# default would leave each process with its own copy (see blog/checks.py).
+# Redis when REDIS_URL is set, otherwise a database table created by
+# `manage.py createcachetable`; CACHE_BACKEND/CACHE_LOCATION override both.
+# 'local' is per process and only holds entries whose keys change with their
+# content (encoded JSON fragments, compressed bodies), which never go stale.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    DEFAULT_CACHE = {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+else:
+    DEFAULT_CACHE = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'blog_cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+if os.environ.get('CACHE_BACKEND'):
+    DEFAULT_CACHE = {
+        'BACKEND': os.environ['CACHE_BACKEND'],
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'blog-cms'),
+    }
+CACHES = {
+    'default': {**DEFAULT_CACHE, 'TIMEOUT': 300},
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blog-cms-local',
+        'TIMEOUT': 300,
+    },
+}
+
+# API response cache (see blog/cache.py). Responses cached under their ETag
+# need no invalidation and stay in the process; tagged ones are shared
+API_RESPONSE_CACHE_ALIAS = 'default'
+API_BODY_CACHE_ALIAS = 'local'
+API_RESPONSE_CACHE_TIMEOUT = int(os.environ.get('API_RESPONSE_CACHE_TIMEOUT', 300))
+
+# Responses under these paths are compressed (see blog/compression.py); br
+# needs the optional Brotli package, gzip is always available
+API_COMPRESSION_PATHS = ['/api/']
+API_COMPRESSION_CACHE_ALIAS = 'local'
+
+# Encoded JSON of single posts and comments, keyed by their updated_at
+API_FRAGMENT_CACHE_ALIAS = 'local'
+API_FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('API_FRAGMENT_CACHE_TIMEOUT', 3600))
+
+# Render list pages of posts and comments from values() rows instead of
+# model instances (see blog/values.py); the JSON is the same either way
+API_VALUES_SERIALIZERS = os.environ.get('API_VALUES_SERIALIZERS', 'True').lower() in ('true', '1', 'yes')
+
+# Comment moderation counts (see blog/stats.py)
+COMMENT_STATS_CACHE_TIMEOUT = int(os.environ.get('COMMENT_STATS_CACHE_TIMEOUT', 30))
+
+# Batch comment moderation (see blog/moderation.py): ids per UPDATE/DELETE
+# statement and ids per request
+COMMENT_MODERATION_CHUNK_SIZE = int(os.environ.get('COMMENT_MODERATION_CHUNK_SIZE', 500))
+COMMENT_MODERATION_MAX_IDS = int(os.environ.get('COMMENT_MODERATION_MAX_IDS', 10000))
+
+# Repeated query (N+1) detection (see blog/nplusone.py). Requests running the
+# same query shape NPLUSONE_THRESHOLD times are logged and reported by
+# `manage.py nplusone_report`
+NPLUSONE_DETECTOR = os.environ.get('NPLUSONE_DETECTOR', 'False').lower() in ('true', '1', 'yes')
+NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', 5))
+NPLUSONE_REPORT_SIZE = int(os.environ.get('NPLUSONE_REPORT_SIZE', 200))
+# The report is read by the command from another process, so it needs a shared cache
+NPLUSONE_REPORT_CACHE_ALIAS = 'default'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -276,6 +350,14 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Media is served by blog.media.serve_media. Set MEDIA_SENDFILE_HEADER to
+# 'X-Accel-Redirect' (nginx, with an internal location at
+# MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) or 'X-Sendfile'
+# (Apache, lighttpd) to let the front proxy send the files
+MEDIA_SENDFILE_HEADER = os.environ.get('MEDIA_SENDFILE_HEADER', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+# Browser cache lifetime of media files; content-addressed blobs are immutable
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 3600))
 
 # CKEditor 5 settings
 customColorPalette = [
@@ -346,8 +428,25 @@ CKEDITOR_5_CONFIGS = {
     }
 }
 
-# CKEditor 5 media upload directory
-CKEDITOR_5_FILE_STORAGE = "django.core.files.storage.FileSystemStorage"
+# Optimize uploaded images in the background ('manage.py process_images')
+# instead of inside the request; set to False to process them inline
+IMAGE_PROCESSING_ASYNC = os.environ.get('IMAGE_PROCESSING_ASYNC', 'True').lower() in ('true', '1', 'yes')
+
+# Upload limits checked from the image header before anything is decoded
+IMAGE_ALLOWED_FORMATS = ['JPEG', 'MPO', 'PNG', 'WEBP', 'GIF', 'AVIF']
+IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', 50_000_000))
+# Stored images are downscaled to fit this box (JPEGs while decoding)
+IMAGE_MAX_DIMENSION = int(os.environ.get('IMAGE_MAX_DIMENSION', 4096))
+
+# Responsive variants generated for every uploaded image; widths at or above
+# the original width are skipped, formats Pillow cannot encode are dropped
+IMAGE_VARIANT_WIDTHS = [320, 640, 1024, 1600]
+IMAGE_VARIANT_FORMATS = ['avif', 'webp']
+
+# CKEditor 5 uploads share the content-addressed store of the image fields,
+# so an image uploaded twice is kept once ('manage.py collect_media' removes
+# blobs nothing references any more)
+CKEDITOR_5_FILE_STORAGE = "blog.storage.ContentAddressedStorage"
 CKEDITOR_5_UPLOAD_PATH = "uploads/"
 
 # Default primary key field type
@@ -365,8 +464,21 @@ REST_FRAMEWORK = {
         'rest_framework.parsers.FormParser',
         'rest_framework.parsers.MultiPartParser',
     ],
+    # Splices cached per-object JSON fragments into responses (blog/fragments.py)
+    'DEFAULT_RENDERER_CLASSES': [
+        'blog.fragments.FragmentJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
+# Post summaries stored on save (see blog/text.py)
+POST_EXCERPT_LENGTH = 300
+READING_WORDS_PER_MINUTE = 200
+
+# Keyset paginated list endpoints (see blog/pagination.py)
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 20))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 100))
+
 # Security settings for production
 if not DEBUG:
     SECURE_HSTS_SECONDS = 31536000  # 1 year
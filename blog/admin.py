@@ -1,7 +1,26 @@
 from django.contrib import admin
-from .models import BlogPost, BlogImage, Comment
+from django.contrib.admin.views.main import ChangeList
+from .models import BlogPost, BlogImage, Comment, ImageJob, MediaBlob
+from .planner import plan_list_display
 from django.utils.html import format_html
 
+class PlannedChangeList(ChangeList):
+    """ChangeList loading only the columns and joins its list_display reads"""
+
+    def get_queryset(self, request, *args, **kwargs):
+        queryset = super().get_queryset(request, *args, **kwargs)
+        return plan_list_display(self.model_admin, self.list_display).apply(queryset)
+
+class PlannedListAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin whose changelist is a PlannedChangeList. list_sources maps the
+    list_display methods to the lookups they read (see blog.planner).
+    """
+    list_sources = {}
+
+    def get_changelist(self, request, **kwargs):
+        return PlannedChangeList
+
 class BlogImageInline(admin.TabularInline):
     model = BlogImage
     extra = 1
@@ -20,7 +39,7 @@ class CommentInline(admin.TabularInline):
     classes = ['collapse']
 
 @admin.register(BlogPost)
-class BlogPostAdmin(admin.ModelAdmin):
+class BlogPostAdmin(PlannedListAdmin):
     list_display = ('title', 'published', 'created_at', 'updated_at')
     list_filter = ('published', 'created_at')
     search_fields = ('title', 'content')
@@ -32,7 +51,7 @@ class BlogPostAdmin(admin.ModelAdmin):
     actions_on_bottom = True
     fieldsets = (
         ('Post Information', {
-            'fields': ('title', 'content'),
+            'fields': ('title', 'slug', 'content'),
             'classes': ('wide',),
         }),
         ('Publication', {
@@ -45,18 +64,41 @@ class BlogPostAdmin(admin.ModelAdmin):
         }),
     )
     readonly_fields = ('created_at', 'updated_at')
+    prepopulated_fields = {'slug': ('title',)}
 
     def view_on_site(self, obj):
-        return f"/api/posts/{obj.id}/"
+        return f"/api/posts/by-slug/{obj.slug}/"
+
+@admin.register(ImageJob)
+class ImageJobAdmin(PlannedListAdmin):
+    list_display = ('model_label', 'object_id', 'field_name', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status', 'model_label')
+    readonly_fields = ('model_label', 'object_id', 'field_name', 'source_name', 'attempts',
+                       'last_error', 'locked_at', 'created_at', 'updated_at')
+    list_per_page = 50
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(PlannedListAdmin):
+    list_display = ('name', 'size', 'refcount', 'updated_at')
+    search_fields = ('name', 'sha256', 'source_sha256')
+    readonly_fields = ('name', 'sha256', 'source_sha256', 'size', 'variants', 'refcount',
+                       'created_at', 'updated_at')
+    list_per_page = 50
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(PlannedListAdmin):
     list_display = ('author_info', 'content_preview', 'post_link', 'status_column', 'created_at')
     list_filter = ('approved', 'is_trash', 'created_at')
     search_fields = ('content', 'author_name', 'author_email', 'post__title')
     actions = ['approve_comments', 'unapprove_comments', 'trash_comments', 'restore_comments', 'delete_permanently']
     date_hierarchy = 'created_at'
     readonly_fields = ['ip_address', 'user_agent', 'created_at', 'updated_at']
+    list_sources = {
+        'author_info': ['author_name', 'author_email', 'ip_address'],
+        'content_preview': ['content', 'approved', 'is_trash'],
+        'post_link': ['post__title'],
+        'status_column': ['approved', 'is_trash'],
+    }
     
     class Media:
         js = ('js/admin/comment_actions.js',)
@@ -171,7 +213,8 @@ class CommentAdmin(admin.ModelAdmin):
     delete_permanently.short_description = "Delete selected comments permanently"
     
     def get_queryset(self, request):
-        queryset = super().get_queryset(request).select_related('post')
+        # The changelist joins the post title itself (see PlannedChangeList)
+        queryset = super().get_queryset(request)
         
         # Apply filters based on URL parameters
         is_trash = request.GET.get('is_trash')
@@ -207,10 +250,14 @@ class CommentAdmin(admin.ModelAdmin):
         return actions
 
 @admin.register(BlogImage)
-class BlogImageAdmin(admin.ModelAdmin):
+class BlogImageAdmin(PlannedListAdmin):
     list_display = ('post', 'image_preview', 'created_at')
     list_filter = ('created_at',)
     search_fields = ('post__title',)
+    list_sources = {
+        'post': ['post__title'],
+        'image_preview': ['image'],
+    }
     
     def image_preview(self, obj):
         if obj.image:
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        # Register cache invalidation and other model signal handlers
+        from . import signals  # noqa: F401
+        from . import checks  # noqa: F401
@@ -0,0 +1,165 @@
+import bisect
+import logging
+import re
+import threading
+
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import BlogPost, SharedVersion
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# SharedVersion bumped on every title change, so each worker knows when the
+# index it built no longer reflects writes made by other workers
+VERSION_NAME = 'autocomplete'
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    """Casefold and collapse punctuation/whitespace into single spaces"""
+    return ' '.join(_WORD_RE.findall((text or '').casefold()))
+
+
+class TitlePrefixIndex:
+    """
+    In-process sorted prefix index over published post titles and slugs.
+
+    Every word position of a title becomes a key, so "mumbai" finds
+    "Chauffeur services in Mumbai". A lookup is a binary search to the first
+    key with the prefix followed by a short forward scan. Local saves update
+    the index incrementally; writes made by other workers are noticed through
+    the shared version counter and trigger a rebuild on the next lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._posts = {}
+        self._version = None
+
+    def _entry_keys(self, post_id, title, slug):
+        words = normalize(title).split()
+        keys = {(' '.join(words[i:]), post_id) for i in range(len(words))}
+        if slug:
+            keys.add((normalize(slug.replace('-', ' ')), post_id))
+        return keys
+
+    def _add(self, post_id, title, slug):
+        keys = self._entry_keys(post_id, title, slug)
+        self._posts[post_id] = {'id': post_id, 'title': title, 'slug': slug, 'keys': keys}
+        for key in keys:
+            bisect.insort(self._keys, key)
+
+    def _remove(self, post_id):
+        entry = self._posts.pop(post_id, None)
+        if entry is None:
+            return
+        for key in entry['keys']:
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+    def _rebuild(self, version):
+        self._keys = []
+        self._posts = {}
+        rows = BlogPost.objects.filter(published=True).values_list('id', 'title', 'slug')
+        for post_id, title, slug in rows.iterator():
+            keys = self._entry_keys(post_id, title, slug)
+            self._posts[post_id] = {'id': post_id, 'title': title, 'slug': slug, 'keys': keys}
+            self._keys.extend(keys)
+        self._keys.sort()
+        self._version = version
+        logger.info(f"Rebuilt title autocomplete index with {len(self._posts)} posts")
+
+    def clear(self):
+        """Drop the index; the next lookup rebuilds it"""
+        with self._lock:
+            self._keys, self._posts, self._version = [], {}, None
+
+    def _shared_version(self):
+        return SharedVersion.objects.current(VERSION_NAME)
+
+    def post_changed(self, post, deleted=False):
+        """Apply a saved or deleted post to this worker's index"""
+        version = SharedVersion.objects.bump(VERSION_NAME)
+        with self._lock:
+            if self._version is None or version != self._version + 1:
+                # Missed writes from another worker: rebuild lazily
+                self._version = None
+                return
+            self._remove(post.pk)
+            if not deleted and post.published:
+                self._add(post.pk, post.title, post.slug)
+            self._version = version
+
+    def lookup(self, prefix, limit=10):
+        """Return up to limit published posts whose title or slug words start with prefix"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        version = self._shared_version()
+        with self._lock:
+            if version != self._version:
+                self._rebuild(version)
+
+            matches = {}
+            index = bisect.bisect_left(self._keys, (prefix,))
+            # Scan a bounded window so very short prefixes stay cheap
+            while index < len(self._keys) and len(matches) < limit * 4:
+                key, post_id = self._keys[index]
+                if not key.startswith(prefix):
+                    break
+                post = self._posts[post_id]
+                starts_title = normalize(post['title']).startswith(prefix)
+                if post_id not in matches or starts_title:
+                    matches[post_id] = (not starts_title, post['title'].casefold(), post_id)
+                index += 1
+
+            ranked = sorted(matches.values())[:limit]
+            return [
+                {'id': post_id, 'title': self._posts[post_id]['title'], 'slug': self._posts[post_id]['slug']}
+                for _, _, post_id in ranked
+            ]
+
+
+title_index = TitlePrefixIndex()
+
+
+def autocomplete_titles(prefix, limit=10):
+    """Top published posts matching prefix, titles starting with it first"""
+    if connection.vendor == 'postgresql':
+        return _autocomplete_postgresql(prefix, limit)
+    return title_index.lookup(prefix, limit)
+
+
+def track_post_change(post, deleted=False):
+    """Keep the in-process index current; PostgreSQL uses its trigram indexes"""
+    if connection.vendor != 'postgresql':
+        # Only committed writes may reach the shared index
+        transaction.on_commit(lambda: title_index.post_changed(post, deleted=deleted))
+
+
+def _autocomplete_postgresql(prefix, limit):
+    prefix = prefix.strip()
+    if not prefix:
+        return []
+    # ILIKE '%prefix%' and similarity() are both served by the pg_trgm GIN indexes
+    return list(
+        BlogPost.objects.filter(published=True)
+        .filter(Q(title__icontains=prefix) | Q(slug__icontains=prefix))
+        .annotate(
+            starts_title=Case(
+                When(title__istartswith=prefix, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+            similarity=TrigramSimilarity('title', prefix),
+        )
+        .order_by('starts_title', '-similarity', 'title')
+        .values('id', 'title', 'slug')[:limit]
+    )
@@ -0,0 +1,203 @@
+import hashlib
+import logging
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# Tag of the cached responses that render post titles (search, autocomplete)
+POST_LIST_TAG = 'post-list'
+
+
+class HitCounter:
+    """
+    Hit/miss counters of this process.
+
+    Kept in memory: a shared counter would be a write to one hot key on
+    every request, which on the database cache serializes every worker on
+    a single row.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        hits, misses = self.counts['hits'], self.counts['misses']
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / total, 4) if total else 0.0,
+        }
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+
+class TaggedCache:
+    """
+    Cache whose entries are invalidated through tags.
+
+    Every tag has a version token stored in the cache. An entry remembers the
+    token of each tag it was stored under and counts as a miss as soon as one
+    of those tokens changed or was evicted. Invalidation therefore only writes
+    the tag keys and never has to scan entries, so it works the same on the
+    local-memory, file-based and shared cache backends.
+    """
+
+    def __init__(self, alias='default', prefix='blog', timeout=300, counter=None):
+        self.alias = alias
+        self.prefix = prefix
+        self.timeout = timeout
+        self.counter = counter or HitCounter()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _tag_key(self, tag):
+        return f'{self.prefix}:tag:{tag}'
+
+    def _entry_key(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return f'{self.prefix}:entry:{digest}'
+
+    def tag_tokens(self, tags):
+        """Return the current token of each tag, creating missing ones"""
+        keys = [self._tag_key(tag) for tag in tags]
+        tokens = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in tokens]
+        if missing:
+            for key in missing:
+                self.cache.add(key, uuid.uuid4().hex, None)
+            tokens.update(self.cache.get_many(missing))
+        return tokens
+
+    def get(self, key):
+        """Return the cached value for key, or None when missing or stale"""
+        entry = self.cache.get(self._entry_key(key))
+        if entry is not None:
+            current = self.cache.get_many(list(entry['tags']))
+            if all(current.get(tag_key) == token for tag_key, token in entry['tags'].items()):
+                self.counter.record('hits')
+                return entry['value']
+        self.counter.record('misses')
+        return None
+
+    def lookup(self, key, tags):
+        """
+        Return (value, tokens) for key with a single cache read.
+
+        The entry and the tags it is expected under are fetched together.
+        On a miss value is None and tokens are what the recomputed value
+        should be stored with, created where they were missing.
+        """
+        entry_key = self._entry_key(key)
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        found = self.cache.get_many([entry_key, *tag_keys])
+        entry = found.pop(entry_key, None)
+        if entry is not None and entry['tags'] == found:
+            self.counter.record('hits')
+            return entry['value'], found
+        self.counter.record('misses')
+        missing = [tag_key for tag_key in tag_keys if tag_key not in found]
+        if missing:
+            for tag_key in missing:
+                self.cache.add(tag_key, uuid.uuid4().hex, None)
+            found.update(self.cache.get_many(missing))
+        return None, found
+
+    def set(self, key, value, tokens, timeout=None):
+        """
+        Store value under key.
+
+        tokens must come from tag_tokens() called *before* the value was
+        computed, so an invalidation racing with the computation makes the
+        entry stale instead of silently caching outdated data.
+        """
+        self.cache.set(
+            self._entry_key(key),
+            {'tags': tokens, 'value': value},
+            self.timeout if timeout is None else timeout
+        )
+
+    def invalidate(self, *tags):
+        """Make every entry stored under any of the given tags stale"""
+        if not tags:
+            return
+        self.cache.set_many({self._tag_key(tag): uuid.uuid4().hex for tag in tags}, None)
+        logger.debug(f"Invalidated cache tags: {tags}")
+
+    def stats(self):
+        """Return the hit/miss counters of this process"""
+        return self.counter.stats()
+
+    def reset_stats(self):
+        self.counter.reset()
+
+
+class VersionedCache:
+    """
+    Cache of values whose key names the version they were computed for.
+
+    A change produces a new version and therefore a new key, so entries
+    never need invalidating: there are no tags to read and nothing another
+    process has to hear about. Entries can live in a process-local cache,
+    and a hit costs no round-trip at all.
+    """
+
+    def __init__(self, alias='local', prefix='blog', timeout=300, counter=None):
+        self.alias = alias
+        self.prefix = prefix
+        self.timeout = timeout
+        self.counter = counter or HitCounter()
+
+    def _key(self, key, version):
+        digest = hashlib.sha1(f'{key}:{version}'.encode('utf-8')).hexdigest()
+        return f'{self.prefix}:body:{digest}'
+
+    def get(self, key, version):
+        value = caches[self.alias].get(self._key(key, version))
+        self.counter.record('misses' if value is None else 'hits')
+        return value
+
+    def set(self, key, version, value):
+        caches[self.alias].set(self._key(key, version), value, self.timeout)
+
+
+response_cache = TaggedCache(
+    alias=getattr(settings, 'API_RESPONSE_CACHE_ALIAS', 'default'),
+    prefix='blog-api',
+    timeout=getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300),
+)
+
+# Responses served under an ETag; counted together with response_cache
+response_bodies = VersionedCache(
+    alias=getattr(settings, 'API_BODY_CACHE_ALIAS', 'local'),
+    prefix='blog-api',
+    timeout=getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300),
+    counter=response_cache.counter,
+)
+
+
+def invalidate_posts(post_ids, include_list=False):
+    """
+    Invalidate cached responses of the given posts.
+
+    Post list, detail and by-slug bodies are cached under their ETag (see
+    response_bodies) and need nothing; include_list drops the tagged
+    responses that render post titles.
+    """
+    if include_list:
+        response_cache.invalidate(POST_LIST_TAG)
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backends whose entries no other process can see
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Warn when the caches holding invalidation tags and shared reports are
+    local to each process.
+
+    Everything still works in a per-process cache, which suits a single
+    development server. With several processes, though, web workers, the
+    image worker and management commands no longer invalidate each other's
+    tagged responses until they time out, and nplusone_report only sees
+    what its own process recorded.
+    """
+    aliases = {
+        'default',
+        getattr(settings, 'API_RESPONSE_CACHE_ALIAS', 'default'),
+        getattr(settings, 'NPLUSONE_REPORT_CACHE_ALIAS', 'default'),
+    }
+    warnings = []
+    for alias in sorted(aliases):
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in PROCESS_LOCAL_BACKENDS:
+            warnings.append(Warning(
+                f"The '{alias}' cache uses {backend}, which is local to each process.",
+                hint=(
+                    'Set REDIS_URL, or leave CACHE_BACKEND unset to use the database cache '
+                    '(manage.py createcachetable). A single-process development server can '
+                    'silence blog.W001.'
+                ),
+                id='blog.W001',
+            ))
+    return warnings
@@ -1,7 +1,7 @@
 from django.http import JsonResponse
 from rest_framework.decorators import api_view
 import logging
-from .models import Comment
+from .stats import comment_stats
 
 # Setup logger
 logger = logging.getLogger(__name__)
@@ -13,20 +13,17 @@ def comment_counts_direct(request):
         # Log the request for debugging
         logger.info(f"Direct access to comment_counts_direct endpoint: {request.path}")
         
-        # Force evaluate the counts to ensure they're accurate
-        all_count = Comment.objects.filter(is_trash=False).count()
-        pending_count = Comment.objects.filter(approved=False, is_trash=False).count()
-        approved_count = Comment.objects.filter(approved=True, is_trash=False).count()
-        trash_count = Comment.objects.filter(is_trash=True).count()
+        # All counts come from one cached aggregate query
+        counts = comment_stats.get()
         
         # Log counts for debugging
-        logger.info(f"Direct count method: all={all_count}, pending={pending_count}, approved={approved_count}, trash={trash_count}")
+        logger.info(f"Direct count method: all={counts['all']}, pending={counts['pending']}, approved={counts['approved']}, trash={counts['trash']}")
         
         response_data = {
-            'all': all_count,
-            'pending': pending_count,
-            'approved': approved_count,
-            'trash': trash_count,
+            'all': counts['all'],
+            'pending': counts['pending'],
+            'approved': counts['approved'],
+            'trash': counts['trash'],
             'status': 'success',
             'message': 'Comment counts retrieved successfully (direct method)',
             'path': request.path
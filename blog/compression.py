@@ -0,0 +1,162 @@
+import gzip
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# Bodies smaller than this are not worth the headers
+MIN_SIZE = 200
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/')
+
+
+def _gzip(data, level):
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data, level):
+    return brotli.compress(data, quality=level, mode=brotli.MODE_TEXT)
+
+
+# Encoder and (fast, thorough) levels of each coding, preferred first. Bodies
+# that are cached get the thorough level: it is paid once, not per request
+CODINGS = {
+    'br': (_brotli, 4, 9),
+    'gzip': (_gzip, 6, 9),
+}
+
+
+def available_codings():
+    return [coding for coding in CODINGS if coding != 'br' or brotli is not None]
+
+
+def negotiate(accept_encoding, codings):
+    """
+    Best of codings acceptable per an Accept-Encoding header, or None.
+
+    Codings with a higher q-value win; ties go to the order of codings.
+    """
+    weights = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in codings:
+        q = weights.get(coding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+class CompressedBodyCache:
+    """
+    Compressed response bodies keyed by the digest of the uncompressed body.
+
+    The key changes with the content, so entries never need invalidating and
+    every response that renders the same bytes shares one entry.
+    """
+
+    def __init__(self, alias='default', prefix='blog-compressed', timeout=300):
+        self.alias = alias
+        self.prefix = prefix
+        self.timeout = timeout
+
+    def _key(self, coding, content):
+        return f'{self.prefix}:{coding}:{hashlib.sha1(content).hexdigest()}'
+
+    def get_or_compress(self, coding, content):
+        cache = caches[self.alias]
+        key = self._key(coding, content)
+        compressed = cache.get(key)
+        if compressed is None:
+            encode, _, level = CODINGS[coding]
+            compressed = encode(content, level)
+            cache.set(key, compressed, self.timeout)
+        return compressed
+
+
+compressed_cache = CompressedBodyCache(
+    alias=getattr(settings, 'API_COMPRESSION_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'API_RESPONSE_CACHE_TIMEOUT', 300),
+)
+
+
+def is_cacheable(response):
+    """Responses served from the response cache or carrying a validator repeat their bytes"""
+    return response.has_header('ETag') or response.get('X-Cache') in ('HIT', 'MISS')
+
+
+class CompressionMiddleware:
+    """
+    Compress API responses with br or gzip, as negotiated by Accept-Encoding.
+
+    Only paths under API_COMPRESSION_PATHS are handled. Bodies that come from
+    the response cache or have an ETag are compressed once and kept in
+    compressed_cache; other bodies are compressed on every request at a
+    faster level.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = tuple(getattr(settings, 'API_COMPRESSION_PATHS', ['/api/']))
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not request.path.startswith(self.paths):
+            return response
+        return self.compress(request, response)
+
+    def compress(self, request, response):
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < MIN_SIZE:
+            return response
+
+        coding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''), available_codings())
+        if coding is None:
+            return response
+
+        if is_cacheable(response):
+            compressed = compressed_cache.get_or_compress(coding, response.content)
+        else:
+            encode, level, _ = CODINGS[coding]
+            compressed = encode(response.content, level)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = coding
+        # The compressed bytes differ from the identity ones
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,115 @@
+import hashlib
+from calendar import timegm
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .models import COMMENT_COUNTER_FIELDS, BlogPost, BlogImage, Comment
+
+
+def _validators(kind, last_modified, *parts):
+    """Build a strong ETag and Last-Modified timestamp from aggregate state"""
+    fingerprint = ':'.join([kind] + [str(part) for part in parts])
+    etag = quote_etag(hashlib.sha1(fingerprint.encode('utf-8')).hexdigest())
+    timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+    return etag, timestamp
+
+
+def _aggregate(queryset, field):
+    """Correlated subquery returning a single aggregate for OuterRef('pk')"""
+    return Subquery(
+        queryset.order_by().values('post').annotate(value=field).values('value')[:1]
+    )
+
+
+def post_detail_validators(pk):
+    """
+    Validators for the post detail response.
+
+    The detail embeds images and approved comments, so their latest change and
+    count are part of the fingerprint, as are the comment counters (which
+    change without touching updated_at). Everything is fetched in one query
+    without loading the post body.
+    """
+    approved = Comment.objects.filter(post=OuterRef('pk'), approved=True)
+    images = BlogImage.objects.filter(post=OuterRef('pk'))
+    state = BlogPost.objects.filter(pk=pk).annotate(
+        comments_updated=_aggregate(approved, Max('updated_at')),
+        comments_count=Coalesce(_aggregate(approved, Count('id')), 0),
+        images_updated=_aggregate(images, Max('updated_at')),
+        images_count=Coalesce(_aggregate(images, Count('id')), 0),
+    ).values('id', 'updated_at', 'comments_updated', 'comments_count',
+             'images_updated', 'images_count', *COMMENT_COUNTER_FIELDS).first()
+    if state is None:
+        return None
+
+    last_modified = max(
+        value for value in (state['updated_at'], state['comments_updated'], state['images_updated'])
+        if value is not None
+    )
+    return _validators(
+        'post', last_modified, state['id'], state['updated_at'].isoformat(),
+        state['comments_updated'], state['comments_count'],
+        state['images_updated'], state['images_count'],
+        *(state[field] for field in COMMENT_COUNTER_FIELDS)
+    )
+
+
+def post_list_validators(window):
+    """
+    Validators for one page of the post list, from the ids and update times
+    of the rows in its window (see KeysetPagination.page_window). Only the
+    page's index range is read, never the whole table.
+    """
+    rows = list(window.values_list('id', 'updated_at'))
+    last = max((updated_at for _, updated_at in rows), default=None)
+    return _validators('posts', last, *(f'{pk}@{updated_at.isoformat()}' for pk, updated_at in rows))
+
+
+def comment_list_validators(post_id, approved=None, kind='comments'):
+    """
+    Validators for the comments of one post, optionally by approval state.
+    kind keeps the ETags of different representations of the same rows apart.
+    """
+    queryset = Comment.objects.filter(post=post_id)
+    if approved is not None:
+        queryset = queryset.filter(approved=approved)
+    # The post title is rendered into every comment, so a post change counts too
+    state = queryset.order_by().aggregate(
+        last=Max('updated_at'),
+        count=Count('id'),
+        post_updated=Max('post__updated_at'),
+    )
+    last_modified = max(
+        (value for value in (state['last'], state['post_updated']) if value is not None),
+        default=None
+    )
+    return _validators(
+        kind, last_modified, post_id, approved,
+        state['last'], state['count'], state['post_updated']
+    )
+
+
+def conditional_response(request, validators, handler, *args, **kwargs):
+    """
+    Answer a GET with 304 when the client's If-None-Match/If-Modified-Since
+    still matches, otherwise call handler and attach ETag and Last-Modified.
+    """
+    if validators is None:
+        return handler(request, *args, **kwargs)
+
+    etag, last_modified = validators
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = handler(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Let clients keep the body but revalidate on every use
+    patch_cache_control(response, no_cache=True)
+    return response
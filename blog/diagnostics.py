@@ -0,0 +1,65 @@
+import json
+
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.functional import cached_property
+
+# Request header asking for diagnostics; the response header carrying them
+HEADER = 'X-Diagnostics'
+META_KEY = 'HTTP_X_DIAGNOSTICS'
+# Header values beyond this are cut short
+MAX_HEADER_LENGTH = 8192
+
+
+class Diagnostics:
+    """
+    Findings of one request, named by key.
+
+    Only created for staff users who send an X-Diagnostics header, so code
+    guarded by `if diagnostics is not None` (extra counts, samples, SQL)
+    costs nothing on normal requests.
+    """
+
+    def __init__(self):
+        self.findings = {}
+
+    def add(self, key, value):
+        self.findings[key] = value
+
+    def header_value(self):
+        value = json.dumps(self.findings, default=str, separators=(',', ':'))
+        if len(value) > MAX_HEADER_LENGTH:
+            value = json.dumps({'truncated': True, 'keys': list(self.findings)}, separators=(',', ':'))
+        return value
+
+
+def request_diagnostics(request):
+    """Diagnostics for a DRF request, or None unless a staff user asked for them"""
+    if not request.META.get(META_KEY):
+        return None
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_staff:
+        return None
+    return Diagnostics()
+
+
+class DiagnosticsViewMixin:
+    """
+    API view with opt-in diagnostics.
+
+    Handlers record findings on self.diagnostics when it is not None; they
+    are returned as JSON in the X-Diagnostics response header, on a private
+    response that shared caches do not reuse.
+    """
+
+    @cached_property
+    def diagnostics(self):
+        return request_diagnostics(self.request)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        patch_vary_headers(response, (HEADER,))
+        diagnostics = self.diagnostics if request.META.get(META_KEY) else None
+        if diagnostics is not None:
+            response[HEADER] = diagnostics.header_value()
+            patch_cache_control(response, private=True, no_store=True)
+        return response
@@ -0,0 +1,90 @@
+from .planner import plan_serializer
+
+
+def _split(value):
+    if value is None:
+        return None
+    return frozenset(name.strip() for name in value.split(',') if name.strip())
+
+
+class Fieldset:
+    """
+    Fields and expansions requested with ?fields= and ?expand=.
+
+    fields names the top-level fields to return; None returns all of them.
+    expand names the relations to embed; None embeds every relation, as
+    responses did before these parameters existed. Unknown names are ignored.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        """The Fieldset of a request, or None when it asks for the full representation"""
+        params = request.query_params
+        if 'fields' not in params and 'expand' not in params:
+            return None
+        return cls(_split(params.get('fields')), _split(params.get('expand')))
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        return self.includes(name) and (self.expand is None or name in self.expand)
+
+    def __str__(self):
+        # Stable across parameter order; part of the fragment cache keys
+        fields = ','.join(sorted(self.fields)) if self.fields is not None else '*'
+        expand = ','.join(sorted(self.expand)) if self.expand is not None else '*'
+        return f'{fields};{expand}'
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer trimmed to the Fieldset in context['fieldset'].
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.context.get('fieldset')
+        if fieldset is None:
+            return fields
+        return {name: field for name, field in fields.items() if fieldset.includes(name)}
+
+    def expands(self, name):
+        fieldset = self.context.get('fieldset')
+        return fieldset is None or fieldset.expands(name)
+
+
+class SparseFieldsetViewMixin:
+    """
+    ViewSet passing the Fieldset of GET requests to its serializers.
+
+    get_queryset() implementations use plan_queryset() to load only what the
+    trimmed representation needs.
+    """
+
+    def get_fieldset(self):
+        if self.request.method not in ('GET', 'HEAD'):
+            return None
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = Fieldset.from_request(self.request)
+        return self._fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        return context
+
+    def plan_queryset(self, queryset, *lookups):
+        """
+        queryset loading only what the serializer for this request renders
+        (see blog.planner), plus lookups the view reads itself
+        """
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        plan = plan_serializer(serializer)
+        for lookup in lookups:
+            plan.read(lookup)
+        return plan.apply(queryset)
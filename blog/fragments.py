@@ -0,0 +1,175 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+
+class RawJSON(bytes):
+    """An already encoded JSON value, written into the response as it is"""
+
+
+class FragmentJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that copies RawJSON values into the output unchanged.
+
+    The containers around them (page links, the results list) are encoded
+    here, so rendering a list of cached fragments is mostly a join.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None:
+            # Pretty printing re-indents everything, fragments included
+            return super().render(expand_fragments(data), accepted_media_type, renderer_context)
+        parts = []
+        self._encode(data, parts)
+        return b''.join(parts)
+
+    def _encode(self, value, parts):
+        if isinstance(value, RawJSON):
+            parts.append(value)
+        elif isinstance(value, dict):
+            parts.append(b'{')
+            for index, (key, item) in enumerate(value.items()):
+                if index:
+                    parts.append(b',')
+                parts.append(encode_value(str(key)))
+                parts.append(b':')
+                self._encode(item, parts)
+            parts.append(b'}')
+        elif isinstance(value, (list, tuple)):
+            parts.append(b'[')
+            for index, item in enumerate(value):
+                if index:
+                    parts.append(b',')
+                self._encode(item, parts)
+            parts.append(b']')
+        else:
+            parts.append(encode_value(value))
+
+
+def encode_value(value):
+    """Encode a value exactly as FragmentJSONRenderer encodes its containers"""
+    renderer = FragmentJSONRenderer
+    encoded = json.dumps(
+        value, cls=renderer.encoder_class, ensure_ascii=renderer.ensure_ascii,
+        allow_nan=not renderer.strict, separators=(',', ':')
+    )
+    # Like JSONRenderer, keep the output valid JavaScript
+    return encoded.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode('utf-8')
+
+
+def expand_fragments(data):
+    """data with every RawJSON decoded back into Python values"""
+    if isinstance(data, RawJSON):
+        return json.loads(data)
+    if isinstance(data, dict):
+        return {key: expand_fragments(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [expand_fragments(value) for value in data]
+    return data
+
+
+class FragmentCache:
+    """
+    Encoded representations of single objects.
+
+    An entry is keyed by the serializer, its fragment_version and field
+    selection, the object and the timestamps its representation depends on,
+    plus the request origin (URLs in the output are absolute). Any change therefore produces
+    a new key and stale entries simply expire.
+    """
+
+    def __init__(self, alias='default', prefix='blog-fragment', timeout=3600):
+        self.alias = alias
+        self.prefix = prefix
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def key(self, serializer, instance, origin):
+        return self.object_key(
+            serializer, instance._meta.label_lower, instance.pk, serializer.fragment_stamps(instance), origin
+        )
+
+    def object_key(self, serializer, label, pk, stamps, origin):
+        """key() from the parts of an object, for callers without a model instance"""
+        stamps = ':'.join(stamp.isoformat() if stamp is not None else '-' for stamp in stamps)
+        return (
+            f'{self.prefix}:{type(serializer).__name__}:{serializer.fragment_version}:'
+            f'{serializer.fragment_variant()}:{label}:{pk}:{stamps}:{origin}'
+        )
+
+    def render_many(self, serializer, instances, origin):
+        """RawJSON of every instance, serializing only the cache misses"""
+        keys = [self.key(serializer, instance, origin) for instance in instances]
+        return self.render_keyed(keys, instances, serializer.to_representation)
+
+    def render_keyed(self, keys, items, represent):
+        """RawJSON of every item under its key, calling represent(item) only for the cache misses"""
+        cached = self.cache.get_many(keys)
+        missing = {}
+        fragments = []
+        for key, item in zip(keys, items):
+            fragment = cached.get(key)
+            if fragment is None:
+                fragment = encode_value(represent(item))
+                missing[key] = fragment
+            fragments.append(RawJSON(fragment))
+        if missing:
+            self.cache.set_many(missing, self.timeout)
+        return fragments
+
+
+fragment_cache = FragmentCache(
+    alias=getattr(settings, 'API_FRAGMENT_CACHE_ALIAS', 'default'),
+    timeout=getattr(settings, 'API_FRAGMENT_CACHE_TIMEOUT', 3600),
+)
+
+
+def fragments_enabled(context):
+    """Whether the response for context is rendered by FragmentJSONRenderer"""
+    request = context.get('request')
+    renderer = getattr(request, 'accepted_renderer', None)
+    return isinstance(renderer, FragmentJSONRenderer)
+
+
+class FragmentListSerializer(serializers.ListSerializer):
+    """ListSerializer that serves its items from fragment_cache"""
+
+    def to_representation(self, data):
+        if not fragments_enabled(self.context):
+            return super().to_representation(data)
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        request = self.context['request']
+        return fragment_cache.render_many(self.child, list(iterable), request.build_absolute_uri('/'))
+
+
+class FragmentCachedSerializerMixin:
+    """
+    Cache the encoded representation of each object in list responses.
+
+    Use together with Meta.list_serializer_class = FragmentListSerializer.
+    fragment_stamps() returns the timestamps the representation depends on;
+    bump fragment_version whenever the output format changes.
+    """
+    fragment_version = 1
+
+    def fragment_stamps(self, instance):
+        return [instance.updated_at]
+
+    def fragment_variant(self):
+        """Which representation of an object this serializer renders (see blog.fieldsets)"""
+        fieldset = self.context.get('fieldset')
+        return str(fieldset) if fieldset is not None else '*'
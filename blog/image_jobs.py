@@ -0,0 +1,328 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import invalidate_posts
+from .images import delete_variants, optimize_stored
+from .models import (
+    IMAGE_FAILED, IMAGE_PROCESSING, IMAGE_READY, BlogImage, BlogPost, ImageJob, MediaBlob,
+    find_optimized_upload,
+)
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# A running job whose worker has not finished after this long is considered
+# abandoned (crashed or killed worker) and may be claimed again
+STALE_AFTER = timedelta(minutes=10)
+
+# Base delay before a failed job is retried; doubles on every attempt
+RETRY_DELAY = timedelta(seconds=30)
+
+# Fields holding the processing state and the variants of each image field
+IMAGE_FIELDS = {
+    ('blog.blogpost', 'featured_image'): ('featured_image_state', 'featured_image_variants'),
+    ('blog.blogimage', 'image'): ('image_state', 'image_variants'),
+}
+
+
+def claim_jobs(limit=10):
+    """
+    Mark up to limit runnable jobs as running and return them.
+
+    Rows are locked with SKIP LOCKED where the database supports it, so
+    several workers can poll the same table without handing out a job twice.
+    """
+    now = timezone.now()
+    runnable = (
+        Q(status=ImageJob.PENDING, run_after__lte=now)
+        | Q(status=ImageJob.RUNNING, locked_at__lt=now - STALE_AFTER)
+    )
+    with transaction.atomic():
+        queryset = ImageJob.objects.filter(runnable).order_by('run_after', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        jobs = list(queryset[:limit])
+        if not jobs:
+            return []
+        for job in jobs:
+            job.status = ImageJob.RUNNING
+            job.locked_at = now
+            job.attempts += 1
+        ImageJob.objects.bulk_update(jobs, ['status', 'locked_at', 'attempts', 'updated_at'])
+    return jobs
+
+
+def _target(job):
+    model = apps.get_model(job.model_label)
+    return model, model._meta.get_field(job.field_name), IMAGE_FIELDS[(job.model_label, job.field_name)]
+
+
+def _affected_post_ids(model, object_id):
+    if model is BlogPost:
+        return [object_id]
+    return list(BlogImage.objects.filter(pk=object_id).values_list('post_id', flat=True))
+
+
+def _finish(job, status, error=''):
+    job.status = status
+    job.last_error = error
+    job.locked_at = None
+    job.save(update_fields=['status', 'last_error', 'locked_at', 'updated_at'])
+
+
+def process_pool(workers=None):
+    """
+    Process pool for CPU-bound image encoding, sized to the available cores.
+
+    Workers start from a fork server instead of being forked from this
+    process, so they never inherit its open database connections.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context('forkserver'),
+    )
+
+
+# Pool shared by inline encoding in this process, created on first use
+_shared_pool = None
+
+
+def shared_pool():
+    """The process pool of this process, started once instead of per request"""
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = process_pool()
+    return _shared_pool
+
+
+def _outcome(call, *args):
+    try:
+        return call(*args)
+    except Exception as e:
+        return e
+
+
+def optimize_many(storage, names, pool=None):
+    """
+    optimize_stored() every name, across a process pool when there are several.
+
+    Results come back in input order; a failed image yields its exception
+    instead of a result.
+    """
+    if pool is None and len(names) > 1:
+        pool = shared_pool()
+    if pool is None:
+        return [_outcome(optimize_stored, storage, name) for name in names]
+    futures = [pool.submit(optimize_stored, storage, name) for name in names]
+    return [_outcome(future.result) for future in futures]
+
+
+def register_result(result):
+    """Record the blob an optimize_stored() result wrote, outside the worker"""
+    if result.get('blob'):
+        MediaBlob.objects.register(result['name'], result['blob']['sha256'], result['blob']['size'])
+
+
+def attach_images(post, files):
+    """
+    Store uploaded files as images of post with a single bulk INSERT.
+
+    The files are written to storage first, then every BlogImage row (and,
+    in background mode, its ImageJob) is inserted in one transaction. With
+    IMAGE_PROCESSING_ASYNC off the batch is encoded across a process pool
+    before the insert. Returns the created images.
+    """
+    field = BlogImage._meta.get_field('image')
+    storage = field.storage
+    images = []
+    # Images that still need encoding, with the digest of their upload
+    pending = []
+    try:
+        for upload in files:
+            image = BlogImage(post=post)
+            digest, blob = find_optimized_upload(upload)
+            if blob is not None:
+                # Seen before: reuse the optimized file, nothing to encode
+                image.image = blob.name
+                image.image_variants = blob.variants
+            else:
+                image.image = storage.save(
+                    field.generate_filename(image, upload.name), upload, max_length=field.max_length
+                )
+                pending.append((image, digest))
+            images.append(image)
+
+        if settings.IMAGE_PROCESSING_ASYNC:
+            for image, _ in pending:
+                image.image_state = IMAGE_PROCESSING
+        else:
+            results = optimize_many(storage, [image.image.name for image, _ in pending])
+            for (image, digest), result in zip(pending, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Error optimizing image: {str(result)}")
+                    continue
+                register_result(result)
+                if result['name'] != image.image.name:
+                    storage.delete(image.image.name)
+                image.image = result['name']
+                image.image_variants = result['variants']
+                MediaBlob.objects.record_optimized(result['name'], digest, result['variants'])
+
+        with transaction.atomic():
+            BlogImage.objects.bulk_create(images)
+            MediaBlob.objects.retain([image.image.name for image in images])
+            if settings.IMAGE_PROCESSING_ASYNC:
+                ImageJob.objects.bulk_create([ImageJob.for_field(image, 'image') for image, _ in pending])
+    except Exception:
+        for image in images:
+            storage.delete(image.image.name)
+            delete_variants(storage, image.image_variants)
+        raise
+
+    # bulk_create sends no post_save signals
+    invalidate_posts([post.pk])
+    return images
+
+
+def prepare_job(job):
+    """Whether the image of job is still current; finishes superseded jobs"""
+    model, _, _ = _target(job)
+    if model.objects.filter(pk=job.object_id, **{job.field_name: job.source_name}).exists():
+        return True
+    # Replaced by a newer upload or deleted while queued
+    _finish(job, ImageJob.DONE, 'Superseded')
+    return False
+
+
+def process_jobs(jobs, pool, max_attempts=3):
+    """
+    Encode claimed jobs across pool and swap in the results.
+
+    Only the encoding runs in the worker processes; the database work stays
+    in this process. Yields (job, final status) in claim order.
+    """
+    scheduled = []
+    for job in jobs:
+        if not prepare_job(job):
+            continue
+        result = _reusable_result(job)
+        if result is None:
+            result = pool.submit(optimize_stored, _target(job)[1].storage, job.source_name)
+        scheduled.append((job, result))
+    for job, result in scheduled:
+        if isinstance(result, Future):
+            result = _outcome(result.result)
+        yield job, complete_job(job, result, max_attempts=max_attempts)
+
+
+def run_job(job, max_attempts=3):
+    """Process one claimed job in this process. Returns the final job status."""
+    if not prepare_job(job):
+        return job.status
+    _, field, _ = _target(job)
+    result = _reusable_result(job) or optimize_many(field.storage, [job.source_name])[0]
+    return complete_job(job, result, max_attempts=max_attempts)
+
+
+def _source_digest(job):
+    return MediaBlob.objects.filter(name=job.source_name).values_list('sha256', flat=True).first()
+
+
+def _reusable_result(job):
+    """An earlier result for the same source bytes, so they are not encoded twice"""
+    digest = _source_digest(job)
+    blob = MediaBlob.objects.optimized_for(digest) if digest else None
+    if blob is None:
+        return None
+    return {'name': blob.name, 'variants': blob.variants}
+
+
+def complete_job(job, result, max_attempts=3):
+    """
+    Swap the optimize_stored() result of a job into its row.
+
+    The optimized file and its responsive variants were written next to the
+    original; they are swapped in with a compare-and-swap UPDATE that only
+    matches while the row still points at the original upload, so a newer
+    upload or a deleted row is never overwritten. result may be the
+    exception raised while encoding. Returns the final job status.
+    """
+    model, field, (state_field, variants_field) = _target(job)
+    storage = field.storage
+    if isinstance(result, Exception):
+        return _retry_or_fail(job, model, state_field, result, max_attempts)
+
+    new_name, variants = result['name'], result['variants']
+    try:
+        # Registered even if the swap fails, so collect_media can reclaim it
+        register_result(result)
+        now = timezone.now()
+        # Queryset updates skip auto_now, but the ETags depend on it
+        changes = {
+            job.field_name: new_name, state_field: IMAGE_READY, variants_field: variants, 'updated_at': now,
+        }
+        with transaction.atomic():
+            rows = model.objects.filter(pk=job.object_id, **{job.field_name: job.source_name})
+            swapped = rows.update(**changes)
+            post_ids = _affected_post_ids(model, job.object_id)
+            if swapped:
+                digest = _source_digest(job)
+                if digest:
+                    MediaBlob.objects.record_optimized(new_name, digest, variants)
+                MediaBlob.objects.update_references({job.source_name}, {new_name})
+            if swapped and model is BlogImage:
+                BlogPost.objects.filter(pk__in=post_ids).update(updated_at=now)
+    except Exception as e:
+        _discard(storage, new_name, variants)
+        return _retry_or_fail(job, model, state_field, e, max_attempts)
+
+    if not swapped:
+        _discard(storage, new_name, variants)
+        _finish(job, ImageJob.DONE, 'Superseded')
+        return job.status
+
+    if new_name != job.source_name:
+        storage.delete(job.source_name)
+    invalidate_posts(post_ids, include_list=True)
+    _finish(job, ImageJob.DONE)
+    logger.info(f"Optimized image: {new_name}")
+    return job.status
+
+
+def _discard(storage, name, variants):
+    """Remove files written for a result that will not be used"""
+    delete_variants(storage, variants)
+    if name:
+        storage.delete(name)
+
+
+def _retry_or_fail(job, model, state_field, error, max_attempts):
+    message = f"{type(error).__name__}: {error}"
+    if job.attempts >= max_attempts:
+        logger.error(f"Giving up on image job {job.pk} after {job.attempts} attempts: {message}")
+        now = timezone.now()
+        with transaction.atomic():
+            # Queryset updates skip auto_now, but the ETags depend on it
+            failed = model.objects.filter(
+                pk=job.object_id, **{job.field_name: job.source_name}
+            ).update(**{state_field: IMAGE_FAILED, 'updated_at': now})
+            post_ids = _affected_post_ids(model, job.object_id)
+            if failed and model is BlogImage:
+                BlogPost.objects.filter(pk__in=post_ids).update(updated_at=now)
+        invalidate_posts(post_ids, include_list=True)
+        _finish(job, ImageJob.FAILED, message)
+    else:
+        logger.warning(f"Image job {job.pk} failed (attempt {job.attempts}), retrying: {message}")
+        job.run_after = timezone.now() + RETRY_DELAY * 2 ** (job.attempts - 1)
+        job.save(update_fields=['run_after', 'updated_at'])
+        _finish(job, ImageJob.PENDING, message)
+    return job.status
@@ -0,0 +1,250 @@
+import os
+import posixpath
+import tempfile
+import logging
+
+from PIL import Image, UnidentifiedImageError, features
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# Encoded output up to this size stays in memory, larger output spills to a
+# temporary file instead of being buffered (and copied) in RAM
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+def inspect_image(source):
+    """
+    Check an image against the upload limits by reading only its header.
+
+    Returns (format, width, height) without decoding any pixel data and
+    leaves source at its original position. Raises ValidationError for
+    unreadable files, formats outside IMAGE_ALLOWED_FORMATS and images above
+    IMAGE_MAX_PIXELS (decompression bombs).
+    """
+    position = source.tell()
+    try:
+        img = Image.open(source)
+        img_format, (width, height) = img.format, img.size
+    except Image.DecompressionBombError:
+        raise ValidationError('Image dimensions are too large.', code='image_too_large')
+    except (UnidentifiedImageError, OSError):
+        raise ValidationError('Upload a valid image.', code='invalid_image')
+    finally:
+        source.seek(position)
+
+    if img_format not in settings.IMAGE_ALLOWED_FORMATS:
+        raise ValidationError(f'Unsupported image format: {img_format}.', code='invalid_image_format')
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Image is {width}x{height} pixels; at most {settings.IMAGE_MAX_PIXELS} pixels are allowed.',
+            code='image_too_large'
+        )
+    return img_format, width, height
+
+
+def validate_image_upload(value):
+    """Model field validator running inspect_image() on new uploads"""
+    if getattr(value, '_committed', False):
+        # Already in storage, checked when it was uploaded
+        return
+    inspect_image(value)
+
+
+def decode_image(source, max_dimension=None):
+    """
+    Decode an image, fitting it within max_dimension x max_dimension.
+
+    The limits are checked from the header first. Large JPEGs are shrunk
+    while decoding (Image.draft picks a DCT scale), and the remaining
+    downscale uses reduce() before resampling, so a huge photo is never
+    materialized at full resolution.
+    """
+    inspect_image(source)
+    img = Image.open(source)
+    if max_dimension and max(img.size) > max_dimension:
+        # On an unloaded image thumbnail() drafts, reduces, then resamples
+        img.thumbnail((max_dimension, max_dimension), Image.LANCZOS, reducing_gap=2.0)
+    else:
+        img.load()
+    return img
+
+
+def _spooled(img, **params):
+    """Encode img into a File backed by a spooled temporary file"""
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    img.save(output, **params)
+    output.seek(0)
+    return File(output)
+
+
+def optimized_name(name, convert_to_webp=True):
+    """Storage name the optimized version of name is saved under"""
+    filename = os.path.basename(name)
+    if convert_to_webp:
+        return f"{os.path.splitext(filename)[0]}.webp"
+    return filename
+
+
+def encode_decoded(img, name, quality=85, convert_to_webp=True):
+    """encode_optimized() for an already decoded image"""
+    if convert_to_webp and img.mode in ('RGB', 'RGBA'):
+        content = _spooled(img, format='WEBP', quality=quality, optimize=True)
+        filename = optimized_name(name)
+    else:
+        img_format = img.format if img.format else 'JPEG'
+        content = _spooled(img, format=img_format, quality=quality, optimize=True)
+        filename = optimized_name(name, convert_to_webp=False)
+    return filename, content
+
+
+def encode_optimized(source, name, quality=85, convert_to_webp=True):
+    """
+    Compress an image and optionally convert it to WebP.
+
+    source is any file-like object PIL can open. Returns a (filename, File)
+    pair ready for FieldFile.save()/Storage.save(); close the File when done.
+    RGB/RGBA images become WebP, other modes are recompressed in their
+    original format. Images larger than IMAGE_MAX_DIMENSION are downscaled.
+    """
+    img = decode_image(source, settings.IMAGE_MAX_DIMENSION)
+    return encode_decoded(img, name, quality=quality, convert_to_webp=convert_to_webp)
+
+
+def optimize_stored(storage, name, quality=85):
+    """
+    Optimize a stored image and build its variants, keeping the original.
+
+    The source is decoded once for both. On content-addressed storage the
+    optimized file is written with save_blob(), so nothing here touches the
+    database and it can run in a worker process; the caller registers the
+    blob. Returns {'name': optimized name, 'variants': build_variants()
+    structure, 'blob': {'sha256', 'size'} or None}.
+    """
+    with storage.open(name, 'rb') as source:
+        img = decode_image(source, settings.IMAGE_MAX_DIMENSION)
+
+    filename, content = encode_decoded(img, name, quality=quality)
+    target = posixpath.join(posixpath.dirname(name), filename)
+    blob = None
+    with content:
+        if hasattr(storage, 'save_blob'):
+            new_name, sha256, size = storage.save_blob(target, content)
+            blob = {'sha256': sha256, 'size': size}
+        else:
+            new_name = storage.save(target, content)
+    try:
+        variants = write_variants(img, storage, new_name)
+    except Exception:
+        storage.delete(new_name)
+        raise
+    return {'name': new_name, 'variants': variants, 'blob': blob}
+
+
+# Pillow save format and MIME type of each variant format
+VARIANT_FORMATS = {
+    'avif': ('AVIF', 'image/avif'),
+    'webp': ('WEBP', 'image/webp'),
+}
+
+
+def variant_formats():
+    """Configured variant formats this Pillow build can encode"""
+    formats = []
+    for fmt in getattr(settings, 'IMAGE_VARIANT_FORMATS', ['avif', 'webp']):
+        try:
+            supported = features.check(fmt)
+        except ValueError:
+            supported = False
+        if fmt in VARIANT_FORMATS and supported:
+            formats.append(fmt)
+    return formats
+
+
+def variant_name(name, width, fmt):
+    """Storage name of one variant, next to the original"""
+    stem = os.path.splitext(posixpath.basename(name))[0]
+    return posixpath.join(posixpath.dirname(name), f"{stem}-{width}w.{fmt}")
+
+
+def build_variants(storage, name, widths=None, formats=None, quality=80):
+    """
+    Write downscaled variants of a stored image and describe them.
+
+    Every configured width narrower than the original is encoded once per
+    supported format. Returns the JSON structure kept on the model:
+    {'source': name, 'width': ..., 'height': ..., 'variants': [{'name',
+    'width', 'height', 'format'}, ...]}, widest first.
+    """
+    widths = widths or getattr(settings, 'IMAGE_VARIANT_WIDTHS', [320, 640, 1024, 1600])
+    with storage.open(name, 'rb') as source:
+        img = Image.open(source)
+        original_size = img.size
+        # Nothing wider than the largest variant is ever needed
+        largest = max((width for width in widths if width < img.width), default=None)
+        if largest is not None:
+            img.thumbnail((largest, img.height), Image.LANCZOS, reducing_gap=2.0)
+        img.load()
+    return write_variants(img, storage, name, widths, formats, quality, original_size)
+
+
+def write_variants(img, storage, name, widths=None, formats=None, quality=80, original_size=None):
+    """build_variants() for an already decoded image"""
+    widths = widths or getattr(settings, 'IMAGE_VARIANT_WIDTHS', [320, 640, 1024, 1600])
+    formats = variant_formats() if formats is None else formats
+    original_width, original_height = original_size or img.size
+
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA') else 'RGB')
+
+    # Content-addressed storage keeps variants of a blob under fixed names,
+    # so variants that already exist need no encoding
+    derived = hasattr(storage, 'save_derived')
+    variants = []
+    for width in sorted(set(widths), reverse=True):
+        if width >= original_width:
+            continue
+        height = max(1, round(original_height * width / original_width))
+        # Each size is resampled from the previous, larger one
+        if img.size != (width, height):
+            img = img.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for fmt in formats:
+            saved = variant_name(name, width, fmt)
+            if not (derived and storage.exists(saved)):
+                with _spooled(img, format=VARIANT_FORMATS[fmt][0], quality=quality) as content:
+                    save = storage.save_derived if derived else storage.save
+                    saved = save(saved, content)
+            variants.append({'name': saved, 'width': width, 'height': height, 'format': fmt})
+
+    return {'source': name, 'width': original_width, 'height': original_height, 'variants': variants}
+
+
+def delete_variants(storage, data):
+    """Remove the files listed in a build_variants() structure"""
+    for variant in (data or {}).get('variants', []):
+        try:
+            storage.delete(variant['name'])
+        except OSError as e:
+            logger.warning(f"Could not delete image variant {variant['name']}: {str(e)}")
+
+
+def srcset(data, url):
+    """
+    <picture> sources for a build_variants() structure.
+
+    url maps a storage name to a URL. Returns one {'type', 'srcset'} entry per
+    format, the most efficient format first, or an empty list.
+    """
+    sources = []
+    for fmt in VARIANT_FORMATS:
+        candidates = [
+            f"{url(variant['name'])} {variant['width']}w"
+            for variant in sorted((data or {}).get('variants', []), key=lambda v: v['width'])
+            if variant['format'] == fmt
+        ]
+        if candidates:
+            sources.append({'type': VARIANT_FORMATS[fmt][1], 'srcset': ', '.join(candidates)})
+    return sources
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog.cache import invalidate_posts
+from blog.models import BlogPost
+from blog.text import summarize
+
+SUMMARY_FIELDS = ('excerpt', 'word_count', 'reading_time')
+
+
+class Command(BaseCommand):
+    help = 'Compute the excerpt, word count and reading time of existing posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Posts loaded and updated per batch (default: 200)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        last_pk = 0
+        changed = 0
+        while True:
+            posts = list(
+                BlogPost.objects.filter(pk__gt=last_pk).order_by('pk')
+                .only('id', 'content', *SUMMARY_FIELDS)[:batch_size]
+            )
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+
+            now = timezone.now()
+            stale = []
+            for post in posts:
+                summary = summarize(post.content)
+                if summary != tuple(getattr(post, field) for field in SUMMARY_FIELDS):
+                    post.excerpt, post.word_count, post.reading_time = summary
+                    # The representation changed, so must the ETags and cache keys
+                    post.updated_at = now
+                    stale.append(post)
+            if stale:
+                BlogPost.objects.bulk_update(stale, [*SUMMARY_FIELDS, 'updated_at'])
+                invalidate_posts([post.pk for post in stale], include_list=True)
+                changed += len(stale)
+            self.stdout.write(f'Processed posts up to id {last_pk}')
+
+        self.stdout.write(self.style.SUCCESS(f'Updated the summary of {changed} post(s)'))
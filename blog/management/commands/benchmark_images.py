@@ -0,0 +1,122 @@
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+
+def _legacy(path, workdir):
+    """The former in-request path: full decode, BytesIO, then a second copy"""
+    from django.core.files.base import ContentFile
+
+    img = Image.open(path)
+    img_io = BytesIO()
+    img.save(img_io, format='WEBP', quality=85, optimize=True)
+    content = ContentFile(img_io.getvalue())
+    with open(os.path.join(workdir, 'legacy.webp'), 'wb') as output:
+        output.write(content.read())
+
+
+def _streaming(path, workdir):
+    from django.core.files.storage import FileSystemStorage
+    from blog.images import encode_optimized
+
+    storage = FileSystemStorage(location=workdir)
+    with open(path, 'rb') as source:
+        filename, content = encode_optimized(source, os.path.basename(path))
+    with content:
+        storage.save(filename, content)
+
+
+def _streaming_variants(path, workdir):
+    from django.core.files.storage import FileSystemStorage
+    from blog.images import optimize_stored
+
+    storage = FileSystemStorage(location=workdir)
+    with open(path, 'rb') as source:
+        name = storage.save(os.path.basename(path), source)
+    optimize_stored(storage, name)
+
+
+CASES = {
+    'legacy': _legacy,
+    'streaming': _streaming,
+    'streaming+variants': _streaming_variants,
+}
+
+
+def _peak_rss():
+    """Peak resident set size of this process in KiB"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(case, path, workdir, results):
+    # Linux carries the peak RSS over exec(), so reset it to this process
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+    import blog.images  # noqa: F401  (keep import cost out of the measurement)
+    baseline = _peak_rss()
+    started = time.perf_counter()
+    CASES[case](path, workdir)
+    elapsed = time.perf_counter() - started
+    results.put((elapsed, baseline, _peak_rss()))
+
+
+class Command(BaseCommand):
+    help = 'Measure wall time and peak RSS of image ingestion, old path vs streaming path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--width', type=int, default=7200, help='Width of the generated sample')
+        parser.add_argument('--height', type=int, default=5400, help='Height of the generated sample')
+        parser.add_argument(
+            '--format', choices=['JPEG', 'PNG'], default='JPEG',
+            help='Format of the generated sample'
+        )
+        parser.add_argument('--image', help='Benchmark this file instead of a generated sample')
+        parser.add_argument('--case', choices=list(CASES), action='append', help='Only run this case')
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('spawn')
+        with tempfile.TemporaryDirectory() as workdir:
+            path = options['image'] or self._sample(workdir, options)
+            size = Image.open(path).size
+            self.stdout.write(f'{path}: {size[0]}x{size[1]}, {os.path.getsize(path) / 1e6:.1f} MB')
+
+            for case in options['case'] or list(CASES):
+                casedir = tempfile.mkdtemp(dir=workdir)
+                results = context.Queue()
+                process = context.Process(target=_measure, args=(case, path, casedir, results))
+                process.start()
+                elapsed, baseline, peak = results.get()
+                process.join()
+                self.stdout.write(
+                    f'{case:>20}: {elapsed * 1000:8.0f} ms, peak RSS {peak / 1024:7.1f} MiB '
+                    f'(+{(peak - baseline) / 1024:.1f} MiB over interpreter baseline)'
+                )
+
+    def _sample(self, workdir, options):
+        width, height = options['width'], options['height']
+        gradient = Image.linear_gradient('L')
+        img = Image.merge('RGB', [
+            gradient.resize((width, height)),
+            gradient.rotate(90).resize((width, height)),
+            Image.effect_noise((width // 8, height // 8), 40).resize((width, height)),
+        ])
+        path = os.path.join(workdir, f"sample.{options['format'].lower()}")
+        img.save(path, format=options['format'], quality=90)
+        return path
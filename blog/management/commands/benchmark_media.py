@@ -0,0 +1,100 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+
+from blog.media import serve_media
+from blog.storage import BLOB_DIRECTORY
+
+
+def _static_serve(request, path, root):
+    """The former production route"""
+    return serve(request, path, document_root=root)
+
+
+def _serve_media(request, path, root):
+    return serve_media(request, path)
+
+
+VIEWS = {
+    'static.serve': _static_serve,
+    'serve_media': _serve_media,
+}
+
+
+def _drain(response, sink):
+    """
+    Send a response body to sink the way gunicorn does: sendfile() for
+    FileResponses, iteration for everything else. Returns the bytes sent.
+    """
+    if response.streaming:
+        filelike = getattr(response, 'file_to_stream', None)
+        if filelike is not None and hasattr(filelike, 'fileno'):
+            fileno = filelike.fileno()
+            offset = os.lseek(fileno, 0, os.SEEK_CUR)
+            nbytes = int(response['Content-Length'])
+            sent = 0
+            while sent < nbytes:
+                chunk = os.sendfile(sink, fileno, offset + sent, nbytes - sent)
+                if not chunk:
+                    break
+                sent += chunk
+            response.close()
+            return sent
+        sent = sum(os.write(sink, chunk) for chunk in response.streaming_content)
+    else:
+        sent = os.write(sink, response.content) if response.content else 0
+    response.close()
+    return sent
+
+
+class Command(BaseCommand):
+    help = 'Compare media serving by django.views.static.serve and blog.media.serve_media'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=float, default=20, help='Size of the sample file in MB')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+
+    def handle(self, *args, **options):
+        size = int(options['size'] * 1e6)
+        count = options['requests']
+        factory = RequestFactory()
+
+        with tempfile.TemporaryDirectory() as root, override_settings(MEDIA_ROOT=root):
+            path = f'{BLOB_DIRECTORY}/ab/cd/{"ab" * 32}.mp4'
+            os.makedirs(os.path.join(root, os.path.dirname(path)))
+            with open(os.path.join(root, path), 'wb') as sample:
+                sample.write(os.urandom(size))
+
+            probe = serve_media(factory.get('/media/' + path), path)
+            probe.close()
+            scenarios = {
+                'full GET': {},
+                'range (last 1 MB)': {'HTTP_RANGE': 'bytes=-1000000'},
+                'revalidation': {'HTTP_IF_NONE_MATCH': probe['ETag']},
+            }
+
+            sink = os.open(os.devnull, os.O_WRONLY)
+            try:
+                for scenario, headers in scenarios.items():
+                    for label, view in VIEWS.items():
+                        sent = 0
+                        started = time.perf_counter()
+                        for _ in range(count):
+                            response = view(factory.get('/media/' + path, **headers), path, root)
+                            status = response.status_code
+                            sent += _drain(response, sink)
+                        elapsed = time.perf_counter() - started
+                        self.stdout.write(
+                            f'{scenario:>18} {label:>13}: {elapsed / count * 1000:8.3f} ms/request, '
+                            f'{sent / count / 1e6:7.2f} MB/request, status {status}'
+                        )
+            finally:
+                os.close(sink)
+
+            cached = serve_media(factory.get('/media/' + path), path)
+            cached.close()
+            self.stdout.write(f"serve_media Cache-Control: {cached['Cache-Control']}")
@@ -0,0 +1,89 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from blog.models import BlogPost, Comment
+from blog.values import BlogPostListValuesSerializer, CommentValuesSerializer
+
+
+class Rollback(Exception):
+    """Discards the sample rows"""
+
+
+def _model_render(values_serializer_class, queryset, context):
+    serializer = values_serializer_class.serializer_class(list(queryset), many=True, context=context)
+    return JSONRenderer().render(serializer.data)
+
+
+def _values_render(values_serializer_class, queryset, context):
+    serializer = values_serializer_class(context)
+    return JSONRenderer().render(serializer.render(list(serializer.queryset(queryset))))
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rendering list pages with the model serializers and with the values() '
+        'serializers of blog.values, on sample rows that are rolled back afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Rows per list (default: 1000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Renders per scenario (default: 5)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['rows'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, rows, repeat):
+        post = BlogPost.objects.create(title='Benchmark post', content='<p>Benchmark</p>', published=True)
+        BlogPost.objects.bulk_create(
+            BlogPost(
+                title=f'Benchmark post {index}', slug=f'benchmark-post-{index}', published=True,
+                content='<p>Benchmark</p>', excerpt='Benchmark', word_count=1, reading_time=1,
+            )
+            for index in range(rows)
+        )
+        Comment.objects.bulk_create(
+            Comment(post=post, content=f'Comment {index}', author_name='Reader', approved=True)
+            for index in range(rows)
+        )
+
+        request = RequestFactory().get('/api/')
+        context = {'request': request, 'fieldset': None}
+        scenarios = {
+            'posts': (
+                BlogPostListValuesSerializer,
+                BlogPost.objects.defer('content', 'search_vector').order_by('-created_at', '-id')[:rows],
+            ),
+            'comments': (
+                CommentValuesSerializer,
+                Comment.objects.select_related('post').defer('post__content', 'post__search_vector')
+                .order_by('-created_at', '-id')[:rows],
+            ),
+        }
+
+        for scenario, (values_serializer_class, queryset) in scenarios.items():
+            if _model_render(values_serializer_class, queryset, context) != \
+                    _values_render(values_serializer_class, queryset, context):
+                raise CommandError(f'{scenario}: the values() serializer renders different JSON')
+
+            timings = {}
+            for label, render in (('model', _model_render), ('values', _values_render)):
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    render(values_serializer_class, queryset, context)
+                timings[label] = (time.perf_counter() - started) / repeat
+                self.stdout.write(
+                    f'{scenario:>8} {label:>6}: {timings[label] * 1000:8.2f} ms/page, '
+                    f'{rows / timings[label]:10.0f} rows/s'
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'{scenario:>8}: identical JSON, {timings["model"] / timings["values"]:.1f}x faster'
+            ))
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from blog.models import collect_media_blobs, recount_media_references
+
+
+class Command(BaseCommand):
+    help = 'Delete content-addressed media blobs that no post, image or post content references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Keep unreferenced blobs saved within this many hours (default: 24)'
+        )
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Recompute the reference counts from the database first'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='List the blobs that would be deleted without deleting them'
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            fixed = recount_media_references()
+            self.stdout.write(f'Corrected reference counts of {fixed} blob(s)')
+
+        collected = collect_media_blobs(
+            timedelta(hours=options['grace_hours']), dry_run=options['dry_run']
+        )
+        for blob in collected:
+            self.stdout.write(blob.name)
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(collected)} unreferenced blob(s)'))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from blog.cache import invalidate_posts
+from blog.images import build_variants, delete_variants
+from blog.models import IMAGE_READY, BlogImage, BlogPost
+
+
+class Command(BaseCommand):
+    help = 'Generate the responsive variants of existing featured and post images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerate variants that already exist'
+        )
+
+    def handle(self, *args, **options):
+        targets = [
+            (BlogPost, 'featured_image', 'featured_image_state', 'featured_image_variants'),
+            (BlogImage, 'image', 'image_state', 'image_variants'),
+        ]
+        generated = failed = 0
+        for model, field_name, state_field, variants_field in targets:
+            storage = model._meta.get_field(field_name).storage
+            # Images still queued for the worker get their variants there
+            rows = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            rows = rows.filter(**{state_field: IMAGE_READY})
+            if not options['force']:
+                rows = rows.filter(Q(**{variants_field: {}}) | Q(**{f'{variants_field}__isnull': True}))
+            post_field = 'id' if model is BlogPost else 'post_id'
+
+            for pk, post_id, name, old in rows.values_list('pk', post_field, field_name, variants_field).iterator():
+                try:
+                    variants = build_variants(storage, name)
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{name}: {e}')
+                    continue
+                # Only store them if the image was not replaced meanwhile;
+                # queryset updates skip auto_now, but the ETags depend on it
+                now = timezone.now()
+                rows_changed = model.objects.filter(pk=pk, **{field_name: name}).update(
+                    **{variants_field: variants, 'updated_at': now}
+                )
+                if rows_changed:
+                    if model is BlogImage:
+                        BlogPost.objects.filter(pk=post_id).update(updated_at=now)
+                    delete_variants(storage, old)
+                    invalidate_posts([post_id], include_list=True)
+                    generated += 1
+                else:
+                    delete_variants(storage, variants)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated variants for {generated} image(s), {failed} failed'
+        ))
@@ -0,0 +1,46 @@
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand
+
+from blog.nplusone import query_report
+
+
+class Command(BaseCommand):
+    help = 'Show the repeated query shapes recorded by NPlusOneMiddleware, worst first'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--view', help='Only show entries whose view name contains this text'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Show at most this many entries (default: 20)'
+        )
+        parser.add_argument(
+            '--sql', action='store_true',
+            help='Print a sample statement instead of the fingerprint'
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Empty the report after printing it'
+        )
+
+    def handle(self, *args, **options):
+        entries = list(query_report.entries().values())
+        if options['view']:
+            entries = [entry for entry in entries if options['view'] in entry['view']]
+        entries.sort(key=lambda entry: (entry['max_count'], entry['requests']), reverse=True)
+
+        for entry in entries[:options['limit']]:
+            last_seen = datetime.fromtimestamp(entry['last_seen'], timezone.utc)
+            self.stdout.write(self.style.WARNING(
+                f"{entry['view']}: up to {entry['max_count']} queries per request "
+                f"in {entry['requests']} request(s), last {last_seen:%Y-%m-%d %H:%M:%S} UTC"
+            ))
+            self.stdout.write(f"  at {entry['location'] or 'unknown location'}")
+            self.stdout.write(f"  {entry['sql'] if options['sql'] else entry['fingerprint']}")
+
+        self.stdout.write(self.style.SUCCESS(f'{len(entries)} repeated query shape(s) recorded'))
+        if options['clear']:
+            query_report.clear()
+            self.stdout.write('Report cleared')
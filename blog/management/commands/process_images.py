@@ -0,0 +1,52 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.image_jobs import claim_jobs, process_jobs, process_pool
+
+
+class Command(BaseCommand):
+    help = 'Run the background worker that optimizes uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=os.cpu_count() or 1,
+            help='Number of worker processes encoding images (default: CPU count)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Jobs claimed per poll (default: twice the concurrency)'
+        )
+        parser.add_argument(
+            '--max-attempts', type=int, default=3,
+            help='Attempts before a job is marked failed'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Seconds to wait when the queue is empty'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty instead of polling'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options['concurrency'])
+        batch_size = options['batch_size'] or concurrency * 2
+        max_attempts = options['max_attempts']
+
+        processed = 0
+        with process_pool(concurrency) as pool:
+            while True:
+                jobs = claim_jobs(batch_size)
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                for job, status in process_jobs(jobs, pool, max_attempts=max_attempts):
+                    processed += 1
+                    self.stdout.write(f'{job}: {status}')
+
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed} image job(s)'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import recount_comment_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized per-post comment counters from the comments table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--post', type=int, action='append', dest='post_ids',
+            help='Only recount this post (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        fixed = recount_comment_counters(options['post_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Corrected comment counters on {fixed} post(s)'))
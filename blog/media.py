@@ -0,0 +1,184 @@
+import mimetypes
+import os
+import re
+import stat as stat_module
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .storage import is_blob_name
+
+# Content-addressed names never change their bytes
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    length bytes of a file from its current offset.
+
+    fileno() is kept, so a WSGI file_wrapper (gunicorn) still sends the
+    range with sendfile(); plain iteration stops at the end of the range.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single 'bytes=' range, end inclusive.
+
+    None when the header should be ignored (absent, malformed or several
+    ranges, which are answered with the whole file); ValueError when the
+    range cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last n bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """Whether a Range request may be answered partially (If-Range, RFC 9110 13.1.5)"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        # Only a strong comparison counts
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def cache_control(name):
+    if is_blob_name(name):
+        return {'public': True, 'max_age': IMMUTABLE_MAX_AGE, 'immutable': True}
+    return {'public': True, 'max_age': getattr(settings, 'MEDIA_CACHE_MAX_AGE', 3600)}
+
+
+def _offload(name, fullpath):
+    """Empty response telling the front proxy to send the file itself"""
+    header = getattr(settings, 'MEDIA_SENDFILE_HEADER', '')
+    if not header:
+        return None
+    response = HttpResponse()
+    if header.lower() == 'x-accel-redirect':
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response[header] = prefix.rstrip('/') + '/' + quote(name)
+    else:
+        response[header] = fullpath
+    # Let the proxy pick the type from the file it sends
+    del response['Content-Type']
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve a file from MEDIA_ROOT.
+
+    Answers conditional requests with 304 and single byte ranges with 206
+    (honouring If-Range). Files are streamed with FileResponse so the WSGI
+    server can use sendfile(), or handed to the front proxy entirely when
+    MEDIA_SENDFILE_HEADER is set. Content-addressed blobs are cached as
+    immutable.
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Media file not found')
+    name = os.path.relpath(fullpath, settings.MEDIA_ROOT).replace(os.sep, '/')
+
+    try:
+        file = open(fullpath, 'rb')
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        raise Http404('Media file not found')
+    try:
+        stat = os.fstat(file.fileno())
+        if not stat_module.S_ISREG(stat.st_mode):
+            raise Http404('Media file not found')
+        size = stat.st_size
+        last_modified = int(stat.st_mtime)
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = _offload(name, fullpath)
+        if response is None:
+            response = _file_response(request, file, size, etag, last_modified)
+            file = None
+    finally:
+        if file is not None:
+            file.close()
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, **cache_control(name))
+    return response
+
+
+def _file_response(request, file, size, etag, last_modified):
+    content_type, encoding = mimetypes.guess_type(file.name)
+    # Compressed files are sent as they are, not with Content-Encoding
+    content_type = (not encoding and content_type) or 'application/octet-stream'
+
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except ValueError:
+        file.close()
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is not None and not if_range_matches(request, etag, last_modified):
+        byte_range = None
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    if request.method == 'HEAD':
+        file.close()
+        response = HttpResponse(content_type=content_type)
+    else:
+        file.seek(start)
+        response = FileResponse(FileRange(file, length), content_type=content_type)
+    if byte_range is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    return response
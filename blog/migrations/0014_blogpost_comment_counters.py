@@ -0,0 +1,46 @@
+# Generated by Django 4.2.13 on 2026-10-16 20:55
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_comment_counters(apps, schema_editor):
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    Comment = apps.get_model('blog', 'Comment')
+    counts = Comment.objects.order_by().values('post_id').annotate(
+        approved_count=Count('id', filter=Q(approved=True, is_trash=False)),
+        pending_count=Count('id', filter=Q(approved=False, is_trash=False)),
+        trash_count=Count('id', filter=Q(is_trash=True)),
+    )
+    for row in counts:
+        BlogPost.objects.filter(pk=row['post_id']).update(
+            approved_count=row['approved_count'],
+            pending_count=row['pending_count'],
+            trash_count=row['trash_count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_comment_author_email_comment_author_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='approved_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='pending_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='trash_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_comment_counters, migrations.RunPython.noop),
+    ]
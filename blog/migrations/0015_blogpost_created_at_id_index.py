@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-16 20:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_blogpost_comment_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['created_at', 'id'], name='blog_blogpo_created_3caf39_idx'),
+        ),
+    ]
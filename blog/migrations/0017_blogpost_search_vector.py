@@ -0,0 +1,59 @@
+# Generated by Django 4.2.13 on 2026-10-16 20:57
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, Func, Value
+from django.utils.html import strip_tags
+
+
+def create_search_index(apps, schema_editor):
+    BlogPost = apps.get_model('blog', 'BlogPost')
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        plain_content = Func(
+            F('content'), Value('<[^>]+>'), Value(' '), Value('g'),
+            function='regexp_replace'
+        )
+        BlogPost.objects.update(search_vector=(
+            SearchVector('title', weight='A', config='english')
+            + SearchVector(plain_content, weight='B', config='english')
+        ))
+        schema_editor.execute(
+            'CREATE INDEX blog_blogpost_search_vector_gin '
+            'ON blog_blogpost USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE blog_blogpost_fts USING fts5("
+            "title, body, tokenize = 'porter unicode61')"
+        )
+        for post in BlogPost.objects.only('id', 'title', 'content').iterator():
+            schema_editor.execute(
+                'INSERT INTO blog_blogpost_fts (rowid, title, body) VALUES (%s, %s, %s)',
+                [post.id, post.title, strip_tags(post.content or '')]
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS blog_blogpost_search_vector_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS blog_blogpost_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_comment_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
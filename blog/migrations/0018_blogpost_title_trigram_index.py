@@ -0,0 +1,36 @@
+# Generated by Django 4.2.13 on 2026-10-16 20:58
+
+from django.db import migrations
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # Other databases use the in-process prefix index in blog/autocomplete.py
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS blog_blogpost_title_trgm '
+        'ON blog_blogpost USING gin (title gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS blog_blogpost_slug_trgm '
+        'ON blog_blogpost USING gin (slug gin_trgm_ops)'
+    )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS blog_blogpost_title_trgm')
+    schema_editor.execute('DROP INDEX IF EXISTS blog_blogpost_slug_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_blogpost_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
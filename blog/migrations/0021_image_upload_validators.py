@@ -0,0 +1,24 @@
+# Generated by Django 4.2.13 on 2026-10-16 21:07
+
+import blog.images
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0020_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='blogimage',
+            name='image',
+            field=models.ImageField(upload_to='blog_images/', validators=[blog.images.validate_image_upload]),
+        ),
+        migrations.AlterField(
+            model_name='blogpost',
+            name='featured_image',
+            field=models.ImageField(blank=True, null=True, upload_to='featured_images/', validators=[blog.images.validate_image_upload]),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.13 on 2026-10-16 21:12
+
+import blog.images
+import blog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0021_image_upload_validators'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('source_sha256', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('variants', models.JSONField(blank=True, default=dict)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['refcount', 'updated_at'], name='blog_mediab_refcoun_05fb53_idx')],
+            },
+        ),
+        migrations.AlterField(
+            model_name='blogimage',
+            name='image',
+            field=models.ImageField(storage=blog.storage.media_storage, upload_to='blog_images/', validators=[blog.images.validate_image_upload]),
+        ),
+        migrations.AlterField(
+            model_name='blogpost',
+            name='featured_image',
+            field=models.ImageField(blank=True, null=True, storage=blog.storage.media_storage, upload_to='featured_images/', validators=[blog.images.validate_image_upload]),
+        ),
+    ]
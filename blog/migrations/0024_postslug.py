@@ -0,0 +1,23 @@
+# Generated by Django 4.2.13 on 2026-10-16 21:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0023_blogpost_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSlug',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(max_length=250, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='old_slugs', to='blog.blogpost')),
+            ],
+        ),
+    ]
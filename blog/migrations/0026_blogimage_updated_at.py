@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-16 23:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0025_sharedversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogimage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,132 +1,629 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+from django.db.models.expressions import Combinable
+from django.dispatch import Signal
 from django_ckeditor_5.fields import CKEditor5Field
+from django.conf import settings
+from django.utils import timezone
 from django.utils.text import slugify
-import os
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
+from collections import Counter, defaultdict
 import logging
+import random
+
+from .images import build_variants, encode_optimized, validate_image_upload
+from .storage import blob_names_in, file_digest, is_blob_name, media_storage
+from .text import summarize
 
 logger = logging.getLogger(__name__)
 
+# Processing states of uploaded images
+IMAGE_READY = 'ready'
+IMAGE_PROCESSING = 'processing'
+IMAGE_FAILED = 'failed'
+IMAGE_STATE_CHOICES = [
+    (IMAGE_READY, 'Ready'),
+    (IMAGE_PROCESSING, 'Processing'),
+    (IMAGE_FAILED, 'Failed'),
+]
+
+
+def has_new_upload(field_file, update_fields=None):
+    """Whether a FileField holds a file that is not in storage yet"""
+    if update_fields is not None and field_file.field.name not in update_fields:
+        return False
+    return bool(field_file) and not field_file._committed
+
+
+def find_optimized_upload(field_file):
+    """
+    SHA-256 of a new upload and the MediaBlob it was already optimized into.
+
+    The blob is None unless the same bytes were uploaded and processed before.
+    """
+    digest = file_digest(field_file)
+    return digest, MediaBlob.objects.optimized_for(digest)
+
+# Sent after comments were changed through queryset update()/delete(), which
+# bypass post_save/post_delete. Receivers get the ids of the affected posts.
+comments_changed = Signal()
+
 class BlogPost(models.Model):
     title = models.CharField(max_length=200)
     content = CKEditor5Field('Content', config_name='extends')
-    featured_image = models.ImageField(upload_to='featured_images/', blank=True, null=True)
+    featured_image = models.ImageField(
+        upload_to='featured_images/', storage=media_storage, blank=True, null=True,
+        validators=[validate_image_upload]
+    )
+    featured_image_state = models.CharField(
+        max_length=10, choices=IMAGE_STATE_CHOICES, default=IMAGE_READY, editable=False
+    )
+    # Downscaled copies of featured_image, see blog.images.build_variants()
+    featured_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     slug = models.SlugField(max_length=250, unique=True, blank=True)
     published = models.BooleanField(default=False, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized comment counters, maintained by Comment and CommentQuerySet
+    approved_count = models.PositiveIntegerField(default=0, editable=False)
+    pending_count = models.PositiveIntegerField(default=0, editable=False)
+    trash_count = models.PositiveIntegerField(default=0, editable=False)
+    # Full-text index (PostgreSQL only; maintained by blog.search.index_post,
+    # SQLite uses the blog_blogpost_fts table instead)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Derived from content on save, so lists never need to load the content
+    excerpt = models.TextField(blank=True, default='', editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=0, editable=False, help_text='Minutes')
     
     def __str__(self):
         return self.title
 
+    def update_summary(self):
+        """Recompute excerpt, word_count and reading_time from content"""
+        self.excerpt, self.word_count, self.reading_time = summarize(self.content)
+
+    @property
+    def comment_count(self):
+        """Total number of comments, including trashed ones"""
+        return self.approved_count + self.pending_count + self.trash_count
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the post list
+            models.Index(fields=['created_at', 'id']),
+        ]
+
+    def media_names(self):
+        """Stored files this post references: featured image and CKEditor uploads"""
+        names = blob_names_in(self.content)
+        if self.featured_image:
+            names.add(self.featured_image.name)
+        return names
 
     def save(self, *args, **kwargs):
         # Generate slug if not provided
         if not self.slug:
             self.slug = slugify(self.title)
         
-        # Optimize featured image if present
-        if self.featured_image:
-            try:
-                # Open image using PIL
-                img = Image.open(self.featured_image)
-                
-                # Prepare BytesIO object
-                img_io = BytesIO()
-                
-                # Try to convert to WebP if RGB/RGBA
-                if img.mode in ('RGB', 'RGBA'):
-                    # Save as WebP format
-                    img.save(img_io, format='WEBP', quality=85, optimize=True)
-                    
-                    # Get original filename and change extension
-                    filename = os.path.splitext(os.path.basename(self.featured_image.name))[0]
-                    new_filename = f"{filename}.webp"
-                    
-                    # Save the optimized image
-                    self.featured_image.save(
-                        new_filename,
-                        ContentFile(img_io.getvalue()),
-                        save=False  # Don't trigger recursive save
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.update_summary()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'excerpt', 'word_count', 'reading_time'}
+
+        # Optimize a newly uploaded featured image
+        new_upload = has_new_upload(self.featured_image, kwargs.get('update_fields'))
+        if new_upload:
+            self.featured_image_variants = {}
+            digest, blob = find_optimized_upload(self.featured_image)
+            if blob is not None:
+                # Seen before: reuse the optimized file, nothing to encode
+                self.featured_image = blob.name
+                self.featured_image_variants = blob.variants
+                self.featured_image_state = IMAGE_READY
+                new_upload = False
+            elif settings.IMAGE_PROCESSING_ASYNC:
+                # Store the original now, the worker swaps in the optimized file
+                self.featured_image_state = IMAGE_PROCESSING
+            else:
+                try:
+                    filename, content = encode_optimized(self.featured_image, self.featured_image.name)
+                    with content:
+                        self.featured_image.save(filename, content, save=False)
+                    self.featured_image_variants = build_variants(
+                        self.featured_image.storage, self.featured_image.name
                     )
-                    logger.info(f"Converted featured image to WebP: {new_filename}")
-                else:
-                    # Just compress in original format
-                    img_format = img.format if img.format else 'JPEG'
-                    img.save(img_io, format=img_format, quality=85, optimize=True)
-                    self.featured_image.save(
-                        self.featured_image.name,
-                        ContentFile(img_io.getvalue()),
-                        save=False
+                    MediaBlob.objects.record_optimized(
+                        self.featured_image.name, digest, self.featured_image_variants
                     )
-                    logger.info(f"Compressed featured image: {self.featured_image.name}")
-            except Exception as e:
-                logger.error(f"Error optimizing featured image: {str(e)}")
+                    logger.info(f"Optimized featured image: {self.featured_image.name}")
+                except Exception as e:
+                    logger.error(f"Error optimizing featured image: {str(e)}")
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {
+                    'featured_image_state', 'featured_image_variants'
+                }
         
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        tracks_media = update_fields is None or {'featured_image', 'content'} & set(update_fields)
+        tracks_slug = update_fields is None or 'slug' in update_fields
+        with transaction.atomic():
+            stored = set()
+            # Read by the post_save receivers that keep the slug map current
+            self._retired_slug = None
+            if (tracks_media or tracks_slug) and not self._state.adding:
+                columns = (['featured_image', 'content'] if tracks_media else []) + (['slug'] if tracks_slug else [])
+                row = BlogPost.objects.filter(pk=self.pk).values(*columns).first()
+                if row and tracks_media:
+                    stored = blob_names_in(row['content']) | {row['featured_image']}
+                if row and tracks_slug and row['slug'] != self.slug:
+                    self._retired_slug = row['slug']
+            super().save(*args, **kwargs)
+            if tracks_media:
+                MediaBlob.objects.update_references(stored, self.media_names())
+            if tracks_slug:
+                PostSlug.objects.record_change(self, self._retired_slug)
+            if new_upload and settings.IMAGE_PROCESSING_ASYNC:
+                ImageJob.enqueue(self, 'featured_image')
+
+class PostSlugQuerySet(models.QuerySet):
+    def record_change(self, post, retired_slug=None):
+        """
+        Keep retired_slug pointing at post; the current slug of a post always
+        wins over an old slug of another post.
+        """
+        self.filter(slug=post.slug).delete()
+        if retired_slug:
+            self.update_or_create(slug=retired_slug, defaults={'post': post})
+
+
+class PostSlug(models.Model):
+    """A former slug of a post, so old links keep resolving"""
+    slug = models.SlugField(max_length=250, unique=True)
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='old_slugs')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = PostSlugQuerySet.as_manager()
+
+    def __str__(self):
+        return self.slug
+
+
+class SharedVersionQuerySet(models.QuerySet):
+    def _ensure(self, name):
+        # A random start, so a structure built against a counter that has
+        # since been deleted (a restored backup, a rolled back test) never
+        # matches the new one
+        return self.get_or_create(name=name, defaults={'value': random.getrandbits(48)})[0]
+
+    def current(self, name):
+        """Value of the named counter"""
+        value = self.filter(name=name).values_list('value', flat=True).first()
+        return self._ensure(name).value if value is None else value
+
+    def bump(self, name):
+        """
+        Increment the named counter and return its new value. The UPDATE
+        locks the row, so concurrent bumps each get a value of their own.
+        """
+        with transaction.atomic():
+            self._ensure(name)
+            self.filter(name=name).update(value=F('value') + 1)
+            return self.filter(name=name).values_list('value', flat=True).get()
+
+
+class SharedVersion(models.Model):
+    """
+    A counter every process sees, bumped when an in-process structure built
+    from the database (the slug map, the title autocomplete index) goes
+    stale. Unlike a cache key it is never evicted and bumps are atomic on
+    every database.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    objects = SharedVersionQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
 
 class BlogImage(models.Model):
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='images')
-    image = models.ImageField(upload_to='blog_images/')
+    image = models.ImageField(upload_to='blog_images/', storage=media_storage, validators=[validate_image_upload])
+    image_state = models.CharField(
+        max_length=10, choices=IMAGE_STATE_CHOICES, default=IMAGE_READY, editable=False
+    )
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Image for {self.post.title}"
 
     def save(self, *args, **kwargs):
-        """Optimize image on save"""
-        if self.image:
-            self.optimize_image()
-        super().save(*args, **kwargs)
+        """Optimize a newly uploaded image, in the background unless configured otherwise"""
+        new_upload = has_new_upload(self.image, kwargs.get('update_fields'))
+        if new_upload:
+            self.image_variants = {}
+            digest, blob = find_optimized_upload(self.image)
+            if blob is not None:
+                # Seen before: reuse the optimized file, nothing to encode
+                self.image = blob.name
+                self.image_variants = blob.variants
+                self.image_state = IMAGE_READY
+                new_upload = False
+            elif settings.IMAGE_PROCESSING_ASYNC:
+                self.image_state = IMAGE_PROCESSING
+            else:
+                self.optimize_image()
+                MediaBlob.objects.record_optimized(self.image.name, digest, self.image_variants)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'image_state', 'image_variants'}
+        
+        update_fields = kwargs.get('update_fields')
+        tracks_media = update_fields is None or 'image' in update_fields
+        with transaction.atomic():
+            stored = set()
+            if tracks_media and not self._state.adding:
+                stored = set(BlogImage.objects.filter(pk=self.pk).values_list('image', flat=True))
+            super().save(*args, **kwargs)
+            if tracks_media:
+                MediaBlob.objects.update_references(stored, {self.image.name})
+            if new_upload and settings.IMAGE_PROCESSING_ASYNC:
+                ImageJob.enqueue(self, 'image')
     
     def optimize_image(self, quality=85, convert_to_webp=True):
         """Compress image and optionally convert to WebP format"""
         try:
-            # Open image using PIL
-            img = Image.open(self.image)
-            
-            # If convert to WebP is requested and format is supported
-            if convert_to_webp and img.mode in ('RGB', 'RGBA'):
-                # Prepare BytesIO object to save the image
-                img_io = BytesIO()
-                
-                # Save as WebP format with specified quality
-                img.save(img_io, format='WEBP', quality=quality, optimize=True)
-                
-                # Get original filename and change extension
-                filename = os.path.splitext(os.path.basename(self.image.name))[0]
-                new_filename = f"{filename}.webp"
-                
-                # Save the optimized image back to the model field
+            filename, content = encode_optimized(
+                self.image, self.image.name, quality=quality, convert_to_webp=convert_to_webp
+            )
+            # Save the optimized image back to the model field
+            with content:
                 self.image.save(
-                    new_filename,
-                    ContentFile(img_io.getvalue()),
+                    filename,
+                    content,
                     save=False  # Don't trigger recursive save
                 )
-                logger.info(f"Converted image to WebP: {new_filename}")
-            else:
-                # If WebP not requested or not supported, just compress in original format
-                img_io = BytesIO()
-                img_format = img.format if img.format else 'JPEG'
-                
-                # Save with quality settings
-                img.save(img_io, format=img_format, quality=quality, optimize=True)
-                
-                # Save the optimized image back to the model field
-                self.image.save(
-                    self.image.name,
-                    ContentFile(img_io.getvalue()),
-                    save=False  # Don't trigger recursive save
-                )
-                logger.info(f"Compressed image: {self.image.name}")
-                
+            self.image_variants = build_variants(self.image.storage, self.image.name)
+            logger.info(f"Optimized image: {self.image.name}")
         except Exception as e:
             logger.error(f"Error optimizing image: {str(e)}")
 
+
+class ImageJob(models.Model):
+    """
+    Queued optimization of an uploaded image.
+
+    Jobs are stored in the database so they are enqueued in the same
+    transaction as the upload, and are run by 'manage.py process_images'.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    model_label = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField()
+    field_name = models.CharField(max_length=50)
+    # Storage name of the original upload; the job only replaces this exact file
+    source_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.model_label}#{self.object_id}.{self.field_name} ({self.status})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    @classmethod
+    def for_field(cls, instance, field_name):
+        """Unsaved job for the current file of a saved instance"""
+        return cls(
+            model_label=instance._meta.label_lower,
+            object_id=instance.pk,
+            field_name=field_name,
+            source_name=getattr(instance, field_name).name,
+        )
+
+    @classmethod
+    def enqueue(cls, instance, field_name):
+        job = cls.for_field(instance, field_name)
+        job.save()
+        return job
+
+
+class MediaBlobQuerySet(models.QuerySet):
+    def register(self, name, sha256, size):
+        """Record a file saved by ContentAddressedStorage"""
+        blob, created = self.get_or_create(name=name, defaults={'sha256': sha256, 'size': size})
+        if not created:
+            # Saved again: keep it from being collected right away
+            self.filter(pk=blob.pk).update(updated_at=timezone.now())
+        return blob
+
+    def optimized_for(self, source_sha256):
+        """The optimized blob encoded from an upload with this digest, if any"""
+        return self.filter(source_sha256=source_sha256).order_by('id').first()
+
+    def record_optimized(self, name, source_sha256, variants):
+        """Remember which upload a blob was encoded from, and its variants"""
+        return self.filter(name=name).update(source_sha256=source_sha256, variants=variants)
+
+    def _adjust(self, names, sign):
+        counts = Counter(name for name in names if is_blob_name(name))
+        by_count = defaultdict(list)
+        for name, count in counts.items():
+            by_count[count].append(name)
+        now = timezone.now()
+        for count, group in by_count.items():
+            self.filter(name__in=group).update(
+                refcount=Greatest(F('refcount') + sign * count, Value(0)), updated_at=now
+            )
+
+    def retain(self, names):
+        """Add one reference per occurrence of each name; names that are no blob are ignored"""
+        self._adjust(names, 1)
+
+    def release(self, names):
+        """Drop one reference per occurrence of each name"""
+        self._adjust(names, -1)
+
+    def update_references(self, old, new):
+        """Move the references of one row from the set old to the set new"""
+        old, new = set(filter(None, old)), set(filter(None, new))
+        self.release(old - new)
+        self.retain(new - old)
+
+    def unreferenced(self, grace):
+        """Blobs nothing has referenced for at least grace (a timedelta)"""
+        return self.filter(refcount=0, updated_at__lt=timezone.now() - grace)
+
+
+def recount_media_references():
+    """Recompute every MediaBlob.refcount from the rows referencing it; returns the number fixed"""
+    counts = Counter()
+    for featured_image, content in BlogPost.objects.values_list('featured_image', 'content').iterator():
+        counts.update(blob_names_in(content) | ({featured_image} if featured_image else set()))
+    counts.update(BlogImage.objects.values_list('image', flat=True).iterator())
+
+    drifted = []
+    for blob in MediaBlob.objects.only('id', 'name', 'refcount').iterator():
+        if blob.refcount != counts[blob.name]:
+            blob.refcount = counts[blob.name]
+            drifted.append(blob)
+    MediaBlob.objects.bulk_update(drifted, ['refcount'], batch_size=500)
+    return len(drifted)
+
+
+def collect_media_blobs(grace, dry_run=False):
+    """
+    Delete unreferenced blobs and their variants from storage.
+
+    grace keeps blobs that were saved recently but are not referenced yet,
+    e.g. a CKEditor upload in a post that is still being written. Each row is
+    removed with a guarded DELETE first, so a blob referenced again in the
+    meantime is kept. Returns the collected blobs.
+    """
+    storage = media_storage()
+    collected = []
+    for blob in MediaBlob.objects.unreferenced(grace).iterator():
+        if dry_run:
+            collected.append(blob)
+            continue
+        deleted, _ = MediaBlob.objects.filter(pk=blob.pk, refcount=0).delete()
+        if not deleted:
+            continue
+        for name in [variant['name'] for variant in blob.variants.get('variants', [])] + [blob.name]:
+            try:
+                storage.purge(name)
+            except OSError as e:
+                logger.warning(f"Could not delete media blob {name}: {str(e)}")
+        collected.append(blob)
+    return collected
+
+
+class MediaBlob(models.Model):
+    """
+    A file in content-addressed storage (see blog.storage), shared by every
+    image field and CKEditor upload with the same bytes.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    # Digest of the upload this optimized file was encoded from, so an
+    # identical upload can reuse it without encoding
+    source_sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    variants = models.JSONField(default=dict, blank=True)
+    # Image fields and post contents referencing this blob
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = MediaBlobQuerySet.as_manager()
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['refcount', 'updated_at']),
+        ]
+
+
+COMMENT_COUNTER_FIELDS = ('approved_count', 'pending_count', 'trash_count')
+
+# Comment fields whose change moves a comment between post counters
+COMMENT_STATE_FIELDS = {'post', 'post_id', 'approved', 'is_trash'}
+
+
+def comment_counter_field(approved, is_trash):
+    """Name of the BlogPost counter a comment in this state is counted in"""
+    if is_trash:
+        return 'trash_count'
+    return 'approved_count' if approved else 'pending_count'
+
+
+def comment_counter_deltas(transitions):
+    """
+    Turn (before, after) comment states into counter deltas.
+    A state is a (post_id, approved, is_trash) tuple, or None for a comment
+    that did not exist before or no longer exists after.
+    """
+    deltas = Counter()
+    for before, after in transitions:
+        if before == after:
+            continue
+        if before is not None:
+            deltas[(before[0], comment_counter_field(before[1], before[2]))] -= 1
+        if after is not None:
+            deltas[(after[0], comment_counter_field(after[1], after[2]))] += 1
+    return deltas
+
+
+def apply_comment_counter_deltas(deltas):
+    """
+    Apply {(post_id, counter_field): delta} to the post rows with F()
+    expressions. Posts sharing the same set of deltas are updated together.
+    """
+    per_post = defaultdict(dict)
+    for (post_id, field), delta in deltas.items():
+        if delta:
+            per_post[post_id][field] = delta
+
+    groups = defaultdict(list)
+    for post_id, changes in per_post.items():
+        groups[frozenset(changes.items())].append(post_id)
+
+    for changes, post_ids in groups.items():
+        BlogPost.objects.filter(pk__in=post_ids).update(
+            **{field: F(field) + delta for field, delta in changes}
+        )
+
+
+def recount_comment_counters(post_ids=None):
+    """
+    Recompute the comment counters from the comments table with a single
+    GROUP BY and write back the rows that drifted. Corrected posts get a new
+    updated_at and their cached responses are invalidated, like any other
+    change to what they render. Returns the number of posts that were
+    corrected.
+    """
+    comments = Comment.objects.order_by()
+    posts = BlogPost.objects.order_by()
+    if post_ids is not None:
+        comments = comments.filter(post_id__in=post_ids)
+        posts = posts.filter(pk__in=post_ids)
+
+    counts = {
+        row['post_id']: row
+        for row in comments.values('post_id').annotate(
+            approved_count=Count('id', filter=Q(approved=True, is_trash=False)),
+            pending_count=Count('id', filter=Q(approved=False, is_trash=False)),
+            trash_count=Count('id', filter=Q(is_trash=True)),
+        )
+    }
+
+    now = timezone.now()
+    stale = []
+    for post in posts.only('id', 'updated_at', *COMMENT_COUNTER_FIELDS):
+        row = counts.get(post.id, {})
+        changed = False
+        for field in COMMENT_COUNTER_FIELDS:
+            value = row.get(field, 0)
+            if getattr(post, field) != value:
+                setattr(post, field, value)
+                changed = True
+        if changed:
+            # bulk_update() skips auto_now, but the ETags depend on it
+            post.updated_at = now
+            stale.append(post)
+
+    BlogPost.objects.bulk_update(stale, [*COMMENT_COUNTER_FIELDS, 'updated_at'], batch_size=500)
+    if stale:
+        comments_changed.send(sender=Comment, post_ids={post.id for post in stale})
+    return len(stale)
+
+
+class CommentQuerySet(models.QuerySet):
+    """Queryset whose bulk update()/delete() keep the post comment counters in step"""
+
+    def _locked_states(self):
+        return list(
+            self.select_for_update().order_by()
+            .values_list('id', 'post_id', 'approved', 'is_trash')
+        )
+
+    def update(self, **kwargs):
+        # Like auto_now on save(); ETags and cached fragments depend on it
+        kwargs.setdefault('updated_at', timezone.now())
+        if not COMMENT_STATE_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            rows = self._locked_states()
+            updated = super().update(**kwargs)
+
+            post_ids = {row[1] for row in rows}
+            new_post = kwargs.get('post_id', kwargs.get('post'))
+            if isinstance(new_post, BlogPost):
+                new_post = new_post.pk
+            if any(isinstance(value, Combinable) for value in kwargs.values()):
+                # Expression updates (e.g. bulk_update) cannot be replayed here
+                if new_post is not None and not isinstance(new_post, Combinable):
+                    post_ids.add(new_post)
+                recount_comment_counters(post_ids)
+            else:
+                if new_post is not None:
+                    post_ids.add(new_post)
+                apply_comment_counter_deltas(comment_counter_deltas(
+                    ((post_id, approved, is_trash), (
+                        new_post if new_post is not None else post_id,
+                        kwargs.get('approved', approved),
+                        kwargs.get('is_trash', is_trash),
+                    ))
+                    for _, post_id, approved, is_trash in rows
+                ))
+
+        if rows:
+            comments_changed.send(sender=self.model, post_ids=post_ids)
+        return updated
+
+    update.alters_data = True
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            rows = self._locked_states()
+            result = super().delete()
+            apply_comment_counter_deltas(comment_counter_deltas(
+                ((post_id, approved, is_trash), None)
+                for _, post_id, approved, is_trash in rows
+            ))
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Comment(models.Model):
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='comments', db_index=True)
     author_name = models.CharField(max_length=100, blank=True, null=True)
@@ -141,12 +638,57 @@ class Comment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     admin_reply = models.TextField(null=True, blank=True)
 
+    objects = CommentQuerySet.as_manager()
+
     def __str__(self):
         return f"Comment by {self.author_name} on {self.post.title}"
 
+    def _locked_counter_state(self):
+        """
+        (post_id, approved, is_trash) the post counters account for, read
+        from the row locked for the rest of the transaction. A snapshot taken
+        when the instance was loaded could be stale: two saves of the same
+        change from different instances would count it twice.
+        """
+        if self._state.adding:
+            return None
+        return Comment.objects.filter(pk=self.pk).select_for_update().values_list(
+            'post_id', 'approved', 'is_trash'
+        ).first()
+
+    def _apply_counter_transition(self, before, after):
+        deltas = comment_counter_deltas([(before, after)])
+        apply_comment_counter_deltas(deltas)
+        # Keep an already loaded post in step so callers can read the counts
+        if Comment.post.is_cached(self) and self.post is not None:
+            for (post_id, field), delta in deltas.items():
+                if post_id == self.post.pk:
+                    setattr(self.post, field, getattr(self.post, field) + delta)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not COMMENT_STATE_FIELDS.intersection(update_fields):
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            before = self._locked_counter_state()
+            super().save(*args, **kwargs)
+            self._apply_counter_transition(before, (self.post_id, self.approved, self.is_trash))
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            before = self._locked_counter_state()
+            result = super().delete(*args, **kwargs)
+            self._apply_counter_transition(before, None)
+        return result
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['post', 'approved']),
+            # Keyset pagination: each page is a range scan on (created_at, id)
+            # within the equality prefix of the endpoint's filters
+            models.Index(fields=['post', 'approved', 'is_trash', 'created_at', 'id']),
+            models.Index(fields=['post', 'created_at', 'id']),
+            models.Index(fields=['created_at', 'id']),
             models.Index(fields=['is_trash']),
         ] 
\ No newline at end of file
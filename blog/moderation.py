@@ -0,0 +1,215 @@
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Comment, apply_comment_counter_deltas, comment_counter_deltas, comments_changed
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# Field values each moderation action sets; 'delete' removes the rows and
+# 'reply' sets the admin_reply given with the operation. 'approve' also takes
+# a comment out of the trash: an approved comment is shown, a trashed one never
+ACTIONS = {
+    'approve': {'approved': True, 'is_trash': False},
+    'unapprove': {'approved': False},
+    'trash': {'is_trash': True},
+    'restore': {'is_trash': False},
+    'delete': None,
+    'reply': None,
+}
+
+UPDATED = 'updated'
+DELETED = 'deleted'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+
+
+class ModerationError(ValueError):
+    """A batch that cannot be run as given"""
+
+
+def parse_operations(data, max_ids=None):
+    """
+    Validated [(action, ids, reply)] of a batch request body.
+
+    The body is {"operations": [{"action": ..., "ids": [...]}, ...]}, the
+    list of operations alone or a single operation; reply operations also
+    carry "admin_reply" (null or an empty string removes the reply). Ids keep
+    their order, duplicates within an operation are dropped.
+    """
+    if max_ids is None:
+        max_ids = getattr(settings, 'COMMENT_MODERATION_MAX_IDS', 10000)
+    if isinstance(data, list):
+        items = data
+    else:
+        items = data.get('operations') if 'operations' in data else [data]
+    if not isinstance(items, list) or not items:
+        raise ModerationError('No operations provided')
+
+    operations = []
+    total = 0
+    for item in items:
+        if not isinstance(item, dict):
+            raise ModerationError('Each operation must be an object')
+        action = item.get('action')
+        if action not in ACTIONS:
+            raise ModerationError(f'Unknown action: {action}')
+        ids = item.get('ids', [item['id']] if 'id' in item else [])
+        if not isinstance(ids, list):
+            raise ModerationError('ids must be a list')
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in ids))
+        except (TypeError, ValueError):
+            raise ModerationError('Comment ids must be integers')
+        if not ids:
+            raise ModerationError(f'No comment IDs provided for {action}')
+        reply = None
+        if action == 'reply':
+            if 'admin_reply' not in item:
+                raise ModerationError('Reply operations need admin_reply')
+            reply = item['admin_reply'] or None
+        total += len(ids)
+        operations.append((action, ids, reply))
+
+    if total > max_ids:
+        raise ModerationError(f'At most {max_ids} comment ids per batch')
+    return operations
+
+
+def _chunks(ids, size):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _quoted(name):
+    return connection.ops.quote_name(Comment._meta.get_field(name).column)
+
+
+def _update_postgresql(values, ids, now):
+    """
+    One UPDATE ... RETURNING for the rows of ids that values would change.
+    The locked subquery supplies the state of each row before the update.
+    """
+    table = connection.ops.quote_name(Comment._meta.db_table)
+    pk, post, approved, is_trash = _quoted('id'), _quoted('post'), _quoted('approved'), _quoted('is_trash')
+    assignments = ', '.join(f'{_quoted(name)} = %s' for name in values)
+    changed = ' OR '.join(f'{_quoted(name)} IS DISTINCT FROM %s' for name in values)
+    sql = f'''
+        UPDATE {table} AS c SET {assignments}, {_quoted('updated_at')} = %s
+        FROM (
+            SELECT {pk}, {approved}, {is_trash} FROM {table}
+            WHERE {pk} = ANY(%s) AND ({changed})
+            FOR UPDATE
+        ) AS old
+        WHERE c.{pk} = old.{pk}
+        RETURNING c.{pk}, c.{post}, old.{approved}, old.{is_trash}
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*values.values(), now, ids, *values.values()])
+        return cursor.fetchall()
+
+
+def _delete_postgresql(ids):
+    table = connection.ops.quote_name(Comment._meta.db_table)
+    pk, post, approved, is_trash = _quoted('id'), _quoted('post'), _quoted('approved'), _quoted('is_trash')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {pk} = ANY(%s) RETURNING {pk}, {post}, {approved}, {is_trash}',
+            [ids]
+        )
+        return cursor.fetchall()
+
+
+def _update_locked(values, ids, now):
+    """Other databases: lock and read the rows that change, then update them"""
+    rows = list(
+        Comment.objects.filter(pk__in=ids).exclude(**values).select_for_update().order_by()
+        .values_list('id', 'post_id', 'approved', 'is_trash')
+    )
+    if rows:
+        # The base manager's update() leaves the counters to moderate_comments()
+        Comment._base_manager.filter(pk__in=[row[0] for row in rows]).update(**values, updated_at=now)
+    return rows
+
+
+def _delete_locked(ids):
+    rows = list(
+        Comment.objects.filter(pk__in=ids).select_for_update().order_by()
+        .values_list('id', 'post_id', 'approved', 'is_trash')
+    )
+    if rows:
+        Comment._base_manager.filter(pk__in=[row[0] for row in rows]).delete()
+    return rows
+
+
+def _run_chunk(action, values, ids, now):
+    """Rows (id, post_id, approved, is_trash) before the change of those that changed"""
+    if connection.vendor == 'postgresql':
+        if action == 'delete':
+            return _delete_postgresql(ids)
+        return _update_postgresql(values, ids, now)
+    if action == 'delete':
+        return _delete_locked(ids)
+    return _update_locked(values, ids, now)
+
+
+def moderate_comments(operations, chunk_size=None):
+    """
+    Run [(action, ids, reply)] as set-based statements of at most chunk_size
+    ids, all in one transaction, in the given order.
+
+    Post comment counters are adjusted once for the whole batch. Returns one
+    {'id', 'action', 'outcome'} per id; the outcome is 'updated', 'deleted',
+    'unchanged' (already in the requested state) or 'not_found'.
+    """
+    if chunk_size is None:
+        chunk_size = getattr(settings, 'COMMENT_MODERATION_CHUNK_SIZE', 500)
+    now = timezone.now()
+    results = []
+    transitions = []
+    post_ids = set()
+
+    with transaction.atomic():
+        for action, ids, reply in operations:
+            values = {'admin_reply': reply} if action == 'reply' else ACTIONS[action]
+            for chunk in _chunks(ids, chunk_size):
+                rows = _run_chunk(action, values, chunk, now)
+                changed = set()
+                for pk, post_id, approved, is_trash in rows:
+                    changed.add(pk)
+                    post_ids.add(post_id)
+                    before = (post_id, approved, is_trash)
+                    if action == 'delete':
+                        after = None
+                    else:
+                        after = (post_id, values.get('approved', approved), values.get('is_trash', is_trash))
+                    transitions.append((before, after))
+
+                missing = [pk for pk in chunk if pk not in changed]
+                existing = set()
+                if missing and action != 'delete':
+                    existing = set(Comment.objects.filter(pk__in=missing).values_list('id', flat=True))
+                for pk in chunk:
+                    if pk in changed:
+                        outcome = DELETED if action == 'delete' else UPDATED
+                    else:
+                        outcome = UNCHANGED if pk in existing else NOT_FOUND
+                    results.append({'id': pk, 'action': action, 'outcome': outcome})
+
+        apply_comment_counter_deltas(comment_counter_deltas(transitions))
+
+    if post_ids:
+        comments_changed.send(sender=Comment, post_ids=post_ids)
+    logger.info(f"Moderated {len(results)} comment(s), {len(transitions)} changed")
+    return results
+
+
+def summarize_results(results):
+    """Number of ids per outcome"""
+    summary = {UPDATED: 0, DELETED: 0, UNCHANGED: 0, NOT_FOUND: 0}
+    for result in results:
+        summary[result['outcome']] += 1
+    return summary
@@ -0,0 +1,195 @@
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+REPORT_KEY = 'blog:nplusone:report'
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?\b')
+PLACEHOLDER_RE = re.compile(r'%s|\?')
+# IN (?, ?, ?) and VALUES (?, ?), (?, ?) vary with the number of rows
+LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+ROWS_RE = re.compile(r'\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+')
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Shape of a SQL statement: literals and placeholders become ?, and lists
+    of them collapse, so queries differing only in parameters compare equal.
+    """
+    shape = STRING_RE.sub('?', sql)
+    shape = NUMBER_RE.sub('?', shape)
+    shape = PLACEHOLDER_RE.sub('?', shape)
+    shape = LIST_RE.sub('(?...)', shape)
+    shape = ROWS_RE.sub('(?...)', shape)
+    return WHITESPACE_RE.sub(' ', shape).strip()
+
+
+# Installed packages (including a virtualenv inside the project) and this module
+IGNORED_PATHS = (
+    os.path.sep + 'site-packages' + os.path.sep,
+    os.path.sep + 'dist-packages' + os.path.sep,
+    __file__,
+)
+
+
+def caller():
+    """The innermost frame of project code on the stack, as 'path:line in function'"""
+    root = str(settings.BASE_DIR) + os.path.sep
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and not any(path in filename for path in IGNORED_PATHS):
+            return f'{os.path.relpath(filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def cache_tables():
+    """Tables of the database cache backends"""
+    return [
+        config['LOCATION'] for config in settings.CACHES.values()
+        if config['BACKEND'] == 'django.core.cache.backends.db.DatabaseCache'
+    ]
+
+
+class QueryDetector:
+    """
+    Counts the statements of one request by fingerprint.
+
+    Installed as an execute wrapper on every database connection. The stack
+    is only walked when a fingerprint reaches the threshold, so requests
+    without repeated queries pay one regex pass per statement. Statements
+    of a database cache backend are the cache's, not the view's, and are
+    not counted.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+        self.samples = {}
+        self.locations = {}
+        self.ignored = tuple(cache_tables())
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.ignored and any(table in sql for table in self.ignored):
+            return execute(sql, params, many, context)
+        shape = fingerprint(sql)
+        self.counts[shape] += 1
+        if self.counts[shape] == self.threshold:
+            self.samples[shape] = sql
+            self.locations[shape] = caller()
+        return execute(sql, params, many, context)
+
+    def findings(self):
+        """(fingerprint, count, sample sql, location) of every repeated shape"""
+        return [
+            (shape, count, self.samples[shape], self.locations[shape])
+            for shape, count in self.counts.items()
+            if count >= self.threshold
+        ]
+
+
+class QueryReport:
+    """
+    Rolling report of repeated queries, shared through the cache.
+
+    Entries are keyed by view and fingerprint and keep the number of
+    requests that repeated the query, the worst repeat count and where it
+    was issued. Only the most recently seen size entries are kept. Updates
+    are read-modify-write, so concurrent workers may occasionally drop a
+    hit; the report is a diagnostic, not an audit log.
+    """
+
+    def __init__(self, alias='default', size=200, timeout=7 * 24 * 3600):
+        self.alias = alias
+        self.size = size
+        self.timeout = timeout
+
+    def entries(self):
+        return caches[self.alias].get(REPORT_KEY) or {}
+
+    def record(self, view, findings):
+        cache = caches[self.alias]
+        entries = cache.get(REPORT_KEY) or {}
+        now = time.time()
+        for shape, count, sql, location in findings:
+            entry = entries.pop((view, shape), None) or {
+                'view': view, 'fingerprint': shape, 'requests': 0, 'max_count': 0,
+                'first_seen': now,
+            }
+            entry['requests'] += 1
+            entry['max_count'] = max(entry['max_count'], count)
+            entry['last_count'] = count
+            entry['last_seen'] = now
+            entry['sql'] = sql
+            entry['location'] = location
+            # Re-inserted last: dicts keep insertion order, oldest first
+            entries[(view, shape)] = entry
+        while len(entries) > self.size:
+            del entries[next(iter(entries))]
+        cache.set(REPORT_KEY, entries, self.timeout)
+
+    def clear(self):
+        caches[self.alias].delete(REPORT_KEY)
+
+
+query_report = QueryReport(
+    alias=getattr(settings, 'NPLUSONE_REPORT_CACHE_ALIAS', 'default'),
+    size=getattr(settings, 'NPLUSONE_REPORT_SIZE', 200),
+)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return f'{request.method} {request.path}'
+    return f'{request.method} {match.view_name or match._func_path}'
+
+
+class NPlusOneMiddleware:
+    """
+    Flag query shapes a request runs NPLUSONE_THRESHOLD times or more.
+
+    Off unless NPLUSONE_DETECTOR is set: the middleware then removes itself
+    from the chain at startup, so disabled it costs nothing per request.
+    Findings are logged and added to query_report; see the nplusone_report
+    command.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'NPLUSONE_DETECTOR', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'NPLUSONE_THRESHOLD', 5)
+
+    def __call__(self, request):
+        detector = QueryDetector(self.threshold)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(detector))
+            response = self.get_response(request)
+
+        findings = detector.findings()
+        if findings:
+            view = view_name(request)
+            for shape, count, _, location in findings:
+                logger.warning(f"{view} ran {count} queries of one shape at {location}: {shape}")
+            try:
+                query_report.record(view, findings)
+            except Exception as e:
+                logger.error(f"Could not update the repeated query report: {e}")
+        return response
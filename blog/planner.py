@@ -0,0 +1,168 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+LOOKUP_SEP = '__'
+
+
+class QueryPlan:
+    """
+    The columns, joins and prefetches a representation of model reads.
+
+    Built by read()ing lookups such as 'title', 'post__title' or 'images':
+    columns go to only(), forward relations that are read past their key to
+    select_related() and to-many relations to prefetch_related(). Anything
+    the plan cannot see into (a property, a method) loads every column of
+    its model, so a plan may load too much but never too little.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = set()
+        self.select = set()
+        self.prefetch = {}
+
+    def _model_at(self, prefix):
+        model = self.model
+        for part in prefix.split(LOOKUP_SEP) if prefix else ():
+            model = model._meta.get_field(part).related_model
+        return model
+
+    def read_all(self, prefix=''):
+        """Every column of the model at prefix ('' for the planned model)"""
+        path = prefix + LOOKUP_SEP if prefix else ''
+        if prefix:
+            self.read(prefix)
+        for field in self._model_at(prefix)._meta.concrete_fields:
+            self.columns.add(path + field.name)
+        if prefix:
+            self.select.add(prefix)
+
+    def read(self, lookup):
+        """Record that the representation reads lookup (or runs a Prefetch)"""
+        if isinstance(lookup, Prefetch):
+            self.prefetch[lookup.prefetch_to] = lookup
+            return
+
+        model = self.model
+        path = ''
+        parts = lookup.split(LOOKUP_SEP)
+        for index, part in enumerate(parts):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                if part == 'pk':
+                    return
+                # A property or method: what it reads is unknown
+                self.read_all(path[:-len(LOOKUP_SEP)] if path else '')
+                return
+            if not field.is_relation:
+                self.columns.add(path + field.name)
+                return
+            if not (field.many_to_one or field.one_to_one) or not field.concrete:
+                # To-many (or reverse one-to-one): whole related rows
+                self.prefetch.setdefault(path + part, path + part)
+                return
+            self.columns.add(path + field.name)
+            if index == len(parts) - 1:
+                # Just the key
+                return
+            self.select.add(path + field.name)
+            path += field.name + LOOKUP_SEP
+            model = field.related_model
+
+    def read_serializer(self, serializer, prefix=''):
+        """
+        Record what serializer renders; its fields are read at prefix.
+
+        Meta.always_load names lookups read outside of fields (ordering keys,
+        cache stamps). Meta.field_sources maps fields the plan cannot see
+        into (method fields, fields rewritten in to_representation) to the
+        lookups or Prefetch objects they read; entries for relations only
+        apply while serializer.expands() the relation.
+        """
+        meta = serializer.Meta
+        path = prefix + LOOKUP_SEP if prefix else ''
+        sources = getattr(meta, 'field_sources', {})
+        expands = getattr(serializer, 'expands', lambda name: True)
+
+        for lookup in getattr(meta, 'always_load', ()):
+            self.read(path + lookup)
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if name in sources and expands(name):
+                for lookup in sources[name]:
+                    self.read(lookup if isinstance(lookup, Prefetch) else path + lookup)
+                continue
+            if field.source == '*':
+                self.read_all(prefix)
+                continue
+            lookup = path + field.source.replace('.', LOOKUP_SEP)
+            if isinstance(field, serializers.ListSerializer) and isinstance(field.child, serializers.ModelSerializer):
+                self.read_many(lookup, field.child)
+            elif isinstance(field, serializers.ModelSerializer):
+                self.read(lookup)
+                self.read_serializer(field, lookup)
+            else:
+                self.read(lookup)
+
+    def read_many(self, lookup, serializer):
+        """Prefetch a to-many relation rendered by a nested serializer, loading only what it renders"""
+        field = self._model_at(lookup.rpartition(LOOKUP_SEP)[0])._meta.get_field(lookup.rpartition(LOOKUP_SEP)[2])
+        if not field.one_to_many:
+            self.read(lookup)
+            return
+        child = QueryPlan(field.related_model)
+        child.read_serializer(serializer)
+        # Prefetching matches rows back to their parent through the key
+        child.read(field.field.name)
+        self.read(Prefetch(lookup, queryset=child.apply(field.related_model._default_manager.all())))
+
+    def apply(self, queryset):
+        """queryset loading what the plan reads and nothing else"""
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if self.select:
+            queryset = queryset.select_related(*sorted(self.select))
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch.values())
+        return queryset.only(*sorted(self.columns))
+
+
+def plan_serializer(serializer):
+    """QueryPlan of a (context-bound) serializer instance"""
+    plan = QueryPlan(serializer.Meta.model)
+    plan.read_serializer(serializer)
+    return plan
+
+
+def plan_list_display(model_admin, list_display):
+    """
+    QueryPlan of an admin changelist.
+
+    model_admin.list_sources maps list_display entries the plan cannot see
+    into (methods, relations rendered with str()) to the lookups they read.
+    """
+    model = model_admin.model
+    plan = QueryPlan(model)
+    sources = getattr(model_admin, 'list_sources', {})
+    for name in list_display:
+        if name == 'action_checkbox':
+            continue
+        if name in sources:
+            for lookup in sources[name]:
+                plan.read(lookup)
+            continue
+        try:
+            field = model._meta.get_field(name) if isinstance(name, str) else None
+        except FieldDoesNotExist:
+            field = None
+        if field is None:
+            # __str__, a method or a callable
+            plan.read_all()
+        elif field.is_relation and field.concrete:
+            # Rendered with str() of the related object
+            plan.read_all(name)
+        else:
+            plan.read(name)
+    return plan
@@ -0,0 +1,145 @@
+import logging
+import re
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import CharField, F, FloatField, Func, Value
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.html import strip_tags
+
+from .models import BlogPost
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# Text search configuration used for the PostgreSQL tsvector column
+SEARCH_CONFIG = 'english'
+
+# SQLite FTS5 table mirroring title and plain-text body of every post
+FTS_TABLE = 'blog_blogpost_fts'
+
+SNIPPET_START = '<mark>'
+SNIPPET_STOP = '</mark>'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def plain_content():
+    """SQL expression for the post body with the CKEditor HTML tags removed"""
+    return Func(
+        F('content'), Value('<[^>]+>'), Value(' '), Value('g'),
+        function='regexp_replace'
+    )
+
+
+def search_vector():
+    """Weighted tsvector: the title ranks above the body"""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(plain_content(), weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def index_post(post):
+    """Refresh the search index entry of a saved post"""
+    if connection.vendor == 'postgresql':
+        BlogPost.objects.filter(pk=post.pk).update(search_vector=search_vector())
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (%s, %s, %s)',
+                [post.pk, post.title, strip_tags(post.content or '')]
+            )
+
+
+def unindex_post(pk):
+    """Drop a deleted post from the search index"""
+    # The PostgreSQL vector lives on the post row and goes away with it
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def search_posts(query, limit=20):
+    """
+    Full-text search over published posts.
+
+    Returns dicts with id, title, slug, featured_image, created_at, rank and
+    a highlighted snippet, best match first.
+    """
+    if connection.vendor == 'postgresql':
+        return _search_postgresql(query, limit)
+    if connection.vendor == 'sqlite':
+        return _search_sqlite(query, limit)
+    return _search_fallback(query, limit)
+
+
+def _search_postgresql(query, limit):
+    search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+    return list(
+        BlogPost.objects.filter(published=True, search_vector=search_query)
+        .annotate(
+            rank=SearchRank(F('search_vector'), search_query),
+            snippet=SearchHeadline(
+                plain_content(), search_query, config=SEARCH_CONFIG,
+                start_sel=SNIPPET_START, stop_sel=SNIPPET_STOP,
+                max_words=35, min_words=15,
+            ),
+        )
+        .order_by('-rank', '-created_at')
+        .values('id', 'title', 'slug', 'featured_image', 'created_at', 'rank', 'snippet')[:limit]
+    )
+
+
+def _fts_match_expression(query):
+    """Quote every word so user input can never be parsed as FTS5 syntax"""
+    return ' '.join(f'"{token}"' for token in _TOKEN_RE.findall(query))
+
+
+def _search_sqlite(query, limit):
+    match = _fts_match_expression(query)
+    if not match:
+        return []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            SELECT p.id, p.title, p.slug, p.featured_image, p.created_at,
+                   -bm25({FTS_TABLE}, 10.0, 1.0) AS rank,
+                   snippet({FTS_TABLE}, 1, %s, %s, '...', 32) AS snippet
+            FROM {FTS_TABLE}
+            JOIN {BlogPost._meta.db_table} p ON p.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s AND p.published
+            ORDER BY rank DESC, p.created_at DESC
+            LIMIT %s
+            ''',
+            [SNIPPET_START, SNIPPET_STOP, match, limit]
+        )
+        columns = [col[0] for col in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    # Raw rows bypass the field converters, so parse timestamps explicitly
+    for row in rows:
+        created_at = row['created_at']
+        if isinstance(created_at, str):
+            created_at = parse_datetime(created_at)
+        if settings.USE_TZ and timezone.is_naive(created_at):
+            created_at = timezone.make_aware(created_at, dt_timezone.utc)
+        row['created_at'] = created_at
+    return rows
+
+
+def _search_fallback(query, limit):
+    """Unindexed substring match for databases without a search backend"""
+    logger.warning(f"No full-text index for {connection.vendor}, using a sequential scan")
+    return list(
+        BlogPost.objects.filter(published=True, title__icontains=query)
+        .order_by('-created_at')
+        .values('id', 'title', 'slug', 'featured_image', 'created_at')
+        .annotate(rank=Value(None, output_field=FloatField()),
+                  snippet=Value(None, output_field=CharField()))[:limit]
+    )
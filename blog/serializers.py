@@ -1,16 +1,55 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+from .fieldsets import SparseFieldsetMixin
+from .fragments import FragmentCachedSerializerMixin, FragmentListSerializer
+from .image_jobs import attach_images
+from .images import srcset, validate_image_upload
 from .models import BlogPost, BlogImage, Comment
 
+class SrcsetField(serializers.ReadOnlyField):
+    """
+    Responsive variants of an image field as <picture> sources:
+    [{"type": "image/avif", "srcset": "<url> 320w, <url> 640w"}, ...]
+    """
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        storage = self.parent.Meta.model._meta.get_field(self.image_field).storage
+        request = self.context.get('request')
+
+        def url(name):
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return srcset(value, url)
+
 class BlogImageSerializer(serializers.ModelSerializer):
+    image_srcset = SrcsetField('image', source='image_variants')
+
     class Meta:
         model = BlogImage
-        fields = ['id', 'image', 'created_at']
+        fields = ['id', 'image', 'image_state', 'image_srcset', 'created_at']
+        read_only_fields = ['image_state']
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(FragmentCachedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    A comment. The post is embedded as {id, title, slug} unless the request
+    passes ?expand= without 'post', in which case it is the post id.
+    """
     post_title = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
+        list_serializer_class = FragmentListSerializer
+        always_load = ['id', 'post', 'created_at', 'updated_at']
+        # The embedded post and the fragment stamp (see blog.planner)
+        field_sources = {
+            'post': ['post__title', 'post__slug', 'post__updated_at'],
+            'post_title': ['post__title', 'post__updated_at'],
+        }
         fields = [
             'id', 'post', 'post_title', 'author_name', 'author_email', 'author_website',
             'content', 'approved', 'is_trash', 'created_at', 'updated_at', 'admin_reply',
@@ -18,6 +57,16 @@ class CommentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'ip_address', 'user_agent']
         
+    def reads_post(self):
+        """Whether the representation renders fields of the post itself"""
+        return 'post_title' in self.fields or ('post' in self.fields and self.expands('post'))
+
+    def fragment_stamps(self, instance):
+        if not self.reads_post():
+            return [instance.updated_at]
+        # The post title and slug are rendered into every comment
+        return [instance.updated_at, instance.post.updated_at if instance.post else None]
+
     def get_post_title(self, obj):
         if obj.post:
             return obj.post.title
@@ -26,7 +75,7 @@ class CommentSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         # Include post information for frontend display
-        if instance.post:
+        if 'post' in representation and self.expands('post') and instance.post:
             representation['post'] = {
                 'id': instance.post.id,
                 'title': instance.post.title,
@@ -34,38 +83,72 @@ class CommentSerializer(serializers.ModelSerializer):
             }
         return representation
 
-class BlogPostListSerializer(serializers.ModelSerializer):
-    featured_image = serializers.ImageField(max_length=None, use_url=True, required=False)
+class BlogPostListSerializer(FragmentCachedSerializerMixin, SparseFieldsetMixin, serializers.ModelSerializer):
+    # slug, excerpt, word_count and reading_time were added
+    fragment_version = 3
+
+    featured_image = serializers.ImageField(max_length=None, use_url=True, required=False,
+                                            validators=[validate_image_upload])
+    featured_image_srcset = SrcsetField('featured_image', source='featured_image_variants')
     
     class Meta:
         model = BlogPost
-        fields = ['id', 'title', 'featured_image', 'published', 'created_at']
-        read_only_fields = ['id', 'created_at']
+        fields = ['id', 'title', 'slug', 'excerpt', 'word_count', 'reading_time', 'featured_image',
+                  'featured_image_srcset', 'published', 'created_at']
+        read_only_fields = ['id', 'slug', 'excerpt', 'word_count', 'reading_time', 'created_at']
+        list_serializer_class = FragmentListSerializer
+        # Pagination keys and fragment cache stamp
+        always_load = ['id', 'created_at', 'updated_at']
 
-class BlogPostSerializer(serializers.ModelSerializer):
+class BlogPostSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    A post with its images and approved comments. ?expand= limits the embedded
+    relations to the ones listed; images and comments not listed are left out.
+    """
     images = BlogImageSerializer(many=True, read_only=True)
     comments = serializers.SerializerMethodField()
-    featured_image = serializers.ImageField(max_length=None, use_url=True, required=False)
+    featured_image = serializers.ImageField(max_length=None, use_url=True, required=False,
+                                            validators=[validate_image_upload])
+    featured_image_srcset = SrcsetField('featured_image', source='featured_image_variants')
     additional_images = serializers.ListField(
-        child=serializers.ImageField(max_length=None, allow_empty_file=False),
+        child=serializers.ImageField(max_length=None, allow_empty_file=False,
+                                     validators=[validate_image_upload]),
         write_only=True,
         required=False
     )
     
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in ('images', 'comments'):
+            if name in fields and not self.expands(name):
+                del fields[name]
+        return fields
+
     def get_comments(self, obj):
         # Check if we have prefetched approved_comments
         if hasattr(obj, 'approved_comments'):
-            return CommentSerializer(obj.approved_comments, many=True).data
+            comments = obj.approved_comments
         else:
             # Fallback to filtering (less efficient)
-            comments = obj.comments.filter(approved=True)
-            return CommentSerializer(comments, many=True).data
+            comments = obj.comments.filter(approved=True).select_related('post')
+        # The field selection applies to the post, not to its comments
+        context = {**self.context, 'fieldset': None}
+        return CommentSerializer(comments, many=True, context=context).data
     
     class Meta:
         model = BlogPost
-        fields = ['id', 'title', 'content', 'featured_image', 'images', 'comments', 
-                 'additional_images', 'published', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'slug', 'content', 'featured_image', 'featured_image_srcset', 'images', 'comments', 
+                 'additional_images', 'published', 'created_at', 'updated_at',
+                 'approved_count', 'pending_count', 'trash_count', 'featured_image_state',
+                 'excerpt', 'word_count', 'reading_time']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'excerpt', 'word_count', 'reading_time',
+                            'approved_count', 'pending_count', 'trash_count', 'featured_image_state']
+        always_load = ['id']
+        field_sources = {
+            'comments': [Prefetch(
+                'comments', queryset=Comment.objects.filter(approved=True), to_attr='approved_comments'
+            )],
+        }
     
     def create(self, validated_data):
         # Extract additional images if present
@@ -76,9 +159,9 @@ class BlogPostSerializer(serializers.ModelSerializer):
         # Create the blog post
         blog_post = BlogPost.objects.create(**validated_data)
         
-        # Create image entries for each additional image
-        for image_data in additional_images:
-            BlogImage.objects.create(post=blog_post, image=image_data)
+        # Create image entries for all additional images in one batch
+        if additional_images:
+            attach_images(blog_post, additional_images)
             
         return blog_post
     
@@ -93,8 +176,8 @@ class BlogPostSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         instance.save()
         
-        # Create image entries for each additional image
-        for image_data in additional_images:
-            BlogImage.objects.create(post=instance, image=image_data)
+        # Create image entries for all additional images in one batch
+        if additional_images:
+            attach_images(instance, additional_images)
             
         return instance 
\ No newline at end of file
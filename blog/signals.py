@@ -0,0 +1,74 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import invalidate_posts
+from .stats import comment_stats
+from .search import index_post, unindex_post
+from .autocomplete import track_post_change
+from .slugs import track_slug_change
+from .models import BlogPost, BlogImage, Comment, MediaBlob, comments_changed
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+def invalidate_post_responses(sender, instance, **kwargs):
+    """A post change affects its detail response and every list response"""
+    invalidate_posts([instance.pk], include_list=True)
+
+
+@receiver(post_save, sender=BlogPost)
+def update_post_search_index(sender, instance, update_fields=None, **kwargs):
+    """Keep the full-text index in step with title and content"""
+    if update_fields is not None and not {'title', 'content'}.intersection(update_fields):
+        return
+    index_post(instance)
+
+
+@receiver(post_save, sender=BlogPost)
+def update_title_autocomplete(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'title', 'slug', 'published'}.intersection(update_fields):
+        return
+    track_post_change(instance)
+
+
+@receiver(post_save, sender=BlogPost)
+def update_slug_map(sender, instance, created=False, **kwargs):
+    """Slugs only change on creation or when edited; titles do not touch them"""
+    if created or getattr(instance, '_retired_slug', None):
+        track_slug_change(instance)
+
+
+@receiver(post_delete, sender=BlogPost)
+def remove_post_search_index(sender, instance, **kwargs):
+    unindex_post(instance.pk)
+    track_post_change(instance, deleted=True)
+    track_slug_change(instance, deleted=True)
+
+
+@receiver([post_save, post_delete], sender=BlogImage)
+def invalidate_image_post_responses(sender, instance, **kwargs):
+    """Images are only rendered in the detail response of their post"""
+    invalidate_posts([instance.post_id])
+
+
+@receiver(post_delete, sender=BlogPost)
+def release_post_media(sender, instance, **kwargs):
+    MediaBlob.objects.release(instance.media_names())
+
+
+@receiver(post_delete, sender=BlogImage)
+def release_image_media(sender, instance, **kwargs):
+    MediaBlob.objects.release([instance.image.name])
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_post_responses(sender, instance, **kwargs):
+    """Approved comments are embedded in the detail response of their post"""
+    invalidate_posts([instance.post_id])
+    comment_stats.invalidate()
+
+
+@receiver(comments_changed, sender=Comment)
+def invalidate_bulk_comment_post_responses(sender, post_ids, **kwargs):
+    """Queryset update() on comments bypasses post_save"""
+    invalidate_posts(post_ids)
+    comment_stats.invalidate()
@@ -0,0 +1,100 @@
+import logging
+import threading
+
+from django.db import transaction
+
+from .models import BlogPost, PostSlug, SharedVersion
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# SharedVersion bumped on every slug change, so each worker knows when the
+# map it built no longer reflects writes made by other workers
+VERSION_NAME = 'slugs'
+
+
+class SlugMap:
+    """
+    In-process map from current and former post slugs to post ids.
+
+    Resolving a slug is a dict lookup plus a primary key read of the shared
+    version counter. Local saves update the map in place; writes made by
+    other workers are noticed through the counter and trigger a rebuild on
+    the next lookup, the same scheme as the title autocomplete index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._slugs = {}
+        self._version = None
+
+    def _rebuild(self, version):
+        ids = dict(PostSlug.objects.values_list('slug', 'post_id').iterator())
+        current = dict(BlogPost.objects.values_list('id', 'slug').iterator())
+        # Current slugs win over old slugs of other posts
+        ids.update((slug, post_id) for post_id, slug in current.items() if slug)
+        self._ids = ids
+        self._slugs = current
+        self._version = version
+        logger.info(f"Rebuilt slug map with {len(ids)} slugs")
+
+    def clear(self):
+        """Drop the map; the next lookup rebuilds it"""
+        with self._lock:
+            self._ids, self._slugs, self._version = {}, {}, None
+
+    def _shared_version(self):
+        return SharedVersion.objects.current(VERSION_NAME)
+
+    def post_changed(self, post, retired_slug=None, deleted=False):
+        """Apply a saved or deleted post to this worker's map"""
+        version = SharedVersion.objects.bump(VERSION_NAME)
+        with self._lock:
+            if self._version is None or version != self._version + 1:
+                # Missed writes from another worker: rebuild lazily
+                self._version = None
+                return
+            if deleted:
+                self._slugs.pop(post.pk, None)
+                self._ids = {slug: post_id for slug, post_id in self._ids.items() if post_id != post.pk}
+            else:
+                self._slugs[post.pk] = post.slug
+                if retired_slug:
+                    self._ids[retired_slug] = post.pk
+                if post.slug:
+                    self._ids[post.slug] = post.pk
+            self._version = version
+
+    def resolve(self, slug):
+        """Id of the post currently or formerly known by slug, or None"""
+        version = self._shared_version()
+        with self._lock:
+            if version != self._version:
+                self._rebuild(version)
+            post_id = self._ids.get(slug)
+        if post_id is None:
+            # Not in the map yet (e.g. committed by another worker after the
+            # counter was read): the database has the final word
+            post_id = (
+                BlogPost.objects.filter(slug=slug).values_list('id', flat=True).first()
+                or PostSlug.objects.filter(slug=slug).values_list('post_id', flat=True).first()
+            )
+        return post_id
+
+
+slug_map = SlugMap()
+
+
+def resolve_slug(slug):
+    return slug_map.resolve(slug)
+
+
+def track_slug_change(post, deleted=False):
+    """Update the slug map once the write commits"""
+    retired_slug = getattr(post, '_retired_slug', None)
+
+    def apply():
+        slug_map.post_changed(post, retired_slug=retired_slug, deleted=deleted)
+
+    transaction.on_commit(apply)
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.db.models import Count, Q
+
+from .cache import TaggedCache
+from .models import Comment
+
+COMMENT_STATS_TAG = 'comment-stats'
+
+
+class CommentStats:
+    """
+    Site-wide comment counts for the moderation screens.
+
+    All counts come from a single conditional-aggregation query and are
+    cached briefly under a tag that every moderation write invalidates, so
+    the polled count endpoints hit the comments table at most once per
+    timeout window.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def compute(self):
+        """Count comments in every moderation state with one query"""
+        return Comment.objects.order_by().aggregate(
+            total=Count('id'),
+            all=Count('id', filter=Q(is_trash=False)),
+            pending=Count('id', filter=Q(approved=False, is_trash=False)),
+            approved=Count('id', filter=Q(approved=True, is_trash=False)),
+            trash=Count('id', filter=Q(is_trash=True)),
+        )
+
+    def get(self):
+        """Return the cached counts, computing them on a miss"""
+        counts, tokens = self.cache.lookup(COMMENT_STATS_TAG, [COMMENT_STATS_TAG])
+        if counts is None:
+            counts = self.compute()
+            self.cache.set(COMMENT_STATS_TAG, counts, tokens)
+        return counts
+
+    def invalidate(self):
+        self.cache.invalidate(COMMENT_STATS_TAG)
+
+
+comment_stats = CommentStats(TaggedCache(
+    alias=getattr(settings, 'API_RESPONSE_CACHE_ALIAS', 'default'),
+    prefix='blog-stats',
+    timeout=getattr(settings, 'COMMENT_STATS_CACHE_TIMEOUT', 30),
+))
@@ -0,0 +1,107 @@
+import hashlib
+import logging
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+# Setup logger
+logger = logging.getLogger(__name__)
+
+# Content-addressed files live under MEDIA_ROOT/blobs/
+BLOB_DIRECTORY = 'blobs'
+
+# Blob names as they appear in media URLs, e.g. in CKEditor post content
+BLOB_NAME_RE = re.compile(r'blobs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[a-z0-9]+')
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(BLOB_DIRECTORY + '/')
+
+
+def blob_names_in(html):
+    """Names of the blobs referenced by media URLs in an HTML fragment"""
+    return set(BLOB_NAME_RE.findall(html or ''))
+
+
+def file_digest(content):
+    """SHA-256 hex digest of a file, read in chunks"""
+    if not hasattr(content, 'chunks'):
+        content = File(content)
+    position = content.tell() if content.seekable() else None
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if position is not None:
+        content.seek(position)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that keeps a single copy of every distinct file.
+
+    save() names each file after the SHA-256 of its bytes, so saving the same
+    bytes twice returns the existing name without writing anything, and
+    registers it as a MediaBlob. Blobs are shared between rows, so delete()
+    leaves them alone; unreferenced blobs are removed by
+    'manage.py collect_media'. Names outside blobs/ (files stored before
+    this storage was introduced) behave as on FileSystemStorage.
+    """
+
+    def save(self, name, content, max_length=None):
+        blob_name, digest, size = self.save_blob(name, content, max_length=max_length)
+        from .models import MediaBlob
+        MediaBlob.objects.register(blob_name, digest, size)
+        return blob_name
+
+    def save_blob(self, name, content, max_length=None):
+        """
+        Write content as a blob without registering it.
+
+        Returns (blob name, SHA-256, size) for MediaBlob.objects.register();
+        used where the database must not be touched, e.g. in worker processes.
+        """
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = file_digest(content)
+        extension = posixpath.splitext(name)[1].lower()
+        blob_name = posixpath.join(BLOB_DIRECTORY, digest[:2], digest[2:4], digest + extension)
+
+        if not self.exists(blob_name):
+            saved = super().save(blob_name, content, max_length=max_length)
+            if saved != blob_name:
+                # Someone stored the same bytes concurrently; keep theirs
+                super().delete(saved)
+        return blob_name, digest, content.size
+
+    def save_derived(self, name, content, max_length=None):
+        """
+        Save a file derived from a blob (e.g. a resized variant) under name.
+
+        Derived names are a function of the blob's content, so an existing
+        file already holds the same bytes and is kept.
+        """
+        if is_blob_name(name) and self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def delete(self, name):
+        if is_blob_name(name):
+            return
+        super().delete(name)
+
+    def purge(self, name):
+        """Really delete a blob; only for unreferenced blobs"""
+        super().delete(name)
+
+
+media_storage_instance = ContentAddressedStorage()
+
+
+def media_storage():
+    """Storage of the blog image fields (a callable keeps it out of migrations)"""
+    return media_storage_instance
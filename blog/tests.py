@@ -1,3 +1,1272 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from .models import (
+    IMAGE_FAILED, IMAGE_PROCESSING, IMAGE_READY, BlogImage, BlogPost, Comment, ImageJob, MediaBlob, SharedVersion,
+)
+from .cache import POST_LIST_TAG, response_cache
+from .autocomplete import VERSION_NAME as AUTOCOMPLETE_VERSION, TitlePrefixIndex, title_index
+from .checks import check_shared_cache
+from .compression import CODINGS, negotiate
+from .fieldsets import Fieldset
+from .fragments import FragmentJSONRenderer, RawJSON
+from .image_jobs import attach_images, claim_jobs, complete_job, optimize_many, run_job
+from .images import build_variants, decode_image, inspect_image, optimize_stored, srcset
+from .moderation import ModerationError, parse_operations
+from .nplusone import QueryDetector, fingerprint, query_report
+from .planner import plan_serializer
+from .stats import comment_stats
+from .text import summarize
+from .slugs import VERSION_NAME as SLUGS_VERSION, SlugMap, slug_map
+from .serializers import BlogPostListSerializer, BlogPostSerializer, CommentSerializer
+from .storage import media_storage
+from .values import ValuesSerializer
+
+
+# Tables of the database cache backends
+CACHE_TABLES = [
+    config['LOCATION'] for config in settings.CACHES.values()
+    if config['BACKEND'] == 'django.core.cache.backends.db.DatabaseCache'
+]
+SAVEPOINT_PREFIXES = ('SAVEPOINT ', 'RELEASE SAVEPOINT ', 'ROLLBACK TO SAVEPOINT ')
+
+
+def is_cache_query(sql):
+    return any(connection.ops.quote_name(table) in sql for table in CACHE_TABLES)
+
+
+def split_cache_queries(queries):
+    """
+    Split captured queries into (endpoint, cache) queries.
+
+    The cache's are the database cache backend's, including the savepoints
+    it opens around its own writes. Every other savepoint is the endpoint's:
+    in production it is the BEGIN/COMMIT of an atomic block.
+    """
+    owner = []
+    for index, query in enumerate(queries):
+        sql = query['sql']
+        if not sql.startswith(SAVEPOINT_PREFIXES):
+            owner.append(is_cache_query(sql))
+        elif sql.startswith('SAVEPOINT '):
+            owner.append(None)
+        else:
+            name = sql.rsplit(' ', 1)[-1]
+            start = next(i for i in range(index - 1, -1, -1) if queries[i]['sql'] == f'SAVEPOINT {name}')
+            inner = [flag for flag in owner[start + 1:] if flag is not None]
+            owner[start] = bool(inner) and all(inner)
+            owner.append(owner[start])
+    endpoint = [query for query, cached in zip(queries, owner) if not cached]
+    cache_queries = [query for query, cached in zip(queries, owner) if cached]
+    return endpoint, cache_queries
+
+
+class QueryBudgetTestCase(APITestCase):
+    """
+    Base class asserting how many SQL queries an endpoint may run.
+
+    Caches and in-process maps are cleared before every measured request,
+    so budgets hold for cold requests. The queries of the database cache
+    backend have a budget of their own (see split_cache_queries()), since a
+    shared cache such as Redis runs none. assertConstantQueries() also grows
+    the data set and checks that neither count changes with the number of
+    rows returned.
+    """
+
+    def setUp(self):
+        # Created by the first lookup of a deployment, not per request
+        SharedVersion.objects.current(SLUGS_VERSION)
+        SharedVersion.objects.current(AUTOCOMPLETE_VERSION)
+        self.post = self.make_post('Query budgets')
+        self.other_posts = [self.make_post(f'Other post {index}') for index in range(3)]
+        self.add_comments(self.post, 3)
+
+    def make_post(self, title):
+        return BlogPost.objects.create(
+            title=title, content=f'<p>{title} body with <strong>rich</strong> text.</p>', published=True
+        )
+
+    def add_comments(self, post, count):
+        for index in range(count):
+            Comment.objects.create(
+                post=post, content=f'Approved comment {index}', author_name='Reader', approved=True
+            )
+            Comment.objects.create(
+                post=post, content=f'Pending comment {index}', author_name='Reader', approved=False
+            )
+
+    def grow(self):
+        """Add enough rows to fill every default page, running on-commit hooks as a commit would"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(25):
+                self.make_post(f'Extra post {index}')
+            self.add_comments(self.post, 25)
+        BlogImage.objects.bulk_create([
+            BlogImage(post=self.post, image=f'blog_images/extra-{index}.webp') for index in range(25)
+        ])
+
+    def count_queries(self, method, url, data=None, status_code=200):
+        """The (endpoint, cache) queries of one cold request"""
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        slug_map.clear()
+        title_index.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, status_code, getattr(response, 'data', response.content))
+        return split_cache_queries(queries.captured_queries)
+
+    def assertQueryBudget(self, budget, method, url, data=None, status_code=200, cache_budget=0):
+        queries, cache_queries = self.count_queries(method, url, data, status_code)
+        for kind, run, allowed in (('', queries, budget), ('cache ', cache_queries, cache_budget)):
+            self.assertLessEqual(
+                len(run), allowed,
+                f'{method.upper()} {url} ran {len(run)} {kind}queries (budget {allowed}):\n'
+                + '\n'.join(query['sql'] for query in run)
+            )
+        return len(queries), len(cache_queries)
+
+    def assertConstantQueries(self, budget, method, url, data=None, status_code=200, cache_budget=0):
+        small = self.assertQueryBudget(budget, method, url, data, status_code, cache_budget)
+        self.grow()
+        large = self.assertQueryBudget(budget, method, url, data, status_code, cache_budget)
+        self.assertEqual(small, large, f'{method.upper()} {url} runs more queries for more rows')
+
+
+class PostEndpointQueryTests(QueryBudgetTestCase):
+    def test_post_list(self):
+        self.assertConstantQueries(2, 'get', '/api/posts/')
+
+    def test_post_list_published_filter(self):
+        self.assertConstantQueries(2, 'get', '/api/posts/', {'published': 'true'})
+
+    def test_post_list_sparse_fields(self):
+        self.assertConstantQueries(2, 'get', '/api/posts/', {'fields': 'id,title,excerpt'})
+
+    def test_post_detail(self):
+        self.assertConstantQueries(4, 'get', f'/api/posts/{self.post.pk}/')
+
+    def test_post_detail_without_relations(self):
+        self.assertConstantQueries(2, 'get', f'/api/posts/{self.post.pk}/', {'expand': ''})
+
+    def test_post_by_slug(self):
+        # Includes building the in-process slug map
+        self.assertConstantQueries(7, 'get', f'/api/posts/by-slug/{self.post.slug}/')
+
+    def test_image_list(self):
+        self.assertConstantQueries(1, 'get', '/api/images/')
+
+
+class PostPaginationTests(QueryBudgetTestCase):
+    def ids(self, response):
+        return [post['id'] for post in json.loads(response.content)['results']]
+
+    def test_cursors_walk_every_post_once(self):
+        self.grow()
+        expected = list(
+            BlogPost.objects.filter(published=True).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        seen, url, params = [], '/api/posts/', {'page_size': 7}
+        first = self.client.get(url, params)
+        response = first
+        while True:
+            seen.extend(self.ids(response))
+            if response.data['next'] is None:
+                break
+            # Rows added while paging must not shift the following pages
+            self.make_post(f'Added while paging {len(seen)}')
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, expected)
+
+        second = self.client.get(first.data['next'])
+        self.assertEqual(self.ids(self.client.get(second.data['previous'])), self.ids(first))
+
+    def test_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/api/posts/', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+
+class SearchTests(QueryBudgetTestCase):
+    def search(self, query):
+        response = self.client.get('/api/posts/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_title_matches_rank_first(self):
+        in_body = BlogPost.objects.create(
+            title='Gardening notes', content='<p>Notes on <em>pruning</em> tomatoes.</p>', published=True
+        )
+        in_title = BlogPost.objects.create(title='Pruning tomatoes', content='<p>Notes.</p>', published=True)
+        results = self.search('pruning')
+        self.assertEqual([result['id'] for result in results], [in_title.pk, in_body.pk])
+        self.assertIn('<mark>pruning</mark>', results[1]['snippet'])
+
+    def test_unpublished_and_deleted_posts_are_not_found(self):
+        draft = BlogPost.objects.create(title='Secret zucchini', content='<p>Draft</p>', published=False)
+        gone = BlogPost.objects.create(title='Zucchini bread', content='<p>Gone</p>', published=True)
+        gone.delete()
+        self.assertEqual(self.search('zucchini'), [])
+        draft.published = True
+        draft.save()
+        self.assertEqual([result['id'] for result in self.search('zucchini')], [draft.pk])
+
+    def test_query_syntax_is_taken_literally(self):
+        [expected] = self.search('query budgets')
+        self.assertEqual(self.search('"query* (budgets:'), [expected])
+        self.assertEqual(self.search('budgets NOT query'), [])
+        self.assertEqual(self.client.get('/api/posts/search/', {'q': ' '}).status_code, 400)
+
+
+class ResponseCacheTests(QueryBudgetTestCase):
+    """Cached post responses are only served under the ETag they were rendered for"""
+
+    def rename_out_of_band(self, post, title):
+        # A queryset update sends no signal, like a worker or another process
+        BlogPost.objects.filter(pk=post.pk).update(title=title, updated_at=timezone.now())
+
+    def test_detail_changed_behind_the_cache_is_a_miss(self):
+        url = f'/api/posts/{self.post.pk}/'
+        cache.clear()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        self.rename_out_of_band(self.post, 'Renamed elsewhere')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['title'], 'Renamed elsewhere')
+
+    def test_list_changed_behind_the_cache_is_a_miss(self):
+        cache.clear()
+        first = self.client.get('/api/posts/')
+        self.assertEqual(self.client.get('/api/posts/')['X-Cache'], 'HIT')
+
+        self.rename_out_of_band(self.post, 'Renamed elsewhere')
+        response = self.client.get('/api/posts/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertIn('Renamed elsewhere', [post['title'] for post in json.loads(response.content)['results']])
+
+    def test_counters_are_part_of_the_detail_etag(self):
+        url = f'/api/posts/{self.post.pk}/'
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, content='New', author_name='Reader')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['pending_count'], 4)
+
+    def test_hit_runs_only_the_validator_query(self):
+        for url in (f'/api/posts/{self.post.pk}/', '/api/posts/', f'/api/posts/by-slug/{self.post.slug}/'):
+            self.client.get(url)
+            with self.assertNumQueries(1 if 'by-slug' not in url else 2):
+                self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+    def test_hit_counters_are_kept_in_the_process(self):
+        response_cache.reset_stats()
+        url = f'/api/posts/{self.post.pk}/'
+        self.client.get(url)
+        self.client.get(url)
+        self.assertEqual(self.client.get('/api/cache/stats/').json(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_list_validators_read_only_the_page(self):
+        self.grow()
+        page = self.client.get('/api/posts/', {'page_size': 5})
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(page.data['next'], HTTP_IF_NONE_MATCH=page['ETag'])
+        validator_sql = queries.captured_queries[0]['sql']
+        self.assertNotIn('COUNT(', validator_sql.upper())
+        self.assertIn('LIMIT 6', validator_sql.upper())
+
+
+class TaggedCacheTests(QueryBudgetTestCase):
+    def test_invalidating_any_tag_makes_the_entry_stale(self):
+        tokens = response_cache.tag_tokens(['post:1', POST_LIST_TAG])
+        response_cache.set('entry', {'value': 1}, tokens)
+        self.assertEqual(response_cache.get('entry'), {'value': 1})
+        response_cache.invalidate(POST_LIST_TAG)
+        self.assertIsNone(response_cache.get('entry'))
+
+    def test_invalidation_during_computation_is_not_lost(self):
+        tokens = response_cache.tag_tokens(['post:1'])
+        response_cache.invalidate('post:1')
+        response_cache.set('entry', {'value': 1}, tokens)
+        self.assertIsNone(response_cache.get('entry'))
+
+    def test_saving_a_post_invalidates_its_responses(self):
+        cache.clear()
+        url = f'/api/posts/{self.post.pk}/'
+        self.client.get(url)
+        self.client.get('/api/posts/')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get('/api/posts/')['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Renamed'
+            self.post.save()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/posts/')['X-Cache'], 'MISS')
+
+
+class ConditionalGetTests(QueryBudgetTestCase):
+    def test_post_detail_revalidates(self):
+        url = f'/api/posts/{self.post.pk}/'
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_comment_list_changes_with_its_comments(self):
+        params = {'post': self.post.pk, 'approved': 'true'}
+        etag = self.client.get('/api/comments/', params)['ETag']
+        self.assertEqual(self.client.get('/api/comments/', params, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Comment.objects.create(post=self.post, content='Late', author_name='Reader', approved=True)
+        response = self.client.get('/api/comments/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_approved_and_pending_lists_have_distinct_etags(self):
+        approved = self.client.get('/api/comments/', {'post': self.post.pk, 'approved': 'true'})
+        pending = self.client.get('/api/comments/', {'post': self.post.pk, 'approved': 'false'})
+        self.assertNotEqual(approved['ETag'], pending['ETag'])
+
+
+class CompressionTests(QueryBudgetTestCase):
+    def test_negotiation(self):
+        self.assertEqual(negotiate('gzip, br', ['br', 'gzip']), 'br')
+        self.assertEqual(negotiate('br;q=0.5, gzip', ['br', 'gzip']), 'gzip')
+        self.assertEqual(negotiate('*;q=0.1, br;q=0', ['br', 'gzip']), 'gzip')
+        self.assertIsNone(negotiate('identity', ['br', 'gzip']))
+
+    def test_gzip_response_is_the_identity_body_compressed(self):
+        plain = self.client.get('/api/posts/')
+        response = self.client.get('/api/posts/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+
+    def test_cached_bodies_are_compressed_once(self):
+        self.client.get('/api/posts/', HTTP_ACCEPT_ENCODING='gzip')
+        with mock.patch.dict(CODINGS, {'gzip': (mock.Mock(side_effect=AssertionError), 6, 9)}):
+            response = self.client.get('/api/posts/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class FragmentCacheTests(QueryBudgetTestCase):
+    def test_renderer_splices_fragments(self):
+        data = {'next': None, 'results': [RawJSON(b'{"id":1}'), {'title': 'Caf\u00e9 \u2028'}]}
+        self.assertEqual(
+            FragmentJSONRenderer().render(data),
+            JSONRenderer().render({'next': None, 'results': [{'id': 1}, {'title': 'Caf\u00e9 \u2028'}]})
+        )
+        indented = FragmentJSONRenderer().render(data, renderer_context={'indent': 2})
+        self.assertEqual(json.loads(indented)['results'][0], {'id': 1})
+
+    def test_comment_fragments_follow_the_post_title(self):
+        params = {'post': self.post.pk, 'fields': 'id,post_title'}
+        self.client.get('/api/comments/', params)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.title = 'Renamed'
+            self.post.save()
+        cache.clear()
+        results = json.loads(self.client.get('/api/comments/', params).content)['results']
+        self.assertEqual({comment['post_title'] for comment in results}, {'Renamed'})
+
+    def test_unchanged_rows_are_not_serialized_again(self):
+        self.client.get('/api/comments/', {'post': self.post.pk, 'approved': 'true'})
+        Comment.objects.create(post=self.post, content='New', author_name='Reader', approved=True)
+        cache.clear()
+        represent = mock.Mock(side_effect=lambda row: {'id': row['id']})
+        with mock.patch.object(ValuesSerializer, 'to_representation', represent):
+            results = json.loads(
+                self.client.get('/api/comments/', {'post': self.post.pk, 'approved': 'true'}).content
+            )['results']
+        self.assertEqual(represent.call_count, 1)
+        self.assertEqual(len(results), 4)
+
+
+class SparseFieldsetTests(QueryBudgetTestCase):
+    def get(self, url, params):
+        return json.loads(self.client.get(url, params).content)
+
+    def test_post_fields_and_expansions(self):
+        url = f'/api/posts/{self.post.pk}/'
+        self.assertEqual(set(self.get(url, {'fields': 'id,title,unknown'})), {'id', 'title'})
+        full = self.get(url, {})
+        self.assertIn('images', full)
+        self.assertEqual(len(full['comments']), 3)
+        trimmed = self.get(url, {'expand': 'images'})
+        self.assertIn('images', trimmed)
+        self.assertNotIn('comments', trimmed)
+
+    def test_comment_post_is_an_id_unless_expanded(self):
+        params = {'post': self.post.pk, 'fields': 'id,post'}
+        [comment, *_] = self.get('/api/comments/', {**params, 'expand': ''})['results']
+        self.assertEqual(comment['post'], self.post.pk)
+        [comment, *_] = self.get('/api/comments/', params)['results']
+        self.assertEqual(comment['post'], {'id': self.post.pk, 'title': self.post.title, 'slug': self.post.slug})
+
+    def test_fieldset_key_ignores_parameter_order(self):
+        self.assertEqual(
+            str(Fieldset(frozenset({'title', 'id'}), None)), str(Fieldset(frozenset({'id', 'title'}), None))
+        )
+        self.assertEqual(str(Fieldset(None, frozenset())), '*;')
+
+
+class PostSummaryTests(QueryBudgetTestCase):
+    def test_summary_of_html(self):
+        content = (
+            '<p>Hello&nbsp;<strong>world</strong></p><script>var hidden = 1;</script>'
+            '<ul><li>first</li><li>second</li></ul><!-- note -->'
+        )
+        self.assertEqual(summarize(content), ('Hello world first second', 4, 1))
+        with override_settings(POST_EXCERPT_LENGTH=12):
+            self.assertEqual(summarize(content)[0], 'Hello world…')
+        self.assertEqual(summarize(''), ('', 0, 0))
+        self.assertEqual(summarize('<p>' + 'word ' * 401 + '</p>')[2], 3)
+
+    def test_saved_and_backfilled(self):
+        self.assertEqual(self.post.word_count, 6)
+        self.post.content = '<p>Two words</p>'
+        self.post.save(update_fields=['content'])
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.excerpt, self.post.word_count), ('Two words', 2))
+
+        BlogPost.objects.update(excerpt='', word_count=0, reading_time=0)
+        call_command('backfill_post_summaries', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.excerpt, self.post.word_count, self.post.reading_time), ('Two words', 2, 1))
+
+
+class SharedCacheCheckTests(APITestCase):
+    def test_database_cache_passes(self):
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_local_memory_default_is_a_warning(self):
+        [warning] = check_shared_cache(None)
+        self.assertEqual(warning.id, 'blog.W001')
+        self.assertEqual(warning.level, checks.WARNING)
+
+
+class SlugMapTests(QueryBudgetTestCase):
+    def test_change_made_by_another_worker_is_seen(self):
+        here, elsewhere = SlugMap(), SlugMap()
+        slug = self.post.slug
+        self.assertEqual(here.resolve(slug), self.post.pk)
+
+        # Another worker hands the slug to a different post
+        other = self.other_posts[0]
+        BlogPost.objects.filter(pk=self.post.pk).update(slug='handed-over')
+        BlogPost.objects.filter(pk=other.pk).update(slug=slug)
+        other.slug = slug
+        elsewhere.post_changed(other)
+        self.assertEqual(here.resolve(slug), other.pk)
+
+    def test_local_change_updates_the_map_in_place(self):
+        slug_map = SlugMap()
+        slug_map.resolve(self.post.slug)
+        self.post.slug = 'renamed-in-place'
+        BlogPost.objects.filter(pk=self.post.pk).update(slug=self.post.slug)
+        slug_map.post_changed(self.post, retired_slug='query-budgets')
+        # One read of the shared version per lookup, no rebuild
+        with self.assertNumQueries(2):
+            self.assertEqual(slug_map.resolve('query-budgets'), self.post.pk)
+            self.assertEqual(slug_map.resolve('renamed-in-place'), self.post.pk)
+
+    def by_slug(self, slug):
+        return self.client.get(f'/api/posts/by-slug/{slug}/')
+
+    def save(self, post, **changes):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, value in changes.items():
+                setattr(post, name, value)
+            post.save()
+
+    def test_endpoint_follows_renames_and_deletes(self):
+        self.assertEqual(self.by_slug('query-budgets').data['id'], self.post.pk)
+        self.save(self.post, slug='new-slug')
+        self.assertEqual(self.by_slug('query-budgets').data['slug'], 'new-slug')
+        self.assertEqual(self.by_slug('new-slug').data['id'], self.post.pk)
+
+        # A current slug wins over the former slug of another post
+        other = self.other_posts[0]
+        self.save(other, slug='query-budgets')
+        self.assertEqual(self.by_slug('query-budgets').data['id'], other.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post.delete()
+        self.assertEqual(self.by_slug('new-slug').status_code, 404)
+        self.assertEqual(self.by_slug('never-existed').status_code, 404)
+
+
+class TitleIndexTests(QueryBudgetTestCase):
+    def test_change_made_by_another_worker_is_seen(self):
+        here, elsewhere = TitlePrefixIndex(), TitlePrefixIndex()
+        self.assertEqual([post['id'] for post in here.lookup('query')], [self.post.pk])
+
+        BlogPost.objects.filter(pk=self.post.pk).update(title='Renamed elsewhere')
+        self.post.title = 'Renamed elsewhere'
+        elsewhere.post_changed(self.post)
+        self.assertEqual([post['id'] for post in here.lookup('renamed')], [self.post.pk])
+        # Still found by its slug, under the new title
+        self.assertEqual([post['title'] for post in here.lookup('query')], ['Renamed elsewhere'])
+
+    def test_matches_any_word_titles_starting_with_prefix_first(self):
+        first = self.make_post('Budget travel')
+        index = TitlePrefixIndex()
+        self.assertEqual([post['id'] for post in index.lookup('budget')], [first.pk, self.post.pk])
+
+
+    def test_endpoint_suggests_published_titles_only(self):
+        self.make_post('Budget hotels')
+        BlogPost.objects.create(title='Budget draft', content='<p>Draft</p>', published=False)
+        response = self.client.get('/api/posts/autocomplete/', {'q': 'budg', 'limit': 2})
+        self.assertEqual([post['title'] for post in response.data['results']], ['Budget hotels', 'Query budgets'])
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(self.client.get('/api/posts/autocomplete/', {'q': ''}).data['results'], [])
+
+
+class CommentCounterTests(QueryBudgetTestCase):
+    def counters(self):
+        self.post.refresh_from_db()
+        return self.post.approved_count, self.post.pending_count, self.post.trash_count
+
+    def test_same_change_saved_from_two_stale_instances_counts_once(self):
+        pk = Comment.objects.filter(post=self.post, approved=False).values_list('id', flat=True).first()
+        first, second = Comment.objects.get(pk=pk), Comment.objects.get(pk=pk)
+        for comment in (first, second):
+            comment.approved = True
+            comment.save()
+        self.assertEqual(self.counters(), (4, 2, 0))
+
+    def test_counters_follow_saves_moves_and_deletes(self):
+        comment = Comment.objects.create(post=self.post, content='New', author_name='Reader')
+        self.assertEqual(self.counters(), (3, 4, 0))
+        comment.is_trash = True
+        comment.save()
+        self.assertEqual(self.counters(), (3, 3, 1))
+        comment.post = self.other_posts[0]
+        comment.save()
+        self.assertEqual(self.counters(), (3, 3, 0))
+        Comment.objects.filter(post=self.post, approved=True).delete()
+        self.assertEqual(self.counters(), (0, 3, 0))
+
+    def test_recount_repairs_drift_and_invalidates(self):
+        url = f'/api/posts/{self.post.pk}/'
+        BlogPost.objects.filter(pk=self.post.pk).update(approved_count=7)
+        updated_at = BlogPost.objects.get(pk=self.post.pk).updated_at
+        self.assertEqual(self.client.get(url).data['approved_count'], 7)
+
+        call_command('recount_comments', stdout=StringIO())
+        self.assertEqual(self.counters(), (3, 3, 0))
+        self.assertGreater(self.post.updated_at, updated_at)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['approved_count'], 3)
+
+
+    def test_bulk_and_detail_actions_keep_counters_exact(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user('moderator', password='secret', is_staff=True)
+        )
+        pending = list(Comment.objects.filter(post=self.post, approved=False).values_list('id', flat=True))
+        self.client.post('/api/comments/bulk_approve/', {'comment_ids': pending[:2]}, format='json')
+        self.assertEqual(self.counters(), (5, 1, 0))
+        response = self.client.post(f'/api/comments/{pending[2]}/approve/')
+        self.assertEqual(response.data['approved_count'], 6)
+        self.client.post('/api/comments/bulk_reject/', {'comment_ids': pending}, format='json')
+        self.assertEqual(self.counters(), (3, 3, 0))
+
+
+class CommentStatsTests(QueryBudgetTestCase):
+    def test_counts_come_from_one_query(self):
+        comment = Comment.objects.filter(post=self.post, approved=False).first()
+        Comment.objects.filter(pk=comment.pk).update(is_trash=True)
+        with self.assertNumQueries(1):
+            counts = comment_stats.compute()
+        self.assertEqual(counts, {'total': 6, 'all': 5, 'pending': 2, 'approved': 3, 'trash': 1})
+
+    def test_trashed_comments_are_counted_apart(self):
+        pending = Comment.objects.filter(post=self.post, approved=False).first()
+        approved = Comment.objects.filter(post=self.post, approved=True).first()
+        Comment.objects.filter(pk__in=[pending.pk, approved.pk]).update(is_trash=True)
+        cache.clear()
+        self.assertEqual(self.client.get('/api/comments/pending-count/').json(), {'count': 2})
+        counts = self.client.get('/api/comments/debug/').json()['counts']
+        self.assertEqual(
+            {key: counts[key] for key in ('total', 'approved', 'pending', 'trash')},
+            {'total': 6, 'approved': 2, 'pending': 2, 'trash': 2}
+        )
+
+    def test_endpoint_reflects_writes(self):
+        cache.clear()
+        self.assertEqual(self.client.get('/api/comments/counts/').json()['pending'], 3)
+        Comment.objects.create(post=self.post, content='New', author_name='Reader')
+        self.assertEqual(self.client.get('/api/comments/counts/').json()['pending'], 4)
+
+
+    def test_counts_are_read_with_one_cache_query(self):
+        self.client.get('/api/comments/counts/')
+        with self.assertNumQueries(1):
+            self.client.get('/api/comments/counts/')
+        comment_stats.invalidate()
+        # Cache read, the aggregate and the database cache's write
+        with self.assertNumQueries(7):
+            self.client.get('/api/comments/counts/')
+
+class PostCommentCountTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        approved = Comment.objects.filter(post=self.post, approved=True).first()
+        approved.is_trash = True
+        approved.save()
+
+    def test_check_approved_counts_the_trash_apart(self):
+        response = self.client.get('/api/comments/check-approved/', {'post': self.post.pk})
+        self.assertEqual(
+            json.loads(response.content)['counts'], {'total': 6, 'approved': 2, 'unapproved': 3, 'trash': 1}
+        )
+
+    def test_approved_count_leaves_out_the_trash(self):
+        comment = Comment.objects.filter(post=self.post, approved=False).first()
+        response = self.client.post(f'/api/comments/{comment.pk}/approve/')
+        self.assertEqual(json.loads(response.content)['approved_count'], 3)
+
+
+class CommentEndpointQueryTests(QueryBudgetTestCase):
+    def test_comment_list(self):
+        self.assertConstantQueries(1, 'get', '/api/comments/')
+
+    def test_comment_list_for_post(self):
+        self.assertConstantQueries(2, 'get', '/api/comments/', {'post': self.post.pk})
+
+    def test_approved_comment_list_for_post(self):
+        self.assertConstantQueries(2, 'get', '/api/comments/', {'post': self.post.pk, 'approved': 'true'})
+
+    def test_comment_list_without_post(self):
+        self.assertConstantQueries(
+            2, 'get', '/api/comments/', {'post': self.post.pk, 'fields': 'id,content', 'expand': ''}
+        )
+
+    def test_comments_all(self):
+        self.assertConstantQueries(4, 'get', '/api/comments/all/', {'post': self.post.pk})
+
+    def test_check_approved(self):
+        self.assertConstantQueries(3, 'get', '/api/comments/check-approved/', {'post': self.post.pk})
+
+    def test_check_approved_underscore_route(self):
+        self.assertConstantQueries(3, 'get', '/api/comments/check_approved/', {'post': self.post.pk})
+
+    def test_approved_for_post(self):
+        self.assertConstantQueries(3, 'get', '/api/comments/approved-for-post/', {'post': self.post.pk})
+
+    # Cold: the stats tag is created before the counts are stored
+    def test_direct_counts(self):
+        self.assertConstantQueries(1, 'get', '/api/comments/counts/', cache_budget=12)
+
+    def test_counts(self):
+        self.assertConstantQueries(1, 'get', '/api/comments/counts', cache_budget=12)
+
+    def test_pending_count(self):
+        self.assertConstantQueries(1, 'get', '/api/comments/pending-count/', cache_budget=12)
+
+
+class CommentPaginationTests(QueryBudgetTestCase):
+    def ids(self, results):
+        return [comment['id'] for comment in results]
+
+    def test_all_pages_each_stream_with_its_own_cursor(self):
+        self.grow()
+        params = {'post': self.post.pk, 'page_size': 10}
+        first = json.loads(self.client.get('/api/comments/all/', params).content)
+        approved = list(Comment.objects.filter(post=self.post, approved=True).order_by(
+            '-created_at', '-id'
+        ).values_list('id', flat=True))
+        self.assertEqual(self.ids(first['approved']), approved[:10])
+
+        second = json.loads(self.client.get(first['next']['approved']).content)
+        self.assertEqual(self.ids(second['approved']), approved[10:20])
+        # The pending stream stays on its first page
+        self.assertEqual(self.ids(second['pending']), self.ids(first['pending']))
+
+    def test_approved_for_post_leaves_out_trash(self):
+        trashed = Comment.objects.filter(post=self.post, approved=True).first()
+        Comment.objects.filter(pk=trashed.pk).update(is_trash=True)
+        response = self.client.get('/api/comments/approved_for_post/', {'post': self.post.pk})
+        ids = self.ids(json.loads(response.content)['results'])
+        self.assertEqual(len(ids), 2)
+        self.assertNotIn(trashed.pk, ids)
+
+    def test_page_is_an_index_scan(self):
+        queryset = Comment.objects.filter(post=self.post, approved=True, is_trash=False)
+        plan = queryset.order_by('-created_at', '-id')[:21].explain()
+        self.assertIn('INDEX', plan.upper())
+        self.assertNotIn('TEMP B-TREE', plan.upper())
+
+
+class CommentWriteQueryTests(QueryBudgetTestCase):
+    """Bulk moderation must not run per-comment queries"""
+
+    def setUp(self):
+        super().setUp()
+        self.staff = get_user_model().objects.create_user('moderator', password='secret', is_staff=True)
+        self.client.force_authenticate(self.staff)
+
+    def pending_ids(self):
+        return list(Comment.objects.filter(post=self.post, approved=False).values_list('id', flat=True))
+
+    def approved_ids(self):
+        return list(Comment.objects.filter(post=self.post, approved=True).values_list('id', flat=True))
+
+    def test_bulk_approve(self):
+        small = self.assertQueryBudget(
+            5, 'post', '/api/comments/bulk_approve/', {'comment_ids': self.pending_ids()}, cache_budget=5
+        )
+        self.grow()
+        large = self.assertQueryBudget(
+            5, 'post', '/api/comments/bulk_approve/', {'comment_ids': self.pending_ids()}, cache_budget=5
+        )
+        self.assertEqual(small, large)
+
+    def test_bulk_reject(self):
+        small = self.assertQueryBudget(
+            5, 'post', '/api/comments/bulk_reject/', {'comment_ids': self.approved_ids()}, cache_budget=5
+        )
+        self.grow()
+        large = self.assertQueryBudget(
+            5, 'post', '/api/comments/bulk_reject/', {'comment_ids': self.approved_ids()}, cache_budget=5
+        )
+        self.assertEqual(small, large)
+
+    def test_comment_actions(self):
+        comment = Comment.objects.filter(post=self.post, approved=False).first()
+        for action in ('approve', 'unapprove', 'trash', 'restore'):
+            self.assertQueryBudget(
+                5, 'post', f'/api/comments/{action}/', {'comment_id': comment.pk}, cache_budget=5
+            )
+        # The delete signal invalidates the comment stats a second time
+        self.assertQueryBudget(6, 'post', '/api/comments/delete/', {'comment_id': comment.pk}, cache_budget=10)
+
+    def test_staff_only(self):
+        pending = self.pending_ids()
+        reader = get_user_model().objects.create_user('reader', password='secret')
+        for user in (None, reader):
+            self.client.force_authenticate(user)
+            for url, data in (
+                ('/api/comments/bulk_approve/', {'comment_ids': pending}),
+                ('/api/comments/bulk_reject/', {'comment_ids': self.approved_ids()}),
+                ('/api/comments/approve/', {'comment_id': pending[0]}),
+                ('/api/comments/delete/', {'comment_id': pending[0]}),
+            ):
+                self.assertEqual(self.client.post(url, data, format='json').status_code, 403, url)
+        self.assertEqual(self.pending_ids(), pending)
+
+    def test_approve_and_reject(self):
+        comment = Comment.objects.filter(post=self.post, approved=False).first()
+        self.assertQueryBudget(6, 'post', f'/api/comments/{comment.pk}/approve/', cache_budget=5)
+        self.assertQueryBudget(6, 'post', f'/api/comments/{comment.pk}/reject/', cache_budget=5)
+
+
+class BatchModerationTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.staff = get_user_model().objects.create_user('moderator', password='secret', is_staff=True)
+        self.client.force_authenticate(self.staff)
+
+    def ids(self, **filters):
+        return list(Comment.objects.filter(post=self.post, **filters).order_by('id').values_list('id', flat=True))
+
+    def test_outcome_per_id(self):
+        pending, approved = self.ids(approved=False), self.ids(approved=True)
+        response = self.client.post('/api/comments/batch/', {'operations': [
+            {'action': 'approve', 'ids': [pending[0], approved[0], 999999]},
+            {'action': 'trash', 'ids': [pending[1]]},
+            {'action': 'delete', 'ids': [pending[2], 999999]},
+            {'action': 'reply', 'ids': [approved[1]], 'admin_reply': 'Thanks'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [(result['id'], result['outcome']) for result in response.data['results']],
+            [(pending[0], 'updated'), (approved[0], 'unchanged'), (999999, 'not_found'),
+             (pending[1], 'updated'), (pending[2], 'deleted'), (999999, 'not_found'),
+             (approved[1], 'updated')]
+        )
+        self.assertEqual(
+            response.data['summary'], {'updated': 3, 'deleted': 1, 'unchanged': 1, 'not_found': 2}
+        )
+        self.assertEqual(Comment.objects.get(pk=approved[1]).admin_reply, 'Thanks')
+
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.approved_count, self.post.pending_count, self.post.trash_count), (4, 0, 1)
+        )
+
+    def operations(self):
+        return {'operations': [
+            {'action': 'approve', 'ids': self.ids(approved=False)},
+            {'action': 'trash', 'ids': self.ids()},
+        ]}
+
+    def test_constant_queries(self):
+        small = self.assertQueryBudget(7, 'post', '/api/comments/batch/', self.operations(), cache_budget=5)
+        self.grow()
+        Comment.objects.update(approved=False, is_trash=False)
+        large = self.assertQueryBudget(7, 'post', '/api/comments/batch/', self.operations(), cache_budget=5)
+        self.assertEqual(small, large)
+
+    def test_staff_only(self):
+        pending = self.ids(approved=False)
+        self.client.force_authenticate(None)
+        response = self.client.post('/api/comments/batch/', {'action': 'approve', 'ids': pending}, format='json')
+        self.assertEqual(response.status_code, 403)
+        reader = get_user_model().objects.create_user('reader', password='secret')
+        self.client.force_authenticate(reader)
+        response = self.client.post('/api/comments/batch/', {'action': 'approve', 'ids': pending}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.ids(approved=False), pending)
+
+    def test_approve_restores_from_trash(self):
+        [approved, *_] = self.ids(approved=True)
+        Comment.objects.filter(pk=approved).update(is_trash=True)
+        response = self.client.post('/api/comments/batch/', {'action': 'approve', 'ids': [approved]}, format='json')
+        self.assertEqual(response.data['results'][0]['outcome'], 'updated')
+        self.assertFalse(Comment.objects.get(pk=approved).is_trash)
+
+    def test_invalid_batches(self):
+        for data in ({}, {'operations': []}, {'action': 'publish', 'ids': [1]},
+                     {'action': 'approve', 'ids': ['one']}, {'action': 'reply', 'ids': [1]}):
+            response = self.client.post('/api/comments/batch/', data, format='json')
+            self.assertEqual(response.status_code, 400, data)
+        with self.assertRaises(ModerationError):
+            parse_operations({'action': 'approve', 'ids': [1, 2, 3]}, max_ids=2)
+        self.assertEqual(parse_operations([{'action': 'approve', 'ids': [2, 1, 2]}]), [('approve', [2, 1], None)])
+
+
+class NPlusOneDetectorTests(QueryBudgetTestCase):
+    def test_fingerprint_ignores_parameters(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM "blog_comment" WHERE "id" IN (%s, %s) LIMIT 21'),
+            fingerprint("SELECT * FROM  \"blog_comment\" WHERE \"id\" IN (%s) LIMIT 5"),
+        )
+        self.assertNotEqual(
+            fingerprint('SELECT * FROM "blog_comment" WHERE "id" = %s'),
+            fingerprint('SELECT * FROM "blog_blogpost" WHERE "id" = %s'),
+        )
+
+    def test_repeated_queries_are_flagged(self):
+        detector = QueryDetector(threshold=3)
+        with connection.execute_wrapper(detector):
+            titles = [comment.post.title for comment in Comment.objects.all()]
+        self.assertEqual(len(titles), 6)
+        [(shape, count, sql, location)] = detector.findings()
+        self.assertEqual(count, 6)
+        self.assertIn('blog_blogpost', shape)
+        self.assertTrue(location.startswith('blog/tests.py:'), location)
+
+    @override_settings(NPLUSONE_DETECTOR=True, NPLUSONE_THRESHOLD=3)
+    def test_middleware_reports_only_repeated_shapes(self):
+        cache.clear()
+        self.client.get('/api/comments/', {'post': self.post.pk})
+        self.assertEqual(query_report.entries(), {})
+
+        self.client.get('/api/comments/check-approved/', {'post': self.post.pk})
+        self.assertEqual(query_report.entries(), {})
+
+    @override_settings(NPLUSONE_DETECTOR=True, NPLUSONE_THRESHOLD=1)
+    def test_report_is_shared_with_the_command(self):
+        cache.clear()
+        with self.assertLogs('blog.nplusone', 'WARNING'):
+            self.client.get('/api/comments/check-approved/', {'post': self.post.pk})
+        entries = query_report.entries().values()
+        self.assertTrue(entries)
+        self.assertEqual({entry['view'] for entry in entries}, {'GET comments-check-approved'})
+        self.assertFalse([entry for entry in entries if is_cache_query(entry['sql'])])
+
+        output = StringIO()
+        call_command('nplusone_report', '--clear', stdout=output)
+        self.assertIn('GET comments-check-approved: up to 1 queries per request', output.getvalue())
+        self.assertEqual(query_report.entries(), {})
+
+
+class ValuesSerializerTests(QueryBudgetTestCase):
+    """List pages rendered from values() rows match the model serializers byte for byte"""
+
+    def assertSameJSON(self, url, data=None):
+        cache.clear()
+        with override_settings(API_VALUES_SERIALIZERS=False):
+            expected = self.client.get(url, data)
+        cache.clear()
+        actual = self.client.get(url, data)
+        self.assertEqual(actual.status_code, 200)
+        self.assertEqual(actual.content, expected.content)
+
+    def test_post_list(self):
+        BlogPost.objects.filter(pk=self.post.pk).update(
+            featured_image='blog_images/featured.webp',
+            featured_image_variants={'variants': [
+                {'name': 'blog_images/variants/featured-320.webp', 'width': 320, 'format': 'webp'},
+            ]},
+        )
+        self.assertSameJSON('/api/posts/')
+        self.assertSameJSON('/api/posts/', {'fields': 'id,title,featured_image,created_at'})
+
+    def test_comment_list(self):
+        self.assertSameJSON('/api/comments/', {'post': self.post.pk})
+        self.assertSameJSON('/api/comments/', {'fields': 'id,post,content', 'expand': ''})
+        self.assertSameJSON('/api/comments/', {'fields': 'id,post_title', 'expand': 'post'})
+
+    def test_rows_are_served_from_the_fragment_cache(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        expected = self.client.get('/api/comments/', {'post': self.post.pk})
+        cache.clear()
+        with mock.patch.object(ValuesSerializer, 'to_representation', side_effect=AssertionError):
+            actual = self.client.get('/api/comments/', {'post': self.post.pk})
+        self.assertEqual(actual.content, expected.content)
+
+
+class QueryPlanTests(QueryBudgetTestCase):
+    def plan(self, serializer_class, fieldset=None):
+        return plan_serializer(serializer_class(context={'fieldset': fieldset}))
+
+    def test_post_list_skips_body_and_images(self):
+        plan = self.plan(BlogPostListSerializer)
+        self.assertNotIn('content', plan.columns)
+        self.assertNotIn('search_vector', plan.columns)
+        self.assertIn('featured_image_variants', plan.columns)
+        self.assertEqual(plan.prefetch, {})
+
+    def test_post_detail_prefetches_rendered_relations(self):
+        self.assertEqual(set(self.plan(BlogPostSerializer).prefetch), {'images', 'approved_comments'})
+        plan = self.plan(BlogPostSerializer, Fieldset(expand=frozenset({'images'})))
+        self.assertEqual(set(plan.prefetch), {'images'})
+
+    def test_comment_joins_post_only_when_rendered(self):
+        plan = self.plan(CommentSerializer)
+        self.assertEqual(plan.select, {'post'})
+        self.assertIn('post__title', plan.columns)
+        self.assertNotIn('post__content', plan.columns)
+
+        plan = self.plan(CommentSerializer, Fieldset(frozenset({'id', 'post', 'content'}), frozenset()))
+        self.assertEqual(plan.select, set())
+        self.assertEqual(plan.columns, {'id', 'post', 'content', 'created_at', 'updated_at'})
+
+    def test_planned_comments_render_without_extra_queries(self):
+        plan = self.plan(CommentSerializer)
+        comments = list(plan.apply(Comment.objects.all()))
+        with self.assertNumQueries(0):
+            CommentSerializer(comments, many=True, context={'fieldset': None}).data
+
+    def test_check_approved_samples_follow_the_fieldset(self):
+        queries, _ = self.count_queries(
+            'get', '/api/comments/check-approved/', {'post': self.post.pk, 'fields': 'id,approved', 'expand': ''}
+        )
+        for query in queries:
+            self.assertNotIn('"blog_comment"."content"', query['sql'])
+            self.assertNotIn('"blog_blogpost"."content"', query['sql'])
+        response = self.client.get(
+            '/api/comments/check-approved/', {'post': self.post.pk, 'fields': 'id,approved', 'expand': ''}
+        )
+        samples = json.loads(response.content)['approved_samples']
+        self.assertEqual(set(samples[0]), {'id', 'approved'})
+
+    def test_moderation_response_loads_only_what_it_renders(self):
+        comment = Comment.objects.filter(post=self.post, approved=False).first()
+        queries, _ = self.count_queries('post', f'/api/comments/{comment.pk}/approve/')
+        reload = queries[-1]['sql']
+        self.assertIn('"blog_blogpost"."approved_count"', reload)
+        self.assertNotIn('"blog_blogpost"."content"', reload)
+
+
+class CommentDiagnosticsTests(QueryBudgetTestCase):
+    def test_ignored_without_staff_user(self):
+        response = self.client.get(
+            '/api/comments/', {'post': self.post.pk, 'approved': 'true'}, HTTP_X_DIAGNOSTICS='1'
+        )
+        self.assertNotIn('X-Diagnostics', response)
+
+    def test_staff_user_gets_findings(self):
+        staff = get_user_model().objects.create_user('editor', password='secret', is_staff=True)
+        self.client.force_authenticate(staff)
+        Comment.objects.filter(post=self.post).update(approved=False)
+        response = self.client.get(
+            '/api/comments/', {'post': self.post.pk, 'approved': 'true'}, HTTP_X_DIAGNOSTICS='1'
+        )
+        findings = json.loads(response['X-Diagnostics'])
+        self.assertEqual(findings['count'], 0)
+        self.assertEqual(findings['post_comments']['total'], 6)
+        self.assertIn('no-store', response['Cache-Control'])
+
+
+def jpeg_upload(name, color, size=(400, 300)):
+    output = BytesIO()
+    Image.new('RGB', size, color).save(output, format='JPEG')
+    return SimpleUploadedFile(name, output.getvalue(), content_type='image/jpeg')
+
+
+class ImageProcessingTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, IMAGE_PROCESSING_ASYNC=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.post = BlogPost.objects.create(title='Images', content='<p>Images</p>', published=True)
+
+    def test_optimize_stored_leaves_the_database_alone(self):
+        storage = media_storage()
+        name = storage.save('blog_images/photo.jpg', jpeg_upload('photo.jpg', 'red'))
+        with self.assertNumQueries(0):
+            result = optimize_stored(storage, name)
+        self.assertTrue(storage.exists(result['name']))
+        self.assertEqual(result['blob']['size'], storage.size(result['name']))
+        self.assertFalse(MediaBlob.objects.filter(name=result['name']).exists())
+
+    def test_replacing_or_deleting_an_image_changes_the_post_etag(self):
+        [image] = attach_images(self.post, [jpeg_upload('a.jpg', 'red')])
+        url = f'/api/posts/{self.post.pk}/'
+        etag = self.client.get(url)['ETag']
+
+        self.client.patch(f'/api/images/{image.pk}/', {'image': jpeg_upload('b.jpg', 'blue')}, format='multipart')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(BlogImage.objects.get(pk=image.pk).image.name, response.content.decode())
+
+        etag = response['ETag']
+        self.client.delete(f'/api/images/{image.pk}/')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_inline_attach_registers_optimized_blobs(self):
+        images = attach_images(self.post, [jpeg_upload('a.jpg', 'red'), jpeg_upload('b.jpg', 'blue')])
+        for image in images:
+            self.assertTrue(image.image.name.endswith('.webp'))
+            blob = MediaBlob.objects.get(name=image.image.name)
+            self.assertEqual(blob.refcount, 1)
+            self.assertIsNotNone(blob.source_sha256)
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=True)
+    def test_worker_swaps_in_the_optimized_featured_image(self):
+        post = BlogPost.objects.create(
+            title='Featured', content='<p>Featured</p>', featured_image=jpeg_upload('cover.jpg', 'green')
+        )
+        self.assertEqual(post.featured_image_state, IMAGE_PROCESSING)
+        self.assertTrue(post.featured_image.name.endswith('.jpg'))
+
+        [job] = claim_jobs()
+        self.assertEqual(run_job(job), ImageJob.DONE)
+        post.refresh_from_db()
+        self.assertEqual(post.featured_image_state, IMAGE_READY)
+        self.assertTrue(post.featured_image.name.endswith('.webp'))
+        self.assertTrue(post.featured_image_variants['variants'])
+        self.assertEqual(claim_jobs(), [])
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=True)
+    def test_failed_job_changes_the_post_etag(self):
+        [image] = attach_images(self.post, [jpeg_upload('a.jpg', 'red')])
+        url = f'/api/posts/{self.post.pk}/'
+        etag = self.client.get(url)['ETag']
+        updated_at = BlogPost.objects.get(pk=self.post.pk).updated_at
+
+        [job] = claim_jobs()
+        self.assertEqual(complete_job(job, ValueError('corrupt'), max_attempts=1), ImageJob.FAILED)
+        image.refresh_from_db()
+        self.assertEqual(image.image_state, IMAGE_FAILED)
+        self.assertGreater(BlogPost.objects.get(pk=self.post.pk).updated_at, updated_at)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['images'][0]['image_state'], IMAGE_FAILED)
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=True)
+    def test_job_for_a_replaced_upload_is_superseded(self):
+        post = BlogPost.objects.create(
+            title='Featured', content='<p>Featured</p>', featured_image=jpeg_upload('cover.jpg', 'green')
+        )
+        [job] = claim_jobs()
+        BlogPost.objects.filter(pk=post.pk).update(featured_image='blog_images/other.webp')
+        self.assertEqual(run_job(job), ImageJob.DONE)
+        self.assertEqual(job.last_error, 'Superseded')
+        post.refresh_from_db()
+        self.assertEqual(post.featured_image.name, 'blog_images/other.webp')
+
+    def test_variants_narrower_than_the_original(self):
+        storage = media_storage()
+        name = storage.save('blog_images/wide.jpg', jpeg_upload('wide.jpg', 'red', size=(1200, 800)))
+        data = build_variants(storage, name, formats=['webp'])
+        self.assertEqual((data['width'], data['height']), (1200, 800))
+        self.assertEqual(
+            [(variant['width'], variant['height']) for variant in data['variants']],
+            [(1024, 683), (640, 427), (320, 213)]
+        )
+        for variant in data['variants']:
+            with Image.open(storage.path(variant['name'])) as img:
+                self.assertEqual((img.format, img.width), ('WEBP', variant['width']))
+
+        [source] = srcset(data, lambda name: f'/media/{name}')
+        self.assertEqual(source['type'], 'image/webp')
+        self.assertEqual(source['srcset'].split(', ')[0], f"/media/{data['variants'][-1]['name']} 320w")
+
+    def test_generated_variants_reach_the_cached_post_responses(self):
+        post = BlogPost.objects.create(
+            title='Featured', content='<p>Featured</p>', featured_image=jpeg_upload('cover.jpg', 'green')
+        )
+        # A post stored before variants existed
+        BlogPost.objects.filter(pk=post.pk).update(featured_image_variants={})
+        etags = {}
+        for url in ('/api/posts/', f'/api/posts/{post.pk}/'):
+            response = self.client.get(url)
+            self.assertNotIn('320w', response.content.decode())
+            etags[url] = response['ETag']
+
+        call_command('generate_image_variants', stdout=StringIO())
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('320w', response.content.decode())
+
+    def test_image_endpoint_exposes_srcset(self):
+        [image] = attach_images(self.post, [jpeg_upload('wide.jpg', 'red', size=(800, 600))])
+        response = self.client.get(f'/api/images/{image.pk}/')
+        sources = response.data['image_srcset']
+        self.assertTrue(sources)
+        self.assertIn('320w', sources[-1]['srcset'])
+        self.assertNotIn('1024w', sources[-1]['srcset'])
+
+    def test_batch_is_encoded_in_order_with_failures_in_place(self):
+        storage = media_storage()
+        names = [
+            storage.save('blog_images/a.jpg', jpeg_upload('a.jpg', 'red')),
+            storage.save('blog_images/broken.jpg', SimpleUploadedFile('broken.jpg', b'not an image')),
+            storage.save('blog_images/b.jpg', jpeg_upload('b.jpg', 'blue', size=(300, 400))),
+        ]
+        first, broken, last = optimize_many(storage, names)
+        self.assertIsInstance(broken, Exception)
+        self.assertTrue(storage.exists(first['name']))
+        with Image.open(storage.path(last['name'])) as img:
+            self.assertEqual(img.size, (300, 400))
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=True)
+    def test_uploads_are_inserted_in_one_statement(self):
+        files = [jpeg_upload(f'{index}.jpg', 'red') for index in range(3)]
+        with CaptureQueriesContext(connection) as queries:
+            images = attach_images(self.post, files)
+        inserts = [
+            query for query in queries.captured_queries if query['sql'].startswith('INSERT INTO "blog_blogimage"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(ImageJob.objects.filter(object_id__in=[image.pk for image in images]).count(), 3)
+
+    @override_settings(IMAGE_MAX_PIXELS=100_000)
+    def test_uploads_are_checked_from_the_header(self):
+        big = jpeg_upload('big.jpg', 'red', size=(400, 300))
+        small = jpeg_upload('small.jpg', 'red', size=(300, 300))
+        bitmap = BytesIO()
+        Image.new('RGB', (10, 10)).save(bitmap, format='BMP')
+        cases = {
+            'big.jpg': (big, 'image_too_large'),
+            'small.bmp': (SimpleUploadedFile('small.bmp', bitmap.getvalue()), 'invalid_image_format'),
+            'text.jpg': (SimpleUploadedFile('text.jpg', b'not an image'), 'invalid_image'),
+        }
+        for name, (upload, code) in cases.items():
+            with self.assertRaises(ValidationError, msg=name) as raised:
+                inspect_image(upload)
+            self.assertEqual(raised.exception.code, code)
+            self.assertEqual(upload.tell(), 0)
+        self.assertEqual(inspect_image(small), ('JPEG', 300, 300))
+
+        response = self.client.post(
+            f'/api/posts/{self.post.pk}/upload_images/',
+            {'images': [jpeg_upload('ok.jpg', 'red', size=(100, 100)), jpeg_upload('big.jpg', 'red')]},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.data['images']), ['big.jpg'])
+        self.assertFalse(BlogImage.objects.exists())
+
+    @override_settings(IMAGE_MAX_DIMENSION=256)
+    def test_decode_fits_within_the_maximum_dimension(self):
+        img = decode_image(jpeg_upload('wide.jpg', 'red', size=(2000, 1000)), settings.IMAGE_MAX_DIMENSION)
+        self.assertEqual(img.size, (256, 128))
+
+    def test_identical_uploads_share_one_blob(self):
+        storage = media_storage()
+        first = storage.save('blog_images/one.jpg', jpeg_upload('one.jpg', 'red'))
+        second = storage.save('featured_images/two.JPG', jpeg_upload('two.JPG', 'red'))
+        self.assertEqual(first, second)
+        self.assertRegex(first, r'^blobs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+
+        [image] = attach_images(self.post, [jpeg_upload('a.jpg', 'green')])
+        with mock.patch('blog.image_jobs.optimize_many') as optimize:
+            [again] = attach_images(self.post, [jpeg_upload('b.jpg', 'green')])
+        optimize.assert_called_once_with(storage, [])
+        self.assertEqual(again.image.name, image.image.name)
+        self.assertEqual(MediaBlob.objects.get(name=image.image.name).refcount, 2)
+
+    def test_unreferenced_blobs_are_collected(self):
+        [image, other] = attach_images(self.post, [jpeg_upload('a.jpg', 'green'), jpeg_upload('b.jpg', 'blue')])
+        storage = media_storage()
+        image.delete()
+        call_command('collect_media', '--grace-hours', '0', stdout=StringIO())
+        self.assertFalse(storage.exists(image.image.name))
+        self.assertFalse(MediaBlob.objects.filter(name=image.image.name).exists())
+        self.assertTrue(storage.exists(other.image.name))
+
+
+class MediaServingTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.blob = media_storage().save('notes.txt', SimpleUploadedFile('notes.txt', b'0123456789'))
+
+    def get(self, path, **headers):
+        return self.client.get(f'/media/{path}', **headers)
+
+    def test_ranges(self):
+        response = self.get(self.blob, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+        response = self.get(self.blob, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        self.assertEqual(self.get(self.blob, HTTP_RANGE='bytes=10-').status_code, 416)
+        # A stale If-Range gets the whole file
+        response = self.get(self.blob, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_blobs_are_immutable_and_revalidate(self):
+        response = self.get(self.blob)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.get(self.blob, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.get('../settings.py').status_code, 404)
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect')
+    def test_offload_to_the_front_proxy(self):
+        response = self.get(self.blob)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.blob}')
+        self.assertEqual(response.content, b'')
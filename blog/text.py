@@ -0,0 +1,52 @@
+import html
+import math
+import re
+
+from django.conf import settings
+
+# Elements whose text is never shown
+INVISIBLE_RE = re.compile(r'<(script|style|template|noscript)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+# Tags that separate words (block elements, line breaks, cells, list items)
+BREAK_TAG_RE = re.compile(
+    r'</?(?:p|div|br|hr|h[1-6]|li|ul|ol|dl|dt|dd|tr|td|th|table|blockquote|pre|'
+    r'figure|figcaption|section|article|header|footer|aside|nav)\b[^>]*>',
+    re.IGNORECASE
+)
+TAG_RE = re.compile(r'<[^>]*>')
+WHITESPACE_RE = re.compile(r'\s+')
+WORD_RE = re.compile(r'\w+(?:[\'’-]\w+)*')
+
+
+def html_to_text(value):
+    """
+    Visible text of an HTML fragment, with whitespace collapsed.
+
+    A few regular expression passes instead of an HTML parser: CKEditor
+    output is well formed, and this is cheap enough to run on every save.
+    """
+    if not value:
+        return ''
+    text = COMMENT_RE.sub(' ', value)
+    text = INVISIBLE_RE.sub(' ', text)
+    text = BREAK_TAG_RE.sub(' ', text)
+    text = TAG_RE.sub('', text)
+    text = html.unescape(text)
+    return WHITESPACE_RE.sub(' ', text).strip()
+
+
+def excerpt_of(text, length):
+    """The start of text, cut at a word boundary and marked with an ellipsis"""
+    if len(text) <= length:
+        return text
+    cut = text[:length + 1].rsplit(' ', 1)[0] if ' ' in text[:length + 1] else text[:length]
+    return cut.rstrip(' ,;:.-–—') + '…'
+
+
+def summarize(value):
+    """(excerpt, word count, reading time in minutes) of an HTML fragment"""
+    text = html_to_text(value)
+    words = len(WORD_RE.findall(text))
+    excerpt = excerpt_of(text, getattr(settings, 'POST_EXCERPT_LENGTH', 300))
+    reading_time = math.ceil(words / getattr(settings, 'READING_WORDS_PER_MINUTE', 200)) if words else 0
+    return excerpt, words, reading_time
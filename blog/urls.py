@@ -7,11 +7,9 @@ router.register(r'posts', views.BlogPostViewSet)
 router.register(r'images', views.BlogImageViewSet)
 router.register(r'comments', views.CommentViewSet)
 
-# These explicit paths override the default router paths for special actions
+# These explicit paths override the default router paths for special actions,
+# so they come before the router's comments/<pk>/ detail route
 urlpatterns = [
-    # Include router-generated URLs
-    path('', include(router.urls)),
-    
     # Test endpoints for API routing
     path('test/', views.test_api, name='api-test'),
     
@@ -25,9 +23,13 @@ urlpatterns = [
     # Also provide underscore versions for better API compatibility
     path('comments/pending_count/', views.CommentViewSet.as_view({'get': 'pending_count'}), name='comment-pending-count-alt'),
     
-    # Bulk operations
-    path('comments/bulk_approve/', views.CommentViewSet.as_view({'post': 'bulk_approve'}), name='comments-bulk-approve'),
-    path('comments/bulk_reject/', views.CommentViewSet.as_view({'post': 'bulk_reject'}), name='comments-bulk-reject'),
+    # Bulk operations, with their action's permission_classes (only the router applies those)
+    path('comments/bulk_approve/',
+         views.CommentViewSet.as_view({'post': 'bulk_approve'}, **views.CommentViewSet.bulk_approve.kwargs),
+         name='comments-bulk-approve'),
+    path('comments/bulk_reject/',
+         views.CommentViewSet.as_view({'post': 'bulk_reject'}, **views.CommentViewSet.bulk_reject.kwargs),
+         name='comments-bulk-reject'),
     
     # Comment admin action endpoints
     path('comments/approve/', views.comment_action, {'action': 'approve'}, name='comment-approve'),
@@ -36,6 +38,9 @@ urlpatterns = [
     path('comments/restore/', views.comment_action, {'action': 'restore'}, name='comment-restore'),
     path('comments/delete/', views.comment_action, {'action': 'delete'}, name='comment-delete'),
     
+    # Response cache hit/miss counters
+    path('cache/stats/', views.cache_stats, name='cache-stats'),
+    
     # Debug URL for troubleshooting
     path('debug/urls/', views.list_urls, name='debug-list-urls'),
     
@@ -44,4 +49,7 @@ urlpatterns = [
     
     # Add a direct pattern matcher to ensure the full path works
     re_path(r'^comments/counts/?$', views.comment_counts, name='comment-counts-regex'),
+    
+    # Include router-generated URLs
+    path('', include(router.urls)),
 ] 
\ No newline at end of file
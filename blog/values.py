@@ -0,0 +1,193 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .fragments import FragmentCachedSerializerMixin, fragment_cache, fragments_enabled
+from .serializers import BlogPostListSerializer, CommentSerializer
+
+# Fields whose representation of a database value is the value itself
+PLAIN_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField)
+
+
+def _plain(value):
+    return value
+
+
+class ValuesSerializer:
+    """
+    Read-only twin of a ModelSerializer that renders rows of .values().
+
+    The model serializer (trimmed to the request's fieldset as usual) is
+    inspected once to plan which column feeds each field and how the value
+    is converted; rendering a row is then a loop over that plan, without a
+    model instance or per-field attribute lookups. The output is identical
+    to serializer_class's.
+
+    Fields that are not read straight from a column of the model are
+    rendered by a represent_<name>(row) method; represent_columns(name)
+    lists the columns it reads.
+
+    Rows of a fragment cached serializer are served from fragment_cache
+    under the keys the model serializer uses, so both paths share entries;
+    stamp_columns() are the columns of its fragment_stamps().
+    """
+    serializer_class = None
+    # Pagination keys
+    key_columns = ('id', 'created_at')
+
+    def __init__(self, context):
+        self.serializer = self.serializer_class(context=context)
+        self.plan = [self.plan_field(name, field) for name, field in self.serializer.fields.items()
+                     if not field.write_only]
+
+    def plan_field(self, name, field):
+        """
+        (name, source, converter) rendering field. source is the column passed
+        to converter, or a tuple of columns when converter takes the whole row.
+        """
+        represent = getattr(self, f'represent_{name}', None)
+        if represent is not None:
+            return name, self.represent_columns(name), represent
+        model = self.serializer.Meta.model
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise TypeError(f'{type(self).__name__} needs represent_{name}() for {name}')
+
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return name, model_field.attname, _plain
+        if isinstance(field, serializers.FileField):
+            return name, model_field.attname, self.file_converter(field, model_field)
+        if isinstance(field, PLAIN_FIELDS):
+            return name, model_field.attname, _plain
+        return name, model_field.attname, field.to_representation
+
+    def represent_columns(self, name):
+        """Columns read by represent_<name>()"""
+        return ()
+
+    def file_converter(self, field, model_field):
+        """Turn a stored file name into what FileField/ImageField render"""
+        storage = model_field.storage
+        request = self.serializer.context.get('request')
+        if not getattr(field, 'use_url', True):
+            return lambda name: name or None
+
+        def convert(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return convert
+
+    def stamp_columns(self):
+        """Columns holding the fragment_stamps() of the model serializer, in order"""
+        return ('updated_at',)
+
+    def fragment_cached(self):
+        return (
+            isinstance(self.serializer, FragmentCachedSerializerMixin)
+            and fragments_enabled(self.serializer.context)
+        )
+
+    def columns(self):
+        columns = list(self.key_columns)
+        if self.fragment_cached():
+            columns.extend(self.stamp_columns())
+        for _, source, _ in self.plan:
+            if isinstance(source, tuple):
+                columns.extend(source)
+            else:
+                columns.append(source)
+        return list(dict.fromkeys(columns))
+
+    def queryset(self, queryset):
+        """queryset as rows of the columns this serializer reads"""
+        return queryset.prefetch_related(None).values(*self.columns())
+
+    def to_representation(self, row):
+        representation = {}
+        for name, source, convert in self.plan:
+            if isinstance(source, tuple):
+                representation[name] = convert(row)
+            else:
+                value = row[source]
+                # As Serializer.to_representation: None is never converted
+                representation[name] = None if value is None else convert(value)
+        return representation
+
+    def render(self, rows):
+        if not self.fragment_cached():
+            return [self.to_representation(row) for row in rows]
+        rows = list(rows)
+        label = self.serializer.Meta.model._meta.label_lower
+        origin = self.serializer.context['request'].build_absolute_uri('/')
+        keys = [
+            fragment_cache.object_key(
+                self.serializer, label, row['id'], [row[column] for column in self.stamp_columns()], origin
+            )
+            for row in rows
+        ]
+        return fragment_cache.render_keyed(keys, rows, self.to_representation)
+
+
+class BlogPostListValuesSerializer(ValuesSerializer):
+    serializer_class = BlogPostListSerializer
+
+
+class CommentValuesSerializer(ValuesSerializer):
+    serializer_class = CommentSerializer
+
+    def represent_columns(self, name):
+        if name == 'post' and self.serializer.expands('post'):
+            return ('post_id', 'post__title', 'post__slug')
+        if name == 'post_title':
+            return ('post_id', 'post__title')
+        return ('post_id',)
+
+    def stamp_columns(self):
+        if not self.serializer.reads_post():
+            return ('updated_at',)
+        return ('updated_at', 'post__updated_at')
+
+    def represent_post(self, row):
+        if row['post_id'] is None:
+            return None
+        if not self.serializer.expands('post'):
+            return row['post_id']
+        return {'id': row['post_id'], 'title': row['post__title'], 'slug': row['post__slug']}
+
+    def represent_post_title(self, row):
+        return row['post__title'] if row['post_id'] is not None else None
+
+
+class ValuesListViewMixin:
+    """
+    ViewSet whose list action renders values() rows with
+    values_serializer_class instead of model instances.
+
+    Only used while the list serializer is values_serializer_class's model
+    serializer and API_VALUES_SERIALIZERS is on; otherwise list() is
+    the regular one.
+    """
+    values_serializer_class = None
+
+    def use_values_serializer(self):
+        return (
+            getattr(settings, 'API_VALUES_SERIALIZERS', True)
+            and self.values_serializer_class is not None
+            and self.get_serializer_class() is self.values_serializer_class.serializer_class
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_values_serializer():
+            return super().list(request, *args, **kwargs)
+
+        serializer = self.values_serializer_class(self.get_serializer_context())
+        queryset = serializer.queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.render(page))
+        return Response(serializer.render(queryset))
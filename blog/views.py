@@ -1,16 +1,43 @@
 from django.shortcuts import render
 from rest_framework import viewsets, status, generics
 from rest_framework.response import Response
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAdminUser
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from django.shortcuts import get_object_or_404
-from django.db.models import Prefetch
+from django.core.exceptions import ValidationError as DjangoValidationError
 import logging
 from django.http import JsonResponse
 from django.urls import get_resolver
 from django.urls.resolvers import URLPattern, URLResolver
 
-from .models import BlogPost, BlogImage, Comment
+from .models import COMMENT_COUNTER_FIELDS, BlogPost, BlogImage, Comment
+from .cache import response_bodies, response_cache, POST_LIST_TAG
+from .stats import comment_stats
+from .pagination import KeysetPagination
+from .fieldsets import SparseFieldsetViewMixin
+from .diagnostics import DiagnosticsViewMixin
+from .moderation import (
+    NOT_FOUND,
+    UPDATED,
+    ModerationError,
+    moderate_comments,
+    parse_operations,
+    summarize_results
+)
+from .values import BlogPostListValuesSerializer, CommentValuesSerializer, ValuesListViewMixin
+from .search import search_posts
+from .autocomplete import autocomplete_titles
+from .slugs import resolve_slug
+from .image_jobs import attach_images
+from .images import inspect_image
+from .conditional import (
+    conditional_response,
+    post_detail_validators,
+    post_list_validators,
+    comment_list_validators
+)
 from .serializers import (
     BlogPostSerializer, 
     BlogPostListSerializer, 
@@ -21,16 +48,23 @@ from .serializers import (
 # Setup logger
 logger = logging.getLogger(__name__)
 
-class BlogPostViewSet(viewsets.ModelViewSet):
+class BlogPostViewSet(SparseFieldsetViewMixin, ValuesListViewMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing blog posts.
     
+    GET requests accept `fields` (comma-separated fields to return) and
+    `expand` (relations to embed: `images`, `comments`).
+    
     list:
-    Return a list of all blog posts.
+    Return a page of blog posts, newest first. Use the `next`/`previous`
+    links to page through the results and `page_size` (max 100) to size them.
     
     retrieve:
     Return a specific blog post by ID.
     
+    by_slug:
+    Return a specific blog post by its current or a former slug.
+    
     create:
     Create a new blog post.
     
@@ -45,6 +79,9 @@ class BlogPostViewSet(viewsets.ModelViewSet):
     """
     queryset = BlogPost.objects.all()
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+    pagination_class = KeysetPagination
+    # Pages are rendered from values() rows
+    values_serializer_class = BlogPostListValuesSerializer
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -62,23 +99,83 @@ class BlogPostViewSet(viewsets.ModelViewSet):
                 elif published.lower() == 'false':
                     queryset = queryset.filter(published=False)
         
-        # Optimize with prefetch_related
-        if self.action == 'retrieve':
-            # For single post view, prefetch related images and approved comments
-            queryset = queryset.prefetch_related(
-                'images',
-                Prefetch(
-                    'comments',
-                    queryset=Comment.objects.filter(approved=True),
-                    to_attr='approved_comments'
-                )
-            )
-        elif self.action == 'list':
-            # For list view, just prefetch images
-            queryset = queryset.prefetch_related('images')
+        if self.action in ('list', 'retrieve', 'by_slug'):
+            # Load only the columns, images and comments the serializer renders
+            queryset = self.plan_queryset(queryset)
             
         return queryset
 
+    def _cached_response(self, request, tags, handler, *args, **kwargs):
+        """Serve a GET response from the tagged response cache"""
+        key = f"{request.method}:{request.build_absolute_uri()}"
+        # Tokens are read before rendering so concurrent writes are not lost
+        data, tokens = response_cache.lookup(key, tags)
+        if data is not None:
+            response = Response(data, status=status.HTTP_200_OK)
+            response['X-Cache'] = 'HIT'
+            return response
+        
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response_cache.set(key, response.data, tokens)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def _versioned_response(self, request, version, handler, *args, **kwargs):
+        """
+        Serve a GET response cached under the ETag it is served with.
+
+        The ETag changes with everything the body renders, including changes
+        no signal reports (a worker, a management command, an update in the
+        database), so the key alone is enough: no tags are checked and the
+        body is kept in the process-local response_bodies.
+        """
+        key = f"{request.method}:{request.build_absolute_uri()}"
+        data = response_bodies.get(key, version)
+        if data is not None:
+            response = Response(data, status=status.HTTP_200_OK)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response_bodies.set(key, version, response.data)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        window, _ = self.paginator.page_window(self.get_queryset(), request)
+        validators = post_list_validators(window)
+        return conditional_response(
+            request, validators,
+            self._versioned_response, validators[0], super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        validators = post_detail_validators(pk) if str(pk).isdigit() else None
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+        return conditional_response(
+            request, validators,
+            self._versioned_response, validators[0], super().retrieve, *args, **kwargs
+        )
+
+    @action(detail=False, methods=['get'], url_path=r'by-slug/(?P<slug>[-\w]+)')
+    def by_slug(self, request, slug=None):
+        """Retrieve a post by slug; former slugs resolve to the same post"""
+        pk = resolve_slug(slug)
+        if pk is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        self.kwargs[self.lookup_url_kwarg or self.lookup_field] = str(pk)
+        validators = post_detail_validators(pk)
+        if validators is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return conditional_response(
+            request, validators,
+            self._versioned_response, validators[0], super().retrieve
+        )
+
     def create(self, request, *args, **kwargs):
         """Create a new blog post, handling both JSON and multipart requests"""
         logger.info(f"Creating blog post with content type: {request.content_type}")
@@ -130,12 +227,68 @@ class BlogPostViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        created_images = []
-        for image in images:
-            blog_image = BlogImage.objects.create(post=post, image=image)
-            created_images.append(BlogImageSerializer(blog_image).data)
+        errors = {}
+        for upload in images:
+            try:
+                inspect_image(upload)
+            except DjangoValidationError as e:
+                errors[upload.name] = e.messages
+        if errors:
+            return Response(
+                {'error': 'Invalid images', 'images': errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response(created_images, status=status.HTTP_201_CREATED)
+        created_images = attach_images(post, images)
+        serializer = BlogImageSerializer(created_images, many=True, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over published posts, best match first"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'Search query (q) is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return self._cached_response(request, [POST_LIST_TAG], self._search, query)
+
+    def _search(self, request, query):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 50))
+        except ValueError:
+            limit = 20
+        
+        results = search_posts(query, limit=limit)
+        storage = BlogPost._meta.get_field('featured_image').storage
+        for result in results:
+            if result['featured_image']:
+                result['featured_image'] = request.build_absolute_uri(storage.url(result['featured_image']))
+            else:
+                result['featured_image'] = None
+        
+        logger.info(f"Search for {query!r} returned {len(results)} posts")
+        return Response({'query': query, 'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Suggest published post titles for a search box prefix"""
+        prefix = request.query_params.get('q', '').strip()
+        if not prefix:
+            return Response({'query': prefix, 'results': []}, status=status.HTTP_200_OK)
+        response = self._cached_response(request, [POST_LIST_TAG], self._autocomplete, prefix)
+        # Suggestions may lag a minute behind edits; let browsers reuse them
+        response['Cache-Control'] = 'public, max-age=60'
+        return response
+
+    def _autocomplete(self, request, prefix):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 25))
+        except ValueError:
+            limit = 10
+        results = autocomplete_titles(prefix, limit=limit)
+        return Response({'query': prefix, 'results': results}, status=status.HTTP_200_OK)
 
 class BlogImageViewSet(viewsets.ModelViewSet):
     """
@@ -145,12 +298,18 @@ class BlogImageViewSet(viewsets.ModelViewSet):
     serializer_class = BlogImageSerializer
     parser_classes = [MultiPartParser, FormParser]
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(DiagnosticsViewMixin, SparseFieldsetViewMixin, ValuesListViewMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing blog comments.
     
+    GET requests accept `fields` (comma-separated fields to return) and
+    `expand` (`post` embeds the post, otherwise it is the post id).
+    
+    Staff users can send `X-Diagnostics: 1` to get counts and SQL for the
+    request back in the `X-Diagnostics` response header.
+    
     list:
-    Return a list of all comments.
+    Return a page of comments, newest first (cursor paginated like posts).
     
     retrieve:
     Return a specific comment by ID.
@@ -167,11 +326,15 @@ class CommentViewSet(viewsets.ModelViewSet):
     destroy:
     Delete a comment.
     """
-    queryset = Comment.objects.all()
+    # The post is rendered into every comment
+    queryset = Comment.objects.select_related('post')
     serializer_class = CommentSerializer
+    pagination_class = KeysetPagination
+    values_serializer_class = CommentValuesSerializer
     
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = self.restrict_queryset(self.queryset)
+
         # Filter by post ID
         post = self.request.query_params.get('post')
         if post is not None:
@@ -182,34 +345,56 @@ class CommentViewSet(viewsets.ModelViewSet):
         if approved is not None:
             if approved.lower() == 'true':
                 queryset = queryset.filter(approved=True)
-                logger.info(f"Filtering for APPROVED comments only for post {post}")
             elif approved.lower() == 'false':
                 queryset = queryset.filter(approved=False)
-                logger.info(f"Filtering for UNAPPROVED comments only for post {post}")
                 
-        # Log the query for debugging
         logger.debug(f"Comment queryset filters: post={post}, approved={approved}")
-        logger.debug(f"Comment queryset SQL: {str(queryset.query)}")
-        count = queryset.count()
-        logger.debug(f"Comment queryset count: {count}")
+        if self.diagnostics is not None:
+            self.diagnose_queryset(queryset, post, approved)
         
-        # Additional logging for debugging
-        if count == 0 and approved == 'true':
-            # If we're looking for approved comments but found none, log all comments for this post
+        return queryset
+
+    def diagnose_queryset(self, queryset, post, approved):
+        """Count the filtered comments and, if none are approved, sample the post's comments"""
+        diagnostics = self.diagnostics
+        diagnostics.add('filters', {'post': post, 'approved': approved})
+        diagnostics.add('sql', str(queryset.query))
+        count = queryset.count()
+        diagnostics.add('count', count)
+        if count == 0 and approved == 'true' and post is not None:
             all_comments = Comment.objects.filter(post=post)
-            approved_count = all_comments.filter(approved=True).count()
-            logger.info(f"Found {approved_count} approved comments out of {all_comments.count()} total for post {post}")
-            
-            # Log the first few comments with their approval status for debugging
-            for comment in all_comments[:5]:
-                logger.info(f"Comment {comment.id}: approved={comment.approved}, content={comment.content[:30]}")
+            diagnostics.add('post_comments', {
+                'approved': all_comments.filter(approved=True).count(),
+                'total': all_comments.count(),
+                'sample': [
+                    {'id': comment.id, 'approved': comment.approved, 'content': comment.content[:30]}
+                    for comment in all_comments.only('id', 'approved', 'content')[:5]
+                ],
+            })
+
+    def restrict_queryset(self, queryset):
+        """Load only the columns and relations the response renders"""
+        if self.request.method not in ('GET', 'HEAD'):
+            # Writes save the comment and read the post's counters, never its body
+            return queryset.defer('post__content', 'post__search_vector')
+        return self.plan_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        # Per-post listings support conditional GET
+        post = request.query_params.get('post')
+        if post is None or not post.isdigit():
+            return super().list(request, *args, **kwargs)
         
-        return queryset
+        approved = request.query_params.get('approved')
+        if approved is not None:
+            approved = {'true': True, 'false': False}.get(approved.lower())
+        validators = comment_list_validators(post, approved)
+        return conditional_response(request, validators, super().list, *args, **kwargs)
     
     @action(detail=False, methods=['get'])
     def pending_count(self, request):
         """Return the count of pending (unapproved) comments"""
-        count = Comment.objects.filter(approved=False).count()
+        count = comment_stats.get()['pending']
         logger.info(f"Pending comments count: {count}")
         return Response({'count': count}, status=status.HTTP_200_OK)
         
@@ -217,9 +402,7 @@ class CommentViewSet(viewsets.ModelViewSet):
     def debug(self, request):
         """Debug endpoint to check comments data and filter functionality"""
         # Get counts
-        total_comments = Comment.objects.count()
-        approved_comments = Comment.objects.filter(approved=True).count()
-        pending_comments = Comment.objects.filter(approved=False).count()
+        counts = comment_stats.get()
         
         # Check if filtering works
         post_filter = request.query_params.get('post')
@@ -228,9 +411,12 @@ class CommentViewSet(viewsets.ModelViewSet):
         filtered_queryset = self.get_queryset()
         filtered_count = filtered_queryset.count()
         
-        # Sample data
+        # Sample data, loading only the columns shown below
         sample_comments = []
-        for comment in filtered_queryset[:5]:  # Get first 5 comments
+        samples = filtered_queryset.select_related(None).only(
+            'id', 'post_id', 'content', 'approved', 'created_at'
+        )
+        for comment in samples[:5]:  # Get first 5 comments
             sample_comments.append({
                 'id': comment.id,
                 'post_id': comment.post_id,
@@ -242,9 +428,10 @@ class CommentViewSet(viewsets.ModelViewSet):
         # Return debug info
         debug_info = {
             'counts': {
-                'total': total_comments,
-                'approved': approved_comments,
-                'pending': pending_comments,
+                'total': counts['total'],
+                'approved': counts['approved'],
+                'pending': counts['pending'],
+                'trash': counts['trash'],
                 'filtered': filtered_count,
             },
             'filters_applied': {
@@ -257,27 +444,36 @@ class CommentViewSet(viewsets.ModelViewSet):
         
         return Response(debug_info, status=status.HTTP_200_OK)
 
+    def moderate(self, action, reply=None, reads=()):
+        """
+        Run a moderation action on the comment of this detail route.
+
+        Returns the comment reloaded with what the response renders (see
+        plan_queryset()) plus the lookups in reads.
+        """
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not str(pk).isdigit():
+            raise NotFound()
+        [result] = moderate_comments([(action, [int(pk)], reply)])
+        if result['outcome'] == NOT_FOUND:
+            raise NotFound()
+        if self.diagnostics is not None:
+            self.diagnostics.add('moderation', result)
+        comment = get_object_or_404(self.plan_queryset(self.queryset, *reads), pk=pk)
+        self.check_object_permissions(self.request, comment)
+        return comment
+
     @action(detail=True, methods=['post', 'patch'])
     def approve(self, request, pk=None):
         """Approve a comment"""
-        comment = self.get_object()
-        logger.info(f"Approving comment {comment.id} for post {comment.post.id}")
-        logger.info(f"Comment status before: approved={comment.approved}")
-        
-        # Explicitly set approved to True
-        comment.approved = True
-        comment.save()
-        
-        # Verify the change was saved
-        comment.refresh_from_db()
-        logger.info(f"Comment status after: approved={comment.approved}")
+        comment = self.moderate('approve', reads=['post__approved_count'])
+        logger.info(f"Approved comment {comment.id} for post {comment.post_id}")
         
-        # Get all approved comments for this post for verification
-        approved_count = Comment.objects.filter(post=comment.post, approved=True).count()
-        logger.info(f"Post {comment.post.id} now has {approved_count} approved comments")
+        # Loaded after the update, so the post counters include this comment
+        approved_count = comment.post.approved_count
         
         # Return the updated comment data
-        serializer = CommentSerializer(comment)
+        serializer = self.get_serializer(comment)
         return Response({
             'status': 'comment approved',
             'comment': serializer.data,
@@ -287,73 +483,63 @@ class CommentViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post', 'patch'])
     def reject(self, request, pk=None):
         """Reject (unapprove) a comment"""
-        comment = self.get_object()
-        logger.info(f"Rejecting comment {comment.id} for post {comment.post.id if comment.post else 'unknown'}")
-        logger.info(f"Comment status before: approved={comment.approved}")
-        
         # Set approved to False instead of deleting
-        comment.approved = False
-        comment.save()
-        
-        # Verify the change was saved
-        comment.refresh_from_db()
-        logger.info(f"Comment status after: approved={comment.approved}")
+        comment = self.moderate('unapprove')
+        logger.info(f"Rejected comment {comment.id} for post {comment.post_id}")
         
         # Return the updated comment data
-        serializer = CommentSerializer(comment)
+        serializer = self.get_serializer(comment)
         return Response({
             'status': 'comment rejected',
             'comment': serializer.data
         }, status=status.HTTP_200_OK)
 
-    @action(detail=False, methods=['post'])
-    def bulk_approve(self, request):
-        """Approve multiple comments at once"""
+    def _bulk_moderate(self, request, action):
         comment_ids = request.data.get('comment_ids', [])
         if not comment_ids:
-            return Response(
+            return None, Response(
                 {'error': 'No comment IDs provided'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
-        # Log for debugging
-        logger.info(f"Bulk approving comments: {comment_ids}")
-        
-        # Filter comments that aren't already approved
-        comments = Comment.objects.filter(id__in=comment_ids, approved=False)
-        count = comments.count()
-        
-        # Update the comments
-        comments.update(approved=True, is_trash=False)
-        
-        logger.info(f"Bulk approved {count} comments")
-        
+        try:
+            operations = parse_operations({'action': action, 'ids': comment_ids})
+        except ModerationError as e:
+            return None, Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return summarize_results(moderate_comments(operations))[UPDATED], None
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk_approve(self, request):
+        """Approve multiple comments at once"""
+        count, error = self._bulk_moderate(request, 'approve')
+        if error is not None:
+            return error
         return Response({'status': f'{count} comments approved'}, status=status.HTTP_200_OK)
         
-    @action(detail=False, methods=['post'])
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
     def bulk_reject(self, request):
         """Reject (unapprove) multiple comments at once"""
-        comment_ids = request.data.get('comment_ids', [])
-        if not comment_ids:
-            return Response(
-                {'error': 'No comment IDs provided'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-            
-        # Log for debugging
-        logger.info(f"Bulk rejecting comments: {comment_ids}")
-        
-        # Filter comments that are currently approved
-        comments = Comment.objects.filter(id__in=comment_ids, approved=True)
-        count = comments.count()
-        
-        # Update comments to be unapproved (not deleted)
-        comments.update(approved=False)
-        
-        logger.info(f"Bulk rejected {count} comments")
-        
+        count, error = self._bulk_moderate(request, 'unapprove')
+        if error is not None:
+            return error
         return Response({'status': f'{count} comments rejected'}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def batch(self, request):
+        """
+        Run approve, unapprove, trash, restore, delete and reply operations on
+        many comments in one transaction, with an outcome per comment id.
+        Staff only; approve also restores trashed comments.
+        """
+        try:
+            operations = parse_operations(request.data)
+        except ModerationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        results = moderate_comments(operations)
+        return Response({
+            'results': results,
+            'summary': summarize_results(results),
+        }, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'])
     def all(self, request):
         """Return all comments (approved and pending) for a post"""
@@ -363,15 +549,39 @@ class CommentViewSet(viewsets.ModelViewSet):
                 {'error': 'Post ID is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-            
+        if post_id.isdigit():
+            return conditional_response(
+                request, comment_list_validators(post_id, kind='comments-all'), self._all, post_id
+            )
+        return self._all(request, post_id)
+
+    def _all(self, request, post_id):
         post = get_object_or_404(BlogPost, pk=post_id)
-        approved_comments = Comment.objects.filter(post=post, approved=True)
-        pending_comments = Comment.objects.filter(post=post, approved=False)
+        
+        # Each stream pages independently with its own cursor parameter
+        approved_pager = KeysetPagination(cursor_query_param='approved_cursor')
+        pending_pager = KeysetPagination(cursor_query_param='pending_cursor')
+        approved_comments = approved_pager.paginate_queryset(
+            self.restrict_queryset(Comment.objects.filter(post=post, approved=True).select_related('post')),
+            request, view=self
+        )
+        pending_comments = pending_pager.paginate_queryset(
+            self.restrict_queryset(Comment.objects.filter(post=post, approved=False).select_related('post')),
+            request, view=self
+        )
         
         return Response({
-            'approved': CommentSerializer(approved_comments, many=True).data,
-            'pending': CommentSerializer(pending_comments, many=True).data,
-            'total': approved_comments.count() + pending_comments.count()
+            'approved': self.get_serializer(approved_comments, many=True).data,
+            'pending': self.get_serializer(pending_comments, many=True).data,
+            'total': post.comment_count,
+            'next': {
+                'approved': approved_pager.get_next_link(),
+                'pending': pending_pager.get_next_link(),
+            },
+            'previous': {
+                'approved': approved_pager.get_previous_link(),
+                'pending': pending_pager.get_previous_link(),
+            }
         }, status=status.HTTP_200_OK)
 
     @action(detail=False, methods=['get'])
@@ -385,36 +595,32 @@ class CommentViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            post = BlogPost.objects.get(pk=post_id)
+            post = BlogPost.objects.only('title', *COMMENT_COUNTER_FIELDS).get(pk=post_id)
         except BlogPost.DoesNotExist:
             return Response(
                 {'error': f'Post with ID {post_id} does not exist'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get all comments for this post
-        all_comments = Comment.objects.filter(post=post)
-        
-        # Count by approval status
-        total_count = all_comments.count()
-        approved_count = all_comments.filter(approved=True).count()
-        unapproved_count = all_comments.filter(approved=False).count()
+        # Get all comments for this post, loading what the serializer renders
+        all_comments = self.restrict_queryset(Comment.objects.filter(post=post))
         
         # Get sample comments
         approved_samples = all_comments.filter(approved=True)[:5]
         unapproved_samples = all_comments.filter(approved=False)[:5]
         
         # Serialize sample comments
-        approved_samples_data = CommentSerializer(approved_samples, many=True).data
-        unapproved_samples_data = CommentSerializer(unapproved_samples, many=True).data
+        approved_samples_data = self.get_serializer(approved_samples, many=True).data
+        unapproved_samples_data = self.get_serializer(unapproved_samples, many=True).data
         
         return Response({
             'post_id': post_id,
             'post_title': post.title,
             'counts': {
-                'total': total_count,
-                'approved': approved_count,
-                'unapproved': unapproved_count
+                'total': post.comment_count,
+                'approved': post.approved_count,
+                'unapproved': post.pending_count,
+                'trash': post.trash_count
             },
             'approved_samples': approved_samples_data,
             'unapproved_samples': unapproved_samples_data
@@ -429,7 +635,14 @@ class CommentViewSet(viewsets.ModelViewSet):
                 {'error': 'Post ID is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
+        if post_id.isdigit():
+            return conditional_response(
+                request, comment_list_validators(post_id, approved=True),
+                self._approved_for_post, post_id
+            )
+        return self._approved_for_post(request, post_id)
+
+    def _approved_for_post(self, request, post_id):
         try:
             post = BlogPost.objects.get(pk=post_id)
         except BlogPost.DoesNotExist:
@@ -438,33 +651,31 @@ class CommentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Explicitly filter for approved comments only
-        approved_comments = Comment.objects.filter(post=post, approved=True)
+        # Explicitly filter for approved comments only, never trashed ones
+        approved_comments = self.restrict_queryset(Comment.objects.filter(
+            post=post, approved=True, is_trash=False
+        ).select_related('post'))
         
         # Log details for debugging
         logger.info(f"Getting approved comments for post {post_id}")
-        logger.info(f"Found {approved_comments.count()} approved comments")
+        logger.info(f"Found {post.approved_count} approved comments")
         
-        # Return serialized data
-        serializer = CommentSerializer(approved_comments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Return one page of serialized data
+        page = self.paginate_queryset(approved_comments)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
     @action(detail=True, methods=['post', 'patch', 'put', 'delete'])
     def reply(self, request, pk=None):
         """Add, update or delete an admin reply to a comment"""
-        comment = self.get_object()
-        
         # Handle DELETE request - remove admin reply
         if request.method == 'DELETE':
-            comment.admin_reply = None
-            comment.save()
-            
-            # Log for debugging
-            logger.info(f"Deleted admin reply from comment {comment.id} for post {comment.post.id}")
+            comment = self.moderate('reply', reply=None)
+            logger.info(f"Deleted admin reply from comment {comment.id} for post {comment.post_id}")
             
             return Response({
                 'status': 'reply deleted',
-                'comment': CommentSerializer(comment).data
+                'comment': self.get_serializer(comment).data
             }, status=status.HTTP_200_OK)
         
         # Handle POST, PATCH, PUT requests - add or update admin reply
@@ -476,14 +687,11 @@ class CommentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
             
-        comment.admin_reply = reply_text
-        comment.save()
-        
-        # Log for debugging
-        logger.info(f"Added/updated admin reply to comment {comment.id} for post {comment.post.id}")
+        comment = self.moderate('reply', reply=reply_text)
+        logger.info(f"Added/updated admin reply to comment {comment.id} for post {comment.post_id}")
         
         # Return the updated comment data
-        serializer = CommentSerializer(comment)
+        serializer = self.get_serializer(comment)
         return Response({
             'status': 'reply added' if request.method == 'POST' else 'reply updated',
             'comment': serializer.data
@@ -526,46 +734,35 @@ def list_urls(request):
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+COMMENT_ACTION_MESSAGES = {
+    'approve': 'Comment approved',
+    'unapprove': 'Comment unapproved',
+    'trash': 'Comment moved to trash',
+    'restore': 'Comment restored from trash',
+    'delete': 'Comment permanently deleted',
+}
+
 @api_view(['POST'])
+@permission_classes([IsAdminUser])
 def comment_action(request, action):
     """Handle comment actions from admin interface"""
     try:
         comment_id = request.data.get('comment_id')
         if not comment_id:
             return JsonResponse({'error': 'Comment ID is required'}, status=400)
+        if action not in COMMENT_ACTION_MESSAGES:
+            return JsonResponse({'error': f'Unknown action: {action}'}, status=400)
         
-        # Log the request data for debugging
-        logger.info(f"Comment action request: action={action}, comment_id={comment_id}, data={request.data}")
-        
-        comment = get_object_or_404(Comment, id=comment_id)
+        logger.info(f"Comment action request: action={action}, comment_id={comment_id}")
         
-        if action == 'approve':
-            comment.approved = True
-            comment.is_trash = False
-            comment.save()
-            return JsonResponse({'status': 'success', 'message': 'Comment approved'})
-            
-        elif action == 'unapprove':
-            comment.approved = False
-            comment.save()
-            return JsonResponse({'status': 'success', 'message': 'Comment unapproved'})
-            
-        elif action == 'trash':
-            comment.is_trash = True
-            comment.save()
-            return JsonResponse({'status': 'success', 'message': 'Comment moved to trash'})
-            
-        elif action == 'restore':
-            comment.is_trash = False
-            comment.save()
-            return JsonResponse({'status': 'success', 'message': 'Comment restored from trash'})
-            
-        elif action == 'delete':
-            comment.delete()
-            return JsonResponse({'status': 'success', 'message': 'Comment permanently deleted'})
-            
-        else:
-            return JsonResponse({'error': f'Unknown action: {action}'}, status=400)
+        try:
+            operations = parse_operations({'action': action, 'ids': [comment_id]})
+        except ModerationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        [result] = moderate_comments(operations)
+        if result['outcome'] == NOT_FOUND:
+            return JsonResponse({'error': f'Comment {comment_id} does not exist'}, status=404)
+        return JsonResponse({'status': 'success', 'message': COMMENT_ACTION_MESSAGES[action]})
     
     except Exception as e:
         logger.error(f"Error performing comment action: {str(e)}")
@@ -578,26 +775,17 @@ def comment_counts(request):
         # Log the request for debugging
         logger.info(f"Received request to comment_counts endpoint: {request.path}")
         
-        # Force evaluate the counts to ensure they're accurate
-        all_count = Comment.objects.filter(is_trash=False).count()
-        pending_count = Comment.objects.filter(approved=False, is_trash=False).count()
-        approved_count = Comment.objects.filter(approved=True, is_trash=False).count()
-        trash_count = Comment.objects.filter(is_trash=True).count()
+        # All counts come from one cached aggregate query
+        counts = comment_stats.get()
         
         # Log counts for debugging
-        logger.info(f"Comment counts: all={all_count}, pending={pending_count}, approved={approved_count}, trash={trash_count}")
-        
-        # Verify the counts match expectations
-        total_count = Comment.objects.count()
-        expected_sum = all_count + trash_count
-        if total_count != expected_sum:
-            logger.warning(f"Total comment count ({total_count}) doesn't match sum of all + trash ({expected_sum})")
+        logger.info(f"Comment counts: all={counts['all']}, pending={counts['pending']}, approved={counts['approved']}, trash={counts['trash']}")
         
         response_data = {
-            'all': all_count,
-            'pending': pending_count,
-            'approved': approved_count,
-            'trash': trash_count,
+            'all': counts['all'],
+            'pending': counts['pending'],
+            'approved': counts['approved'],
+            'trash': counts['trash'],
             'status': 'success',
             'message': 'Comment counts retrieved successfully',
             'path': request.path
@@ -610,6 +798,11 @@ def comment_counts(request):
         logger.error(f"Error getting comment counts: {str(e)}", exc_info=True)
         return JsonResponse({'error': str(e), 'detail': 'An error occurred while fetching comment counts'}, status=500)
 
+@api_view(['GET'])
+def cache_stats(request):
+    """Return hit/miss counters of the API response cache"""
+    return JsonResponse(response_cache.stats())
+
 @api_view(['GET'])
 def test_api(request):
     """Simple test endpoint to verify API routing"""
@@ -22,6 +22,10 @@ echo "🏁 Running database migrations..."
 python manage.py makemigrations
 python manage.py migrate --noinput
 
+# Table of the shared cache, unless REDIS_URL points at Redis
+echo "🗄️ Creating cache table..."
+python manage.py createcachetable
+
 # Collect static files
 echo "📦 Collecting static files..."
 python manage.py collectstatic --noinput
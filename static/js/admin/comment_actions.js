@@ -23,35 +23,39 @@ function reloadPage() {
     window.location.reload();
 }
 
-// Perform comment action via API
-function performCommentAction(commentId, action, data = {}) {
+// Run moderation operations through the batch API:
+// [{action: 'approve', ids: [1, 2]}, {action: 'trash', ids: [3]}]
+function performBatchAction(operations) {
     const csrftoken = getCookie('csrftoken');
     
-    // Default data with comment ID
-    const requestData = {
-        comment_id: commentId,
-        ...data
-    };
-    
-    // Send request to appropriate endpoint
-    fetch(`/api/comments/${action}/`, {
+    return fetch('/api/comments/batch/', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
             'X-CSRFToken': csrftoken,
         },
-        body: JSON.stringify(requestData),
+        body: JSON.stringify({operations: operations}),
     })
     .then(response => {
-        if (response.ok) {
-            reloadPage();
-        } else {
-            alert('Error performing comment action. Please try again.');
+        if (!response.ok) {
+            throw new Error(`Batch request failed with status ${response.status}`);
+        }
+        return response.json();
+    });
+}
+
+// Perform comment action via API
+function performCommentAction(commentId, action, data = {}) {
+    performBatchAction([{action: action, ids: [commentId], ...data}])
+    .then(result => {
+        if (result.summary.not_found) {
+            alert('This comment no longer exists.');
         }
+        reloadPage();
     })
     .catch(error => {
         console.error('Error:', error);
-        alert('Error performing comment action.');
+        alert('Error performing comment action. Please try again.');
     });
 }
 